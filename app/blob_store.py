@@ -0,0 +1,128 @@
+"""内容アドレス方式のブロブストア
+
+テキスト本文を UTF-8 の sha256 をファイル名として保存する。同じ内容は
+同じファイルになるため重複排除される。一定サイズ以上は zlib 圧縮し、
+圧縮したものは `.z` 拡張子で区別する。
+"""
+
+import hashlib
+import logging
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set
+
+from app.durable_write import atomic_file, default_durability
+
+_logger = logging.getLogger(__name__)
+
+# このバイト数以上の本文は圧縮を試みる
+COMPRESS_MIN_BYTES = 1024
+
+
+def blob_hash(text: str) -> str:
+    """本文のハッシュ（ブロブのキー）を返す"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    """`<root>/<hash[:2]>/<hash>[.z]` に本文を保存するストア"""
+
+    def __init__(
+        self,
+        root: Path,
+        compress_min_bytes: Optional[int] = None,
+        durability: Optional[str] = None,
+    ):
+        """初期化
+
+        Args:
+            root: 保存先ディレクトリ
+            compress_min_bytes: 圧縮を試みる下限バイト数（None で圧縮しない）
+            durability: 耐久性モード
+        """
+        self.root = root
+        self.compress_min_bytes = compress_min_bytes
+        self.durability = durability or default_durability()
+
+    def _path(self, digest: str, compressed: bool) -> Path:
+        name = digest + (".z" if compressed else "")
+        return self.root / digest[:2] / name
+
+    def _existing(self, digest: str) -> Optional[Path]:
+        for compressed in (True, False):
+            p = self._path(digest, compressed)
+            if p.exists():
+                return p
+        return None
+
+    def put(self, text: str) -> str:
+        """本文を保存してハッシュを返す（既にあれば書き込まない）"""
+        digest = blob_hash(text)
+        if self._existing(digest) is not None:
+            return digest
+        raw = text.encode("utf-8")
+        payload, compressed = raw, False
+        if self.compress_min_bytes is not None and len(raw) >= self.compress_min_bytes:
+            packed = zlib.compress(raw)
+            if len(packed) < len(raw):
+                payload, compressed = packed, True
+        with atomic_file(self._path(digest, compressed), self.durability) as f:
+            f.write(payload)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """本文を返す（存在しない場合は None）"""
+        path = self._existing(digest)
+        if path is None:
+            return None
+        try:
+            data = path.read_bytes()
+            if path.suffix == ".z":
+                data = zlib.decompress(data)
+            return data.decode("utf-8")
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            _logger.error(f"ブロブ読み込みエラー: {digest}: {e}")
+            return None
+
+    def delete(self, digest: str) -> bool:
+        path = self._existing(digest)
+        if path is None:
+            return False
+        path.unlink(missing_ok=True)
+        return True
+
+    def hashes(self) -> Iterator[str]:
+        """保存済みブロブのハッシュを列挙する"""
+        if not self.root.exists():
+            return
+        for p in self.root.glob("??/*"):
+            if p.suffix == ".tmp":
+                continue
+            yield p.name.removesuffix(".z")
+
+    def gc(self, live: Iterable[str], min_age: float = 0.0) -> int:
+        """live に含まれないブロブを削除し、削除件数を返す
+
+        Args:
+            live: 参照されているハッシュ
+            min_age: これより新しい（秒）ブロブは残す。put から参照の保存までの
+                間にある他プロセスのブロブを消さないための猶予
+        """
+        keep: Set[str] = set(live)
+        cutoff = time.time() - min_age
+        removed = 0
+        for digest in list(self.hashes()):
+            if digest in keep:
+                continue
+            path = self._existing(digest)
+            try:
+                if path is None or path.stat().st_mtime > cutoff:
+                    continue
+            except OSError:
+                continue
+            if self.delete(digest):
+                removed += 1
+        if removed:
+            _logger.info("blob gc removed %d unreferenced blobs", removed)
+        return removed
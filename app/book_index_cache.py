@@ -0,0 +1,125 @@
+"""書籍ごとの検索インデックスの LRU キャッシュ
+
+読み込んだ書籍のインデックスは変更しないオブジェクト（`BookIndex`）として
+共有し、同じ書籍の検索ではファイルを読み直さない。上限はおおよその
+メモリ量（埋め込み行列とテキストのバイト数）で決め、超えたら最も長く
+使われていない書籍から捨てる。インデックスファイルの stat が変わった
+書籍（再インデックス後）は読み直す。
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from app.embedding_util import EmbeddingManager
+from app.file_lock import StatKey, stat_key
+from app.quantized_index import QuantizedIndex
+
+# キャッシュ全体の上限（MB）
+DEFAULT_MAX_BYTES = int(os.getenv("BLOGWRITER_RAG_CACHE_MB", "512") or 512) << 20
+
+Loader = Callable[[Path], Optional[EmbeddingManager]]
+
+
+def _estimate_bytes(manager: EmbeddingManager) -> int:
+    if isinstance(manager.index, QuantizedIndex):
+        # 行列は並べ直す候補の行しか読まないため、走査する符号だけを数える
+        size = manager.index.nbytes
+    else:
+        size = int(getattr(manager.embeddings, "nbytes", 0) or 0)
+    # 読み込み後のビューは行を都度ファイルから読むため数えない
+    if isinstance(manager.texts, list):
+        size += sum(sys.getsizeof(t) for t in manager.texts)
+    return size
+
+
+@dataclass(frozen=True)
+class BookIndex:
+    """読み込み済みの書籍インデックス
+
+    `manager` は読み込み後に変更しない（検索は search_by_vector のみ使う）
+    ため、複数スレッドから同時に検索してよい。
+    """
+
+    name: str
+    source: Optional[StatKey]
+    manager: EmbeddingManager
+    nbytes: int
+
+
+class BookIndexCache:
+    """書籍インデックスのメモリ量上限つき LRU キャッシュ"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """初期化
+
+        Args:
+            max_bytes: 保持するインデックスの合計バイト数の上限
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, BookIndex]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _pop_locked(self, name: str) -> None:
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def get(self, name: str, path: Path, loader: Loader) -> Optional[BookIndex]:
+        """キャッシュ済みなら返し、無ければ loader で読み込んで登録する"""
+        source = stat_key(path)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.source == source:
+                self._entries.move_to_end(name)
+                self._hits += 1
+                return entry
+            self._misses += 1
+        if source is None:
+            return None
+        # 読み込みはロックの外で行う（同じ書籍を同時に読んだ場合は後勝ち）
+        manager = loader(path)
+        if manager is None:
+            return None
+        entry = BookIndex(name, source, manager, _estimate_bytes(manager))
+        with self._lock:
+            self._pop_locked(name)
+            if entry.nbytes > self.max_bytes:
+                # 上限より大きい書籍はキャッシュせずに使う
+                return entry
+            self._entries[name] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._pop_locked(oldest)
+                self._evictions += 1
+        return entry
+
+    def invalidate(self, name: str) -> None:
+        with self._lock:
+            self._pop_locked(name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """件数・合計バイト数・ヒット/ミス/追い出しの回数"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,127 @@
+"""正規化済み埋め込み行列に対する厳密な top-k 検索
+
+埋め込みは L2 正規化済みのため、コサイン類似度は行列とクエリの内積で
+求まる。内積を行ブロックごとに取り（mmap の float16 行列もブロック単位で
+float32 に変換する）、`np.argpartition` で上位 k 件だけを選んでから並べる。
+複数クエリは 1 回の行列積でまとめて検索する。
+"""
+
+from typing import Any, Iterator, Tuple
+
+import numpy as np
+
+# 1 回に float32 へ変換して内積を取る行数
+BLOCK_ROWS = 65536
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """1 次元のスコアの上位 k 件の位置（スコアの高い順）"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(scores.size)
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def merge_top_k(
+    best: Tuple[np.ndarray, np.ndarray], block_scores: np.ndarray, start: int, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """これまでの上位 k 件と (クエリ数, ブロック行数) のスコアを合わせて上位 k 件に絞る
+
+    並び順はそろえないため、最後に並べ替える。
+    """
+    best_scores, best_idx = best
+    cand_scores = np.concatenate([best_scores, block_scores], axis=1)
+    cand_idx = np.concatenate(
+        [
+            best_idx,
+            np.broadcast_to(
+                np.arange(start, start + block_scores.shape[1]), block_scores.shape
+            ),
+        ],
+        axis=1,
+    )
+    if cand_scores.shape[1] > k:
+        part = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+        cand_scores = np.take_along_axis(cand_scores, part, axis=1)
+        cand_idx = np.take_along_axis(cand_idx, part, axis=1)
+    return cand_scores, cand_idx
+
+
+def sort_top_k(best: Tuple[np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """merge_top_k の結果をスコアの高い順に並べる"""
+    best_scores, best_idx = best
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return (
+        np.take_along_axis(best_scores, order, axis=1),
+        np.take_along_axis(best_idx, order, axis=1),
+    )
+
+
+def _as_queries(queries: Any) -> np.ndarray:
+    q = np.asarray(queries, dtype=np.float32)
+    return q.reshape(1, -1) if q.ndim == 1 else q
+
+
+class DenseIndex:
+    """行列をそのまま走査する厳密検索インデックス
+
+    行列は参照するだけで変更・コピーしない（mmap した行列も渡せる）。
+    """
+
+    def __init__(self, matrix: Any, block_rows: int = BLOCK_ROWS):
+        """初期化
+
+        Args:
+            matrix: (件数, 次元) の正規化済み埋め込み行列
+            block_rows: 1 回に内積を取る行数
+        """
+        arr = matrix if isinstance(matrix, np.ndarray) else np.asarray(matrix)
+        if arr.dtype == object:
+            arr = arr.astype(np.float32)
+        self.matrix = arr
+        self.block_rows = max(1, block_rows)
+
+    def __len__(self) -> int:
+        return int(self.matrix.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    def _blocks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        n = len(self)
+        for start in range(0, n, self.block_rows):
+            block = self.matrix[start : start + self.block_rows]
+            yield start, np.asarray(block, dtype=np.float32)
+
+    def scores(self, query: Any) -> np.ndarray:
+        """全行とクエリの内積（コサイン類似度）"""
+        q = _as_queries(query)[0]
+        out = np.empty(len(self), dtype=np.float32)
+        for start, block in self._blocks():
+            out[start : start + len(block)] = block @ q
+        return out
+
+    def search(self, query: Any, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """1 クエリの上位 k 件の (類似度, 行番号)"""
+        scores, indices = self.search_batch(query, k)
+        return scores[0], indices[0]
+
+    def search_batch(self, queries: Any, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """複数クエリの上位 k 件を (クエリ数, k) の (類似度, 行番号) で返す"""
+        q = _as_queries(queries)
+        m = q.shape[0]
+        k = min(k, len(self))
+        if k <= 0 or m == 0:
+            empty = np.empty((m, 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        best = (
+            np.full((m, 0), -np.inf, dtype=np.float32),
+            np.empty((m, 0), dtype=np.int64),
+        )
+        for start, block in self._blocks():
+            best = merge_top_k(best, q @ block.T, start, k)
+        return sort_top_k(best)
@@ -0,0 +1,455 @@
+"""下書きのログ構造化ストア
+
+変更は 1 レコード 1 行の JSON としてセグメントファイルへ追記し、
+メモリ上の `id -> (offset, length)` インデックスで最新レコードを引く。
+不要になったレコードが一定量を超えたらバックグラウンドで詰め直す。
+
+複数プロセスで同じログを共有できるよう、操作ごとに `<log>.lock` の
+flock を取り、他プロセスの追記（サイズ増加）やコンパクションによる
+差し替え（inode 変化）を検知してインデックスを追従させる。
+"""
+
+import heapq
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app import durable_write, file_lock
+
+_logger = logging.getLogger(__name__)
+
+# 不要バイトが生存バイトのこの割合を超えたらコンパクション
+COMPACT_RATIO = 1.0
+# 小さいログは詰め直しても得が少ないため下限を設ける
+COMPACT_MIN_BYTES = 1024 * 1024
+# 一覧用にメモリへ保持するプレビューの最大文字数
+PREVIEW_MAX_CHARS = 200
+
+
+def _now_iso() -> str:
+    return datetime.now(UTC).isoformat()
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    return (line + "\n").encode("utf-8")
+
+
+def _row(rec: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": int(rec["id"]),
+        "title": str(rec.get("title", "")),
+        "content": str(rec.get("content", "")),
+        "created_at": str(rec.get("created_at", _now_iso())),
+        "updated_at": str(rec.get("updated_at", _now_iso())),
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class _Entry:
+    """最新レコードの位置と一覧表示用の要約"""
+
+    offset: int
+    length: int
+    title: str
+    created_at: str
+    updated_at: str
+    content_length: int
+    preview: str
+
+
+def _entry(rec: Dict[str, Any], offset: int, length: int) -> _Entry:
+    row = _row(rec)
+    return _Entry(
+        offset=offset,
+        length=length,
+        title=row["title"],
+        created_at=row["created_at"],
+        updated_at=row["updated_at"],
+        content_length=len(row["content"]),
+        preview=row["content"][:PREVIEW_MAX_CHARS],
+    )
+
+
+class DraftLog:
+    """追記専用セグメントファイルによる下書きストア"""
+
+    def __init__(
+        self,
+        path: Path,
+        legacy_path: Optional[Path] = None,
+        compact_ratio: float = COMPACT_RATIO,
+        compact_min_bytes: int = COMPACT_MIN_BYTES,
+        durability: Optional[str] = None,
+    ):
+        """初期化
+
+        Args:
+            path: セグメントファイルのパス
+            legacy_path: 移行元の drafts.json（ログが無い場合のみ取り込む）
+            compact_ratio: コンパクションを起動する不要バイト比率
+            compact_min_bytes: コンパクションを起動する不要バイトの下限
+            durability: 耐久性モード（fsync なら追記ごとに fdatasync する）
+        """
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self.durability = durability or durable_write.default_durability()
+        self.lock_path = file_lock.lock_path_for(path)
+        self._lock = threading.RLock()
+        self._index: Dict[int, _Entry] = {}
+        self._next_id = 1
+        self._size = 0
+        self._dead_bytes = 0
+        self._fd: Optional[int] = None
+        self._compacting = False
+        self._compact_thread: Optional[threading.Thread] = None
+        self._open()
+
+    # ----- 内部処理 -----
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        """スレッドロックとファイルロックを取り、他プロセスの変更に追従する"""
+        with self._lock:
+            with file_lock.locked(self.lock_path, exclusive):
+                self._sync()
+                yield
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, file_lock.locked(self.lock_path, exclusive=True):
+            if not self.path.exists():
+                self._import_legacy()
+            self._load()
+
+    def _load(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = durable_write.open_log(self.path, self.durability)
+        self._index = {}
+        self._next_id = 1
+        self._dead_bytes = 0
+        self._size = self._replay(0, self._index)
+
+    def _sync(self) -> None:
+        """他プロセスによる追記・差し替えをインデックスへ反映する"""
+        assert self._fd is not None
+        try:
+            on_disk = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        current = os.fstat(self._fd)
+        if (on_disk.st_ino, on_disk.st_dev) != (current.st_ino, current.st_dev):
+            # 別プロセスがコンパクションでファイルを差し替えた
+            self._load()
+        elif current.st_size > self._size:
+            self._size = self._replay(self._size, self._index)
+
+    def _import_legacy(self) -> None:
+        if self.legacy_path is None or not self.legacy_path.exists():
+            return
+        try:
+            with self.legacy_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict):
+            return
+        with durable_write.atomic_file(self.path, self.durability) as f:
+            for it in data.get("items", []):
+                try:
+                    rec = {"op": "put", **_row(it)}
+                except (KeyError, TypeError, ValueError):
+                    continue
+                f.write(_encode(rec))
+            next_id = int(data.get("next_id", 1))
+            f.write(_encode({"op": "seq", "next_id": next_id}))
+        _logger.info("drafts.log imported from %s", self.legacy_path)
+
+    def _replay(self, start: int, index: Dict[int, _Entry]) -> int:
+        """start 以降のレコードを index に反映し、読み終えた位置を返す"""
+        assert self._fd is not None
+        size = os.fstat(self._fd).st_size
+        buf = os.pread(self._fd, size - start, start) if size > start else b""
+        return start + self._apply_buffer(buf, start, index)
+
+    def _apply_buffer(self, buf: bytes, base: int, index: Dict[int, _Entry]) -> int:
+        """buf 内の完結したレコードを index に反映し、消費したバイト数を返す"""
+        pos = 0
+        while pos < len(buf):
+            nl = buf.find(b"\n", pos)
+            if nl < 0:
+                # 書きかけの末尾行は無視
+                break
+            length = nl + 1 - pos
+            self._dead_bytes += self._apply(buf[pos:nl], base + pos, length, index)
+            pos = nl + 1
+        return pos
+
+    def _apply(
+        self,
+        line: bytes,
+        offset: int,
+        length: int,
+        index: Dict[int, _Entry],
+    ) -> int:
+        """1 レコードを反映し、不要になったバイト数を返す"""
+        try:
+            rec = json.loads(line)
+            op = rec.get("op")
+            if op == "seq":
+                self._next_id = max(self._next_id, int(rec.get("next_id", 1)))
+                return length
+            draft_id = int(rec["id"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return length
+        self._next_id = max(self._next_id, draft_id + 1)
+        dead = 0
+        prev = index.pop(draft_id, None)
+        if prev is not None:
+            dead += prev.length
+        if op == "put":
+            index[draft_id] = _entry(rec, offset, length)
+        else:
+            dead += length
+        return dead
+
+    def _read(self, entry: _Entry) -> Dict[str, Any]:
+        assert self._fd is not None
+        rec = json.loads(os.pread(self._fd, entry.length, entry.offset))
+        assert isinstance(rec, dict)
+        return rec
+
+    def _append(self, rec: Dict[str, Any]) -> Tuple[int, int]:
+        assert self._fd is not None
+        payload = _encode(rec)
+        offset = self._size
+        durable_write.append_bytes(self._fd, payload, self.durability)
+        self._size += len(payload)
+        return offset, len(payload)
+
+    def _put(self, rec: Dict[str, Any]) -> None:
+        offset, length = self._append({"op": "put", **rec})
+        prev = self._index.get(int(rec["id"]))
+        if prev is not None:
+            self._dead_bytes += prev.length
+        self._index[int(rec["id"])] = _entry(rec, offset, length)
+        self._maybe_compact()
+
+    def _live_bytes(self) -> int:
+        return self._size - self._dead_bytes
+
+    def _maybe_compact(self) -> None:
+        if self._compacting:
+            return
+        threshold = max(self.compact_min_bytes, self._live_bytes() * self.compact_ratio)
+        if self._dead_bytes < threshold:
+            return
+        self._compacting = True
+        self._compact_thread = threading.Thread(
+            target=self._compact_worker, name="draft-log-compact", daemon=True
+        )
+        self._compact_thread.start()
+
+    def _compact_worker(self) -> None:
+        try:
+            self._compact()
+        except Exception as e:  # noqa: BLE001
+            _logger.error(f"drafts.log コンパクションエラー: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _identity(self) -> Tuple[int, int]:
+        assert self._fd is not None
+        st = os.fstat(self._fd)
+        return st.st_dev, st.st_ino
+
+    def _compact(self) -> None:
+        # 1) スナップショット位置までの生存レコードをロック外でコピーする。
+        #    コピー用の fd は複製して持ち、_load() で self._fd が閉じられても
+        #    元のファイルを読み続けられるようにする
+        with self._lock:
+            assert self._fd is not None
+            end = self._size
+            snapshot = sorted(self._index.items(), key=lambda kv: kv[1].offset)
+            copy_fd = os.dup(self._fd)
+            identity = self._identity()
+        # 一時ファイルは呼び出しごとに別名にし、同時に詰め直しても上書きし合わない
+        tmp_fd, tmp_name = tempfile.mkstemp(
+            prefix=self.path.name + ".compact.", dir=self.path.parent
+        )
+        tmp = Path(tmp_name)
+        new_index: Dict[int, _Entry] = {}
+        written = 0
+        try:
+            with os.fdopen(tmp_fd, "wb") as f:
+                for draft_id, entry in snapshot:
+                    f.write(os.pread(copy_fd, entry.length, entry.offset))
+                    new_index[draft_id] = replace(entry, offset=written)
+                    written += entry.length
+                # 2) コピー中に追記された末尾をロック内で反映して差し替え
+                with self._locked(exclusive=True):
+                    if self._identity() != identity:
+                        # 他プロセスが先に詰め直した（fd 番号は再利用されうるため
+                        # ファイルの (dev, inode) で比べる）
+                        tmp.unlink(missing_ok=True)
+                        return
+                    assert self._fd is not None
+                    tail = os.pread(self._fd, self._size - end, end)
+                    seq = _encode({"op": "seq", "next_id": self._next_id})
+                    f.write(tail)
+                    f.write(seq)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._dead_bytes = 0
+                    consumed = self._apply_buffer(tail, written, new_index)
+                    tmp.replace(self.path)
+                    durable_write.fsync_dir(self.path.parent, self.durability)
+                    old_fd = self._fd
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND)
+                    os.close(old_fd)
+                    self._index = new_index
+                    self._size = written + consumed + len(seq)
+                    self._dead_bytes += len(seq)
+        finally:
+            os.close(copy_fd)
+            tmp.unlink(missing_ok=True)
+        _logger.info(
+            "drafts.log compacted: live=%d bytes=%d", len(new_index), self._size
+        )
+
+    # ----- 公開 API -----
+    def compact(self) -> None:
+        """コンパクションを同期的に実行する"""
+        self.wait_compaction()
+        with self._lock:
+            self._compacting = True
+        try:
+            self._compact()
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def wait_compaction(self) -> None:
+        """バックグラウンドのコンパクション完了を待つ"""
+        th = self._compact_thread
+        if th is not None and th.is_alive():
+            th.join()
+
+    def close(self) -> None:
+        self.wait_compaction()
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._locked(exclusive=False):
+            rows = [_row(self._read(e)) for e in self._index.values()]
+        return sorted(rows, key=lambda d: (d["updated_at"], d["id"]), reverse=True)
+
+    def get(self, draft_id: int) -> Optional[Dict[str, Any]]:
+        with self._locked(exclusive=False):
+            entry = self._index.get(draft_id)
+            if entry is None:
+                return None
+            return _row(self._read(entry))
+
+    def create(self, title: str, content: str) -> Dict[str, Any]:
+        with self._locked(exclusive=True):
+            now = _now_iso()
+            row = {
+                "id": self._next_id,
+                "title": title or "無題",
+                "content": content,
+                "created_at": now,
+                "updated_at": now,
+            }
+            self._next_id += 1
+            self._put(row)
+            return row
+
+    def update(
+        self, draft_id: int, title: Optional[str], content: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        with self._locked(exclusive=True):
+            entry = self._index.get(draft_id)
+            if entry is None:
+                return None
+            row = _row(self._read(entry))
+            changed = False
+            if title is not None and title.strip():
+                row["title"] = title.strip()
+                changed = True
+            if content is not None:
+                row["content"] = content
+                changed = True
+            if changed:
+                row["updated_at"] = _now_iso()
+                self._put(row)
+            return row
+
+    def delete(self, draft_id: int) -> bool:
+        with self._locked(exclusive=True):
+            prev = self._index.pop(draft_id, None)
+            if prev is None:
+                return False
+            _, length = self._append({"op": "del", "id": draft_id})
+            self._dead_bytes += prev.length + length
+            self._maybe_compact()
+            return True
+
+    def list_summaries(
+        self,
+        after: Optional[Tuple[str, int]] = None,
+        limit: int = 50,
+        preview_chars: int = 120,
+    ) -> List[Dict[str, Any]]:
+        """本文を読まずに要約を (updated_at, id) の降順で返す
+
+        Args:
+            after: このキーより古いものだけを返すカーソル
+            limit: 最大件数
+            preview_chars: プレビュー文字数（最大 PREVIEW_MAX_CHARS）
+        """
+        n = max(0, min(preview_chars, PREVIEW_MAX_CHARS))
+        with self._locked(exclusive=False):
+            keys = (
+                (e.updated_at, draft_id, e)
+                for draft_id, e in self._index.items()
+                if after is None or (e.updated_at, draft_id) < after
+            )
+            top = heapq.nlargest(limit, keys, key=lambda k: (k[0], k[1]))
+        return [
+            {
+                "id": draft_id,
+                "title": e.title,
+                "created_at": e.created_at,
+                "updated_at": e.updated_at,
+                "content_length": e.content_length,
+                "preview": e.preview[:n],
+            }
+            for _, draft_id, e in top
+        ]
+
+    @property
+    def next_id(self) -> int:
+        with self._locked(exclusive=False):
+            return self._next_id
+
+    def stats(self) -> Dict[str, int]:
+        with self._locked(exclusive=False):
+            return {
+                "count": len(self._index),
+                "size": self._size,
+                "dead_bytes": self._dead_bytes,
+            }
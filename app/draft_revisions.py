@@ -0,0 +1,350 @@
+"""下書きのリビジョン履歴（チェックポイント + 行単位の差分）
+
+1 行 1 レコードの JSON を追記するログに保存する。各下書きのリビジョンは
+一定間隔ごとに全文（チェックポイント）を、それ以外は直前のリビジョン
+からの difflib の opcode を縮めた差分だけを書く。
+
+    {"d": 1, "r": 1, "at": "...", "title": "...", "full": "..."}   # チェックポイント
+    {"d": 1, "r": 2, "at": "...", "title": "...", "ops": [...]}    # 差分
+    {"d": 1, "drop": true}                                         # 下書き削除
+
+差分の ops は行単位で、`[n]` が直前の n 行をそのまま使う、`[-n]` が n 行を
+読み飛ばす、`["text"]` が挿入する内容を表す。任意のリビジョンは直近の
+チェックポイントから差分を順に当てて復元するため、復元コストは
+チェックポイントからの距離に比例する。メモリには位置の索引と、最近保存した
+下書きの最新の内容（次の差分の基準）だけを持つ。
+
+削除した下書きのレコード（と壊れた行）が一定量を超えたら、生きている
+下書きのレコードだけを新しいファイルへ書き直して差し替える。
+ロックは呼び出し側（app.storage）が取る。
+"""
+
+import bisect
+import difflib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import durable_write
+
+_logger = logging.getLogger(__name__)
+
+# この件数ごとにチェックポイント（全文）を書く
+CHECKPOINT_INTERVAL = 10
+# 不要バイトが生存バイトのこの割合を超えたらコンパクション
+COMPACT_RATIO = 1.0
+COMPACT_MIN_BYTES = 1024 * 1024
+# 最新の内容を保持する下書き数
+LATEST_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True, slots=True)
+class _RevisionRef:
+    revision: int
+    created_at: str
+    title: str
+    offset: int
+    length: int
+    checkpoint: bool
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    return (line + "\n").encode("utf-8")
+
+
+def diff_ops(old: str, new: str) -> List[Any]:
+    """old から new を作る行単位の差分"""
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    ops: List[Any] = []
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(-(i2 - i1))
+        if j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return ops
+
+
+def apply_ops(old: str, ops: List[Any]) -> str:
+    """diff_ops の差分を当てる"""
+    a = old.splitlines(keepends=True)
+    out: List[str] = []
+    pos = 0
+    for op in ops:
+        if isinstance(op, str):
+            out.append(op)
+        elif op >= 0:
+            out.extend(a[pos : pos + op])
+            pos += op
+        else:
+            pos -= op
+    return "".join(out)
+
+
+class DraftRevisionLog:
+    """下書きごとのリビジョン履歴ログ"""
+
+    def __init__(
+        self,
+        path: Path,
+        checkpoint_interval: int = CHECKPOINT_INTERVAL,
+        durability: Optional[str] = None,
+        compact_ratio: float = COMPACT_RATIO,
+        compact_min_bytes: int = COMPACT_MIN_BYTES,
+    ):
+        """初期化
+
+        Args:
+            path: ログファイルのパス
+            checkpoint_interval: チェックポイントを書く間隔
+            durability: 耐久性モード（fsync なら追記ごとに fdatasync する）
+            compact_ratio: コンパクションを起動する不要バイト比率
+            compact_min_bytes: コンパクションを起動する不要バイトの下限
+        """
+        self.path = path
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        self.durability = durability or durable_write.default_durability()
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._ino: Optional[int] = None
+        self._size = 0
+        self._dead_bytes = 0
+        self._refs: Dict[int, List[_RevisionRef]] = {}
+        # draft_id -> (リビジョン番号, 内容)
+        self._latest: "OrderedDict[int, Tuple[int, str]]" = OrderedDict()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    # ----- 内部処理 -----
+    def _load(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = durable_write.open_log(self.path, self.durability)
+        self._ino = os.fstat(self._fd).st_ino
+        self._size = 0
+        self._dead_bytes = 0
+        self._refs = {}
+        self._latest.clear()
+        self._replay()
+
+    def _replay(self) -> None:
+        assert self._fd is not None
+        size = os.fstat(self._fd).st_size
+        if size <= self._size:
+            return
+        buf = os.pread(self._fd, size - self._size, self._size)
+        pos = 0
+        while pos < len(buf):
+            nl = buf.find(b"\n", pos)
+            if nl < 0:
+                break
+            self._apply_line(buf[pos:nl], self._size + pos, nl + 1 - pos)
+            pos = nl + 1
+        self._size += pos
+
+    def _apply_line(self, line: bytes, offset: int, length: int) -> None:
+        try:
+            rec = json.loads(line)
+            draft_id = int(rec["d"])
+            if rec.get("drop"):
+                dropped = self._refs.pop(draft_id, [])
+                self._latest.pop(draft_id, None)
+                self._dead_bytes += length + sum(r.length for r in dropped)
+                return
+            revision = int(rec["r"])
+        except (ValueError, KeyError, TypeError):
+            self._dead_bytes += length
+            return
+        is_full = "full" in rec
+        if not is_full and draft_id not in self._refs:
+            # 基準が無い差分は読み飛ばす
+            self._dead_bytes += length
+            return
+        self._refs.setdefault(draft_id, []).append(
+            _RevisionRef(
+                revision,
+                str(rec.get("at", "")),
+                str(rec.get("title", "")),
+                offset,
+                length,
+                is_full,
+            )
+        )
+
+    def _sync(self) -> None:
+        """他プロセスの追記に追従する"""
+        try:
+            ino = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return
+        if ino != self._ino:
+            self._load()
+        else:
+            self._replay()
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        assert self._fd is not None
+        payload = _encode(rec)
+        durable_write.append_bytes(self._fd, payload, self.durability)
+        self._apply_line(payload[:-1], self._size, len(payload))
+        self._size += len(payload)
+
+    def _read(self, ref: _RevisionRef) -> Dict[str, Any]:
+        assert self._fd is not None
+        rec = json.loads(os.pread(self._fd, ref.length, ref.offset))
+        assert isinstance(rec, dict)
+        return rec
+
+    def _latest_content(self, draft_id: int, refs: List[_RevisionRef]) -> str:
+        """最新リビジョンの内容（保持していれば差分を当て直さない）"""
+        cached = self._latest.get(draft_id)
+        if cached is not None and cached[0] == refs[-1].revision:
+            self._latest.move_to_end(draft_id)
+            return cached[1]
+        content = self._content(refs, len(refs) - 1)
+        self._remember(draft_id, refs[-1].revision, content)
+        return content
+
+    def _remember(self, draft_id: int, revision: int, content: str) -> None:
+        self._latest[draft_id] = (revision, content)
+        self._latest.move_to_end(draft_id)
+        while len(self._latest) > LATEST_CACHE_SIZE:
+            self._latest.popitem(last=False)
+
+    def _maybe_compact(self) -> None:
+        live = self._size - self._dead_bytes
+        if self._dead_bytes >= max(self.compact_min_bytes, live * self.compact_ratio):
+            self._compact()
+
+    def _compact(self) -> None:
+        """生きている下書きのレコードだけを書き直して差し替える"""
+        assert self._fd is not None
+        refs = sorted(
+            (ref for rs in self._refs.values() for ref in rs),
+            key=lambda r: r.offset,
+        )
+        with durable_write.atomic_file(self.path, self.durability) as f:
+            for ref in refs:
+                f.write(os.pread(self._fd, ref.length, ref.offset))
+        before = self._size
+        latest = dict(self._latest)
+        self._load()
+        self._latest.update(latest)
+        _logger.info(
+            "draft_revisions.log compacted: %d -> %d bytes", before, self._size
+        )
+
+    def _content(self, refs: List[_RevisionRef], i: int) -> str:
+        """i 番目の内容を直近のチェックポイントから復元する"""
+        base = i
+        while not refs[base].checkpoint:
+            base -= 1
+        content = ""
+        for ref in refs[base : i + 1]:
+            rec = self._read(ref)
+            if "full" in rec:
+                content = str(rec["full"])
+            else:
+                content = apply_ops(content, rec.get("ops", []))
+        return content
+
+    # ----- 公開 API -----
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def has(self, draft_id: int) -> bool:
+        with self._lock:
+            self._sync()
+            return bool(self._refs.get(draft_id))
+
+    def record(self, draft_id: int, title: str, content: str, created_at: str) -> int:
+        """新しいリビジョンを追記して番号を返す（内容が同じなら追記しない）"""
+        with self._lock:
+            self._sync()
+            refs = self._refs.get(draft_id, [])
+            prev = self._latest_content(draft_id, refs) if refs else None
+            if refs and prev == content and refs[-1].title == title:
+                return refs[-1].revision
+            revision = refs[-1].revision + 1 if refs else 1
+            rec: Dict[str, Any] = {
+                "d": draft_id,
+                "r": revision,
+                "at": created_at,
+                "title": title,
+            }
+            if prev is None or len(refs) % self.checkpoint_interval == 0:
+                rec["full"] = content
+            else:
+                rec["ops"] = diff_ops(prev, content)
+            self._append(rec)
+            self._remember(draft_id, revision, content)
+            return revision
+
+    def drop(self, draft_id: int) -> None:
+        """下書きの履歴を削除する（不要バイトが閾値を超えたら詰め直す）"""
+        with self._lock:
+            self._sync()
+            if draft_id in self._refs:
+                self._append({"d": draft_id, "drop": True})
+                self._maybe_compact()
+
+    def compact(self) -> None:
+        """コンパクションを同期的に実行する"""
+        with self._lock:
+            self._sync()
+            self._compact()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._sync()
+            return {
+                "drafts": len(self._refs),
+                "size": self._size,
+                "dead_bytes": self._dead_bytes,
+            }
+
+    def list_revisions(self, draft_id: int) -> List[Dict[str, Any]]:
+        """リビジョン一覧（古い順）"""
+        with self._lock:
+            self._sync()
+            return [
+                {
+                    "revision": r.revision,
+                    "created_at": r.created_at,
+                    "title": r.title,
+                    "checkpoint": r.checkpoint,
+                }
+                for r in self._refs.get(draft_id, [])
+            ]
+
+    def get(self, draft_id: int, revision: int) -> Optional[Dict[str, Any]]:
+        """直近のチェックポイントから差分を当ててリビジョンを復元する"""
+        with self._lock:
+            self._sync()
+            refs = self._refs.get(draft_id, [])
+            i = bisect.bisect_left([r.revision for r in refs], revision)
+            if i >= len(refs) or refs[i].revision != revision:
+                return None
+            content = self._content(refs, i)
+            ref = refs[i]
+        return {
+            "revision": ref.revision,
+            "created_at": ref.created_at,
+            "title": ref.title,
+            "content": content,
+        }
@@ -0,0 +1,305 @@
+"""JSON ファイルの書き込み（耐久性モードとグループコミット）
+
+耐久性モード（環境変数 BLOGWRITER_DURABILITY）:
+    none   -- rename と同じく一時ファイルに書いて rename する（fsync はしない）
+    rename -- 一時ファイルに書いて rename する（既定。fsync はしない）
+    fsync  -- 一時ファイルを fsync してから rename し、ディレクトリも fsync する。
+              追記ログ（drafts.log など）は追記ごとに fdatasync する
+
+`WriteBehind` は同じファイルへの短時間の連続更新を 1 回のシリアライズ・
+fsync・rename にまとめる。最初の更新から `delay` 秒以内に書き出し、
+それまでの読み取りには `pending()` で未書き込みの内容を返す。
+
+JSON 以外（gzip のセグメント、.npy など）を書き出す場合は `atomic_file()`
+を使う。
+"""
+
+import copy
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+_logger = logging.getLogger(__name__)
+
+DURABILITY_NONE = "none"
+DURABILITY_RENAME = "rename"
+DURABILITY_FSYNC = "fsync"
+DURABILITY_MODES = (DURABILITY_NONE, DURABILITY_RENAME, DURABILITY_FSYNC)
+
+
+def parse_durability(value: Optional[str]) -> str:
+    """環境変数の値を耐久性モードに正規化する（不明な値は rename）"""
+    mode = (value or DURABILITY_RENAME).strip().lower()
+    if mode not in DURABILITY_MODES:
+        _logger.warning("unknown durability mode %r, using rename", value)
+        return DURABILITY_RENAME
+    return mode
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_durability(value: Optional[str]) -> str:
+    return parse_durability(value)
+
+
+def default_durability() -> str:
+    """環境変数 BLOGWRITER_DURABILITY の耐久性モード"""
+    return _cached_durability(os.getenv("BLOGWRITER_DURABILITY"))
+
+
+def _serialize(data: Any, compact: bool = False) -> bytes:
+    if compact:
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+    return text.encode("utf-8")
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _replacing(path: Path, durability: str) -> Iterator[IO[bytes]]:
+    """一時ファイルに書いて path へ rename する（ディレクトリの fsync は呼び出し側）
+
+    途中で失敗しても既存のファイルを壊さないよう、none でも rename する。
+    一時ファイルはプロセス・スレッドごとに別名にする。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            yield f
+            if durability == DURABILITY_FSYNC:
+                f.flush()
+                os.fsync(f.fileno())
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _write_bytes(path: Path, payload: bytes, durability: str) -> None:
+    """payload を書き込む（ディレクトリの fsync は呼び出し側）"""
+    with _replacing(path, durability) as f:
+        f.write(payload)
+
+
+def write_json(
+    path: Path, data: Any, durability: Optional[str] = None, compact: bool = False
+) -> None:
+    """data を JSON で書き込む
+
+    Args:
+        durability: 耐久性モード（省略時は default_durability()）
+        compact: 改行・インデントなしで書く（索引など人が読まないファイル向け）
+    """
+    durability = durability or default_durability()
+    _write_bytes(path, _serialize(data, compact), durability)
+    if durability == DURABILITY_FSYNC:
+        _fsync_dir(path.parent)
+
+
+@contextmanager
+def atomic_file(path: Path, durability: Optional[str] = None) -> Iterator[IO[bytes]]:
+    """一時ファイルを書き込み用に開き、正常に抜けたら path へ rename する
+
+    write_json と同じ一時ファイル名・耐久性モードで書く。
+    """
+    durability = durability or default_durability()
+    with _replacing(path, durability) as f:
+        yield f
+    if durability == DURABILITY_FSYNC:
+        _fsync_dir(path.parent)
+
+
+def open_log(path: Path, durability: str) -> int:
+    """追記ログを O_APPEND で開く（fsync モードで新規作成したらディレクトリも同期）"""
+    created = not path.exists()
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+    if created and durability == DURABILITY_FSYNC:
+        _fsync_dir(path.parent)
+    return fd
+
+
+def append_bytes(fd: int, payload: bytes, durability: str) -> None:
+    """追記ログへ payload を書く（fsync モードでは返る前に fdatasync する）"""
+    os.write(fd, payload)
+    if durability == DURABILITY_FSYNC:
+        sync_fd(fd)
+
+
+def sync_fd(fd: int) -> None:
+    if hasattr(os, "fdatasync"):
+        os.fdatasync(fd)
+    else:  # pragma: no cover - macOS / Windows
+        os.fsync(fd)
+
+
+def fsync_dir(path: Path, durability: str) -> None:
+    """fsync モードのとき、rename や作成を反映するためディレクトリを同期する"""
+    if durability == DURABILITY_FSYNC:
+        _fsync_dir(path)
+
+
+class WriteBehind:
+    """ファイル単位で更新をまとめて書き出すライタ"""
+
+    def __init__(self, delay: float, durability: str = DURABILITY_RENAME):
+        """初期化
+
+        Args:
+            delay: 最初の更新から書き出すまでの待ち時間（秒）
+            durability: 耐久性モード
+        """
+        self.delay = delay
+        self.durability = durability
+        self._cond = threading.Condition()
+        # path -> (最初の更新時刻, 最新の内容)
+        self._pending: Dict[Path, Tuple[float, Any]] = {}
+        # 書き出し中の内容（rename 完了までは読み取りに返す）
+        self._inflight: Dict[Path, Any] = {}
+        # 書き出し中のバッチ数（flush を複数のスレッドが同時に呼ぶことがある）
+        self._busy = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._submits = 0
+        self._writes = 0
+        self._batches = 0
+
+    def submit(self, path: Path, data: Any) -> None:
+        """更新を登録する（呼び出し後に data を変更しないこと）"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("WriteBehind is closed")
+            first = self._pending.get(path, (time.monotonic(), None))[0]
+            self._pending[path] = (first, data)
+            self._submits += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="write-behind", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+
+    def pending(self, path: Path) -> Optional[Any]:
+        """未書き込みの内容のコピー（無ければ None）"""
+        with self._cond:
+            entry = self._pending.get(path)
+            data = entry[1] if entry is not None else self._inflight.get(path)
+        return copy.deepcopy(data) if data is not None else None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """待ち時間を無視して書き出させ、完了まで待つ"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._pending = {p: (0.0, d) for p, (_, d) in self._pending.items()}
+            self._cond.notify_all()
+            while self._pending or self._busy:
+                if self._thread is None or not self._thread.is_alive():
+                    # スレッドが無い（close 後など）場合はこのスレッドで書く
+                    batch = self._take_due_locked(force=True)
+                    if batch:
+                        self._cond.release()
+                        try:
+                            self._write_batch(batch)
+                        finally:
+                            self._cond.acquire()
+                        continue
+                    # 残りは他のスレッドが書き出し中
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self) -> None:
+        """残りを書き出してスレッドを止める"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        th = self._thread
+        if th is not None:
+            th.join(timeout=10)
+        self.flush(timeout=10)
+
+    def stats(self) -> Dict[str, int]:
+        """登録数・実際の書き込み数・書き出し回数"""
+        with self._cond:
+            return {
+                "submits": self._submits,
+                "writes": self._writes,
+                "batches": self._batches,
+                "pending": len(self._pending),
+            }
+
+    # ----- 内部処理 -----
+    def _take_due_locked(self, force: bool) -> List[Tuple[Path, Any]]:
+        now = time.monotonic()
+        due = [
+            p
+            for p, (first, _) in self._pending.items()
+            if force or now - first >= self.delay
+        ]
+        batch = [(p, self._pending.pop(p)[1]) for p in due]
+        if batch:
+            self._busy += 1
+            self._inflight.update(batch)
+        return batch
+
+    def _next_wait_locked(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        oldest = min(first for first, _ in self._pending.values())
+        return max(0.0, oldest + self.delay - time.monotonic())
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    batch = self._take_due_locked(force=self._closed)
+                    if batch:
+                        break
+                    if self._closed:
+                        return
+                    self._cond.wait(self._next_wait_locked())
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Tuple[Path, Any]]) -> None:
+        """_take_due_locked で取り出した空でないバッチを書き出す"""
+        dirs: Set[Path] = set()
+        written = 0
+        try:
+            for path, data in batch:
+                try:
+                    _write_bytes(path, _serialize(data), self.durability)
+                    dirs.add(path.parent)
+                    written += 1
+                except Exception as e:  # noqa: BLE001
+                    _logger.error(f"書き込みエラー {path}: {e}")
+            if self.durability == DURABILITY_FSYNC:
+                # rename の永続化はディレクトリ単位で 1 回にまとめる
+                for d in dirs:
+                    _fsync_dir(d)
+        finally:
+            with self._cond:
+                self._writes += written
+                self._batches += 1
+                for path, _ in batch:
+                    self._inflight.pop(path, None)
+                self._busy -= 1
+                self._cond.notify_all()
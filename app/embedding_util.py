@@ -2,28 +2,50 @@
 
 import pickle
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.neighbors import NearestNeighbors
+
+from app import vector_store
+from app.dense_index import DenseIndex
+from app.ivf_index import DEFAULT_NPROBE, MIN_TRAIN_ROWS, IVFIndex, assign_rows
+from app.quantized_index import QuantizedIndex, quantize_int8
+
+# 近似検索の方式（"none" は常に厳密検索）
+ANN_MODES = ("none", "ivf")
 
 
 class EmbeddingManager:
     """埋め込みベクトルの管理クラス"""
 
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        vector_dtype: str = vector_store.DEFAULT_DTYPE,
+        ann: str = "none",
+        nprobe: int = DEFAULT_NPROBE,
+    ):
         """初期化
 
         Args:
             model_name: 使用する埋め込みモデル名
+            vector_dtype: 保存する埋め込み行列の型（float16 / float32）
+            ann: 近似検索の方式（"none" / "ivf"）
+            nprobe: IVF で検索時に調べるクラスタ数
         """
+        if ann not in ANN_MODES:
+            raise ValueError(f"unsupported ann: {ann}")
         self.model_name = model_name
+        self.vector_dtype = vector_dtype
+        self.ann = ann
+        self.nprobe = nprobe
         self.model: Optional[SentenceTransformer] = None
-        self.index: Optional[NearestNeighbors] = None
+        self.index: Optional[Union[DenseIndex, IVFIndex, QuantizedIndex]] = None
         self.embeddings: Optional[np.ndarray] = None
-        self.texts: List[str] = []
-        self.metadata: List[Dict[str, str]] = []
+        # 読み込み後は必要な行だけをファイルから読む読み取り専用ビュー
+        self.texts: Sequence[str] = []
+        self.metadata: Sequence[Dict[str, str]] = []
 
     def _load_model(self) -> None:
         """埋め込みモデルを遅延ロード"""
@@ -53,14 +75,25 @@ class EmbeddingManager:
         )
         return local_embeddings.astype(np.ndarray)
 
+    def _make_index(self, matrix: Any) -> Union[DenseIndex, IVFIndex]:
+        """ann="ivf" で十分な行数があれば IVF を学習し、それ以外は厳密検索"""
+        dense = DenseIndex(matrix)
+        if self.ann == "ivf" and len(dense) >= MIN_TRAIN_ROWS:
+            return IVFIndex.train(dense.matrix, nprobe=self.nprobe)
+        return dense
+
     def build_index(
-        self, texts: List[str], metadata: Optional[List[Dict[str, str]]] = None
+        self,
+        texts: List[str],
+        metadata: Optional[List[Dict[str, str]]] = None,
+        embeddings: Optional[Any] = None,
     ) -> None:
-        """scikit-learnベースのインデックスを構築
+        """内積による厳密検索インデックスを構築
 
         Args:
             texts: インデックス対象のテキストリスト
             metadata: 各テキストのメタデータ
+            embeddings: 計算済みの正規化済み埋め込み（省略時は texts を埋め込む）
         """
         if not texts:
             raise ValueError("テキストが空です")
@@ -69,17 +102,10 @@ class EmbeddingManager:
         self.metadata = metadata or [{"text": text} for text in texts]
 
         # 埋め込みベクトルを生成
-        self.embeddings = self.encode_texts(texts)
-
-        # scikit-learnのNearestNeighborsを使用（コサイン距離）
-        self.index = NearestNeighbors(
-            n_neighbors=min(50, len(texts)),  # 最大50件
-            metric="cosine",
-            algorithm="brute",  # 小規模データセットには最適
-        )
+        self.embeddings = self.encode_texts(texts) if embeddings is None else embeddings
 
-        # インデックスを構築
-        self.index.fit(self.embeddings)
+        # 正規化済みのため内積がそのままコサイン類似度になる
+        self.index = self._make_index(self.embeddings)
 
     def search(
         self, query: str, top_k: int = 5, min_score: float = 0.1
@@ -94,28 +120,71 @@ class EmbeddingManager:
         Returns:
             (テキスト, メタデータ, スコア)のタプルのリスト
         """
-        if not self.index or not self.texts or self.embeddings is None:
+        if not len(self.texts) or self.embeddings is None:
             return []
 
         # クエリの埋め込みベクトルを生成
         query_embedding = self.encode_texts([query])
+        return self.search_by_vector(query_embedding, top_k, min_score)
 
-        # 検索実行（k近傍）
-        k = min(top_k, len(self.texts))
-        distances, indices = self.index.kneighbors(query_embedding, n_neighbors=k)
+    def search_by_vector(
+        self, query_embedding: Any, top_k: int = 5, min_score: float = 0.1
+    ) -> List[Tuple[str, Dict[str, str], float]]:
+        """埋め込み済みのクエリで検索する（インデックスを変更しない）
 
-        results = []
-        for distance, idx in zip(distances[0], indices[0]):
-            # コサイン距離からコサイン類似度に変換
-            similarity = 1.0 - distance
-            if similarity >= min_score:
-                results.append((self.texts[idx], self.metadata[idx], float(similarity)))
+        Args:
+            query_embedding: encode_texts で得たクエリの埋め込み（1 件）
+            top_k: 返す結果数
+            min_score: 最小類似度スコア
 
+        Returns:
+            (テキスト, メタデータ, スコア)のタプルのリスト
+        """
+        return self.search_by_vectors(query_embedding, top_k, min_score)[0]
+
+    def search_batch(
+        self, queries: List[str], top_k: int = 5, min_score: float = 0.1
+    ) -> List[List[Tuple[str, Dict[str, str], float]]]:
+        """複数クエリをまとめて埋め込み、1 回の行列積で検索する
+
+        Returns:
+            クエリごとの (テキスト, メタデータ, スコア) のリスト
+        """
+        if not queries:
+            return []
+        if self.index is None or not len(self.texts):
+            return [[] for _ in queries]
+        return self.search_by_vectors(self.encode_texts(queries), top_k, min_score)
+
+    def search_by_vectors(
+        self, query_embeddings: Any, top_k: int = 5, min_score: float = 0.1
+    ) -> List[List[Tuple[str, Dict[str, str], float]]]:
+        """埋め込み済みの複数クエリで検索する（インデックスを変更しない）"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        if self.index is None or not len(self.texts):
+            return [[] for _ in range(len(queries))]
+
+        scores, indices = self.index.search_batch(queries, top_k)
+        results: List[List[Tuple[str, Dict[str, str], float]]] = []
+        for row_scores, row_indices in zip(scores, indices):
+            hits = []
+            for score, idx in zip(row_scores, row_indices):
+                # IVF で候補が top_k に満たない分は行番号 -1 で埋まっている
+                if idx >= 0 and score >= min_score:
+                    hits.append((self.texts[idx], self.metadata[idx], float(score)))
+            results.append(hits)
         return results
 
     def save_index(self, filepath: Path) -> None:
         """インデックスをファイルに保存
 
+        filepath にはヘッダ JSON を書き、埋め込み行列・メタデータは同じ
+        ディレクトリの `<filepath>.vectors.npy` などへ書く（app.vector_store）。
+        検索の 1 段目で走査する int8 の符号と、IVF を学習済みならクラスタ中心と
+        所属も一緒に保存する。
+
         テスト仕様:
           - インデックスが未構築でも例外を投げず"空インデックス"としてファイルを生成
           - 引数で与えたパスそのものに書き込む（拡張子を書き換えない）
@@ -123,21 +192,33 @@ class EmbeddingManager:
         Args:
             filepath: 保存先ファイルパス
         """
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-
-        data = {
-            "texts": self.texts,
-            "metadata": self.metadata,
-            "model_name": self.model_name,
-            "embeddings": self.embeddings,
-            "index": self.index,
-        }
-        with open(filepath, "wb") as f:
-            pickle.dump(data, f)
+        vector_store.write_index(
+            filepath,
+            self.embeddings,
+            self.texts,
+            self.metadata,
+            self.model_name,
+            self.vector_dtype,
+            extras=self._index_extras(),
+        )
+
+    def _index_extras(self) -> Dict[str, np.ndarray]:
+        extras: Dict[str, np.ndarray] = {}
+        if self.embeddings is not None and len(self.embeddings):
+            codes, scales = quantize_int8(DenseIndex(self.embeddings).matrix)
+            extras["q8_codes"] = codes
+            extras["q8_scales"] = scales
+        if isinstance(self.index, IVFIndex):
+            extras["ivf_centroids"] = self.index.centroids
+            extras["ivf_assign"] = np.asarray(self.index.assign)
+        return extras
 
     def load_index(self, filepath: Path) -> bool:
         """ファイルからインデックスを読み込み
 
+        埋め込み行列は mmap で開くため、読み込み自体はほぼ I/O を伴わない。
+        旧形式（pickle）のファイルもそのまま読める。
+
         Args:
             filepath: インデックスファイルパス
 
@@ -154,6 +235,17 @@ class EmbeddingManager:
                     return False
                 target = alt
 
+            if vector_store.is_index_header(target):
+                stored = vector_store.read_index(target)
+                if stored is None:
+                    return False
+                self.texts = stored.texts
+                self.metadata = stored.metadata
+                self.model_name = stored.model_name or self.model_name
+                self.embeddings = stored.embeddings
+                self.index = self._stored_index(stored)
+                return True
+
             with open(target, "rb") as f:
                 data = pickle.load(f)
 
@@ -161,13 +253,42 @@ class EmbeddingManager:
             self.metadata = data["metadata"]
             self.model_name = data.get("model_name", self.model_name)
             self.embeddings = data.get("embeddings")
-            self.index = data.get("index")
+            # 旧形式に含まれる sklearn の推定器は使わず、行列から作り直す
+            self.index = (
+                DenseIndex(self.embeddings) if self.embeddings is not None else None
+            )
 
             return True
 
         except Exception:
             return False
 
+    def _stored_index(
+        self, stored: vector_store.StoredIndex
+    ) -> Union[DenseIndex, IVFIndex, QuantizedIndex]:
+        """保存済みの IVF・int8 の符号があれば使う（読み込み時には作り直さない）
+
+        IVF は候補の行だけを走査するため、符号より優先する。
+        """
+        centroids = stored.extras.get("ivf_centroids")
+        assign = stored.extras.get("ivf_assign")
+        if (
+            self.ann == "ivf"
+            and centroids is not None
+            and assign is not None
+            and len(assign) == len(stored.embeddings)
+        ):
+            return IVFIndex(stored.embeddings, centroids, assign, self.nprobe)
+        codes = stored.extras.get("q8_codes")
+        scales = stored.extras.get("q8_scales")
+        if (
+            codes is not None
+            and scales is not None
+            and len(codes) == len(stored.embeddings)
+        ):
+            return QuantizedIndex(stored.embeddings, codes, scales)
+        return DenseIndex(stored.embeddings)
+
     def add_texts(
         self, new_texts: List[str], new_metadata: Optional[List[Dict[str, str]]] = None
     ) -> None:
@@ -180,7 +301,7 @@ class EmbeddingManager:
         if not new_texts:
             return
 
-        if not self.index or self.embeddings is None:
+        if self.embeddings is None or not len(self.texts):
             # インデックスが存在しない場合は新規作成
             self.build_index(new_texts, new_metadata)
             return
@@ -191,18 +312,25 @@ class EmbeddingManager:
         # 既存の埋め込みと結合
         self.embeddings = np.vstack([self.embeddings, new_embeddings])
 
-        # テキストとメタデータを追加
-        self.texts.extend(new_texts)
-        if new_metadata:
-            self.metadata.extend(new_metadata)
-        else:
-            self.metadata.extend([{"text": text} for text in new_texts])
-
-        # インデックスを再構築
-        self.index = NearestNeighbors(
-            n_neighbors=min(50, len(self.texts)), metric="cosine", algorithm="brute"
+        # テキストとメタデータを追加（読み込み済みのビューはリストに展開する）
+        self.texts = list(self.texts) + list(new_texts)
+        self.metadata = list(self.metadata) + (
+            new_metadata or [{"text": text} for text in new_texts]
         )
-        self.index.fit(self.embeddings)
+
+        # 学習済みの IVF は新しい行を既存のクラスタへ割り当てるだけにする
+        if isinstance(self.index, IVFIndex):
+            assign = np.concatenate(
+                [
+                    np.asarray(self.index.assign),
+                    assign_rows(np.asarray(new_embeddings), self.index.centroids),
+                ]
+            )
+            self.index = IVFIndex(
+                self.embeddings, self.index.centroids, assign, self.nprobe
+            )
+        else:
+            self.index = self._make_index(self.embeddings)
 
     def get_stats(self) -> Dict[str, int]:
         """インデックスの統計情報を取得
@@ -212,6 +340,6 @@ class EmbeddingManager:
         """
         return {
             "total_texts": len(self.texts),
-            "index_size": len(self.texts) if self.index else 0,
+            "index_size": len(self.texts) if self.embeddings is not None else 0,
             "dimension": self.embeddings.shape[1] if self.embeddings is not None else 0,
         }
@@ -0,0 +1,265 @@
+"""EPUB 取り込みのパイプライン（並列の解析・チャンク分割 + 1 つの埋め込みステージ）
+
+EPUB の HTML の解析とチャンク分割はプロセスプールで並列に行い、
+呼び出し元のスレッドが埋め込みステージとして解析済みの書籍のチャンクを
+書籍をまたいで batch_size 件ずつまとめて埋め込む。埋め込みの間も
+ワーカーは次の書籍を解析する。全チャンクの埋め込みがそろった書籍から
+順に finish を呼ぶ。
+
+ワーカーは spawn で起動し、このモジュールと app.epub_util だけを読み込む
+（埋め込みモデルは読み込まない）。workers が 1 以下なら同じプロセスで解析する。
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.epub_util import chunk_text, extract_text_from_epub
+
+_logger = logging.getLogger(__name__)
+
+# 解析ワーカー数と 1 回に埋め込むチャンク数
+DEFAULT_WORKERS = int(
+    os.getenv("BLOGWRITER_INGEST_WORKERS", "") or min(4, os.cpu_count() or 1)
+)
+DEFAULT_BATCH_SIZE = int(os.getenv("BLOGWRITER_INGEST_BATCH_SIZE", "256") or 256)
+
+
+@dataclass
+class ParsedBook:
+    """解析・チャンク分割済みの書籍"""
+
+    epub_path: Path
+    book_title: str
+    chunks: List[str]
+    metadata: List[Dict[str, str]]
+
+
+def parse_book(
+    epub_path: Path,
+    chunk_size: int = 500,
+    overlap: int = 50,
+    extract: Callable[[Path], Tuple[str, Dict[str, str]]] = extract_text_from_epub,
+) -> ParsedBook:
+    """EPUB からテキストを抽出してチャプターごとにチャンクへ分割する"""
+    book_title, chapters = extract(epub_path)
+    chunks: List[str] = []
+    metadata: List[Dict[str, str]] = []
+    for chapter_title, chapter_text in chapters.items():
+        for i, chunk in enumerate(chunk_text(chapter_text, chunk_size, overlap)):
+            chunks.append(chunk)
+            metadata.append(
+                {
+                    "book_title": book_title,
+                    "chapter_title": chapter_title,
+                    "chunk_index": str(i),
+                    "file_path": str(epub_path),
+                    "text": chunk,
+                }
+            )
+    if not chunks:
+        raise ValueError(f"有効なテキストが見つかりません: {epub_path}")
+    return ParsedBook(epub_path, book_title, chunks, metadata)
+
+
+@dataclass
+class IngestStats:
+    """取り込みの件数と所要時間"""
+
+    books: int = 0
+    chunks: int = 0
+    encoded_chunks: int = 0
+    batches: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    encode_seconds: float = 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        """取り込んだ全チャンク数 / 経過時間"""
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def encoded_per_sec(self) -> float:
+        """埋め込んだチャンク数 / 埋め込みにかかった時間"""
+        return (
+            self.encoded_chunks / self.encode_seconds
+            if self.encode_seconds > 0
+            else 0.0
+        )
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "books": self.books,
+            "chunks": self.chunks,
+            "encoded_chunks": self.encoded_chunks,
+            "batches": self.batches,
+            "failed": self.failed,
+            "seconds": round(self.seconds, 3),
+            "chunks_per_sec": round(self.chunks_per_sec, 1),
+            "encoded_per_sec": round(self.encoded_per_sec, 1),
+        }
+
+
+# 書籍の前回の埋め込みを調べ、(使い回した行を埋めた行列, 埋め込むチャンクの位置) を返す
+Prepare = Callable[[ParsedBook], Tuple[Optional[np.ndarray], List[int]]]
+# 全チャンクの埋め込みがそろった書籍を受け取る（埋め込んだチャンク数つき）
+Finish = Callable[[ParsedBook, Optional[np.ndarray], int], None]
+OnError = Callable[[Path, Exception], None]
+
+
+@dataclass
+class _Pending:
+    book: ParsedBook
+    matrix: Optional[np.ndarray]
+    missing: List[int]
+    remaining: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.remaining = len(self.missing)
+
+
+class IngestPipeline:
+    """並列に解析した書籍をまとめて埋め込む取り込みパイプライン"""
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], Any],
+        workers: int = DEFAULT_WORKERS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        """初期化
+
+        Args:
+            encode: テキストのリストを正規化済みの埋め込みに変換する関数
+            workers: 解析ワーカーのプロセス数（1 以下なら同じプロセスで解析）
+            batch_size: 1 回に埋め込むチャンク数
+        """
+        self.encode = encode
+        self.workers = max(0, workers)
+        self.batch_size = max(1, batch_size)
+
+    def _parsed(
+        self, paths: List[Path], parse: Callable[[Path], ParsedBook]
+    ) -> Iterator[Tuple[Path, Any]]:
+        """解析の終わった順に (パス, ParsedBook または例外) を返す"""
+        if self.workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                try:
+                    yield path, parse(path)
+                except Exception as e:
+                    yield path, e
+            return
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(paths)), mp_context=context
+        ) as pool:
+            futures: Dict[Future[ParsedBook], Path] = {
+                pool.submit(parse, path): path for path in paths
+            }
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except Exception as e:
+                    yield futures[future], e
+
+    def run(
+        self,
+        paths: List[Path],
+        parse: Callable[[Path], ParsedBook],
+        prepare: Prepare,
+        finish: Finish,
+        on_error: Optional[OnError] = None,
+    ) -> IngestStats:
+        """paths の EPUB を取り込む
+
+        Args:
+            paths: 取り込む EPUB のパス
+            parse: 1 冊を解析する関数（ワーカーで呼ぶため pickle できること）
+            prepare: 前回の埋め込みを調べる関数（埋め込みステージで呼ぶ）
+            finish: 埋め込みのそろった書籍を保存する関数
+            on_error: 解析・保存に失敗した書籍を受け取る関数
+        """
+        stats = IngestStats()
+        started = time.perf_counter()
+        queue: Deque[Tuple[_Pending, int]] = deque()
+
+        def fail(path: Path, error: Exception) -> None:
+            stats.failed += 1
+            _logger.error(f"取り込みエラー {path}: {error}")
+            if on_error is not None:
+                on_error(path, error)
+
+        def done(pending: _Pending) -> None:
+            book = pending.book
+            try:
+                finish(book, pending.matrix, len(pending.missing))
+            except Exception as e:
+                fail(book.epub_path, e)
+                return
+            stats.books += 1
+            stats.chunks += len(book.chunks)
+
+        def encode_batch(size: int) -> None:
+            batch = [queue.popleft() for _ in range(min(size, len(queue)))]
+            encode_started = time.perf_counter()
+            try:
+                vectors = np.asarray(
+                    self.encode([p.book.chunks[i] for p, i in batch]),
+                    dtype=np.float32,
+                )
+            except Exception as e:
+                # 埋め込めなかったチャンクを含む書籍は残りのチャンクも捨てる
+                failed = {id(p): p for p, _ in batch}
+                for pending in failed.values():
+                    fail(pending.book.epub_path, e)
+                kept = [(p, i) for p, i in queue if id(p) not in failed]
+                queue.clear()
+                queue.extend(kept)
+                return
+            stats.encode_seconds += time.perf_counter() - encode_started
+            stats.encoded_chunks += len(batch)
+            stats.batches += 1
+            for (pending, i), vector in zip(batch, vectors):
+                if pending.matrix is None:
+                    pending.matrix = np.empty(
+                        (len(pending.book.chunks), len(vector)), dtype=np.float32
+                    )
+                pending.matrix[i] = vector
+                pending.remaining -= 1
+                if pending.remaining == 0:
+                    done(pending)
+
+        for path, parsed in self._parsed(paths, parse):
+            if isinstance(parsed, Exception):
+                fail(path, parsed)
+                continue
+            try:
+                matrix, missing = prepare(parsed)
+            except Exception as e:
+                fail(path, e)
+                continue
+            pending = _Pending(parsed, matrix, missing)
+            if not missing:
+                done(pending)
+                continue
+            queue.extend((pending, i) for i in missing)
+            while len(queue) >= self.batch_size:
+                encode_batch(self.batch_size)
+        while queue:
+            encode_batch(self.batch_size)
+
+        stats.seconds = time.perf_counter() - started
+        _logger.info(
+            f"取り込み完了: {stats.books}冊 {stats.chunks}チャンク "
+            f"({stats.chunks_per_sec:.1f} チャンク/秒、埋め込み {stats.encoded_chunks})"
+        )
+        return stats
@@ -0,0 +1,74 @@
+"""プロセス間のアドバイザリファイルロック
+
+データファイルごとに `<name>.lock` のサイドカーを置き、`fcntl.flock` で
+共有/排他ロックを取る。複数の uvicorn ワーカーが同じ DATA_DIR を更新しても
+read-modify-write が失われないようにする。`fcntl` の無い環境では何もしない。
+
+他プロセスによる書き換えの検知には `stat_key()` を使う。
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+try:
+    import fcntl
+
+    _HAS_FCNTL = True
+except ImportError:  # pragma: no cover - Windows
+    _HAS_FCNTL = False
+
+
+StatKey = Tuple[int, int, int]
+
+
+def stat_key(path: Path) -> Optional[StatKey]:
+    """ファイルの (inode, mtime_ns, size)（無ければ None）
+
+    rename による差し替えと追記・上書きのどちらでも変わるため、
+    プロセス内キャッシュの有効性の判定に使う。
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def lock_path_for(path: Path) -> Path:
+    """データファイルに対応するロックファイルのパス"""
+    return path.with_name(path.name + ".lock")
+
+
+def acquire(path: Path, exclusive: bool) -> Optional[int]:
+    """ロックファイルを開いてロックし、解放用の fd を返す"""
+    if not _HAS_FCNTL:
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def release(fd: Optional[int]) -> None:
+    if fd is None or not _HAS_FCNTL:
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def locked(path: Path, exclusive: bool = True) -> Iterator[None]:
+    """`path` をロックファイルとしてロックする"""
+    fd = acquire(path, exclusive)
+    try:
+        yield
+    finally:
+        release(fd)
@@ -0,0 +1,145 @@
+"""保存した記事をバックグラウンドでまとめて git commit するキュー
+
+短い時間内に保存された記事を 1 コミットにまとめ、リクエストスレッドでは
+git を実行しない。結果は `on_status(filenames, status, commit)` で通知する。
+"""
+
+import logging
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+_logger = logging.getLogger(__name__)
+
+# 最後の投入からこの秒数だけ待ってまとめてコミットする
+COMMIT_WINDOW_SECONDS = 2.0
+# 1 コミットにまとめる最大件数
+MAX_BATCH = 50
+
+STATUS_PENDING = "pending"
+STATUS_COMMITTED = "committed"
+STATUS_FAILED = "failed"
+
+StatusCallback = Callable[[List[str], str, Optional[str]], None]
+
+
+class GitCommitQueue:
+    """記事ファイルのコミット待ち行列"""
+
+    def __init__(
+        self,
+        on_status: StatusCallback,
+        window: float = COMMIT_WINDOW_SECONDS,
+        cwd: Optional[Path] = None,
+    ):
+        """初期化
+
+        Args:
+            on_status: コミット結果の通知先 (ファイル名一覧, 状態, コミット ID)
+            window: まとめる待ち時間（秒）
+            cwd: git を実行するディレクトリ（None でカレント）
+        """
+        self.on_status = on_status
+        self.window = window
+        self.cwd = cwd
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[Path, str]] = []
+        self._last_submit = 0.0
+        self._busy = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, path: Path, title: str) -> None:
+        """コミット対象を追加する（同じファイルは 1 回にまとめる）"""
+        with self._cond:
+            if all(p != path for p, _ in self._queue):
+                self._queue.append((path, title))
+            self._last_submit = time.monotonic()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="git-committer", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """待ち時間を無視して処理させ、キューが空になるまで待つ"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._last_submit = 0.0
+            self._cond.notify_all()
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        th = self._thread
+        if th is not None:
+            th.join(timeout=5)
+
+    def _take_batch(self) -> Optional[List[Tuple[Path, str]]]:
+        with self._cond:
+            while True:
+                if self._closed and not self._queue:
+                    return None
+                if self._queue:
+                    wait = self._last_submit + self.window - time.monotonic()
+                    if wait <= 0 or len(self._queue) >= MAX_BATCH or self._closed:
+                        batch = self._queue[:MAX_BATCH]
+                        del self._queue[:MAX_BATCH]
+                        self._busy = True
+                        return batch
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                status, commit = self._commit(batch)
+            except Exception as e:  # noqa: BLE001
+                _logger.error(f"git コミットエラー: {e}")
+                status, commit = STATUS_FAILED, None
+            try:
+                self.on_status([p.name for p, _ in batch], status, commit)
+            except Exception as e:  # noqa: BLE001
+                _logger.error(f"git コミット状態の記録エラー: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _git(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["git", *args], cwd=self.cwd, capture_output=True, text=True, check=False
+        )
+
+    def _commit(self, batch: List[Tuple[Path, str]]) -> Tuple[str, Optional[str]]:
+        paths = [str(p) for p, _ in batch if p.exists()]
+        if not paths:
+            return STATUS_FAILED, None
+        if self._git("add", "--", *paths).returncode != 0:
+            return STATUS_FAILED, None
+        titles = [t or "untitled" for _, t in batch]
+        if len(titles) == 1:
+            msg = f"Add post: {titles[0]}"
+        else:
+            msg = f"Add {len(titles)} posts\n\n" + "\n".join(f"- {t}" for t in titles)
+        res = self._git("commit", "-m", msg, "--", *paths)
+        if res.returncode != 0:
+            _logger.warning("git commit failed: %s", res.stderr.strip())
+            return STATUS_FAILED, None
+        head = self._git("rev-parse", "HEAD")
+        commit = head.stdout.strip() if head.returncode == 0 else None
+        return STATUS_COMMITTED, commit
@@ -0,0 +1,251 @@
+"""生成履歴のアーカイブ（月単位の圧縮セグメント + 要約索引）
+
+ホットな `generation_history.json` からあふれた古い履歴を、作成月ごとの
+不変な `YYYY-MM-<最小ID>.jsonl.gz` セグメントへ書き出す。`index.json` には
+セグメント一覧と、一覧表示用の要約（本文なし）と所属セグメントを持つため、
+一覧はセグメントを展開せずに返せ、ID 指定の取得は該当セグメント 1 つだけを
+展開する。セグメントは追記後に変更しないが、削除だけは本文を残さないよう
+該当セグメントを残りの履歴で書き直す（空になったらファイルごと消す）。
+ロックは呼び出し側（app.storage）が取る。
+"""
+
+import bisect
+import gzip
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.durable_write import atomic_file, default_durability, write_json
+from app.file_lock import StatKey, stat_key
+
+_logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+# 要約に残すプレビューの最大文字数
+PREVIEW_CHARS = 200
+
+_SUMMARY_KEYS = (
+    "title",
+    "template_type",
+    "widgets_used",
+    "properties",
+    "created_at",
+)
+
+
+def _created_key(item: Dict[str, Any]) -> Tuple[str, int]:
+    return (str(item.get("created_at", "")), int(item["id"]))
+
+
+def _month(created_at: str) -> str:
+    # ISO 8601 の先頭 7 文字（YYYY-MM）。不正な値は 1 つにまとめる
+    month = created_at[:7]
+    return month if len(month) == 7 and month[4] == "-" else "unknown"
+
+
+class HistoryArchive:
+    """古い生成履歴の圧縮アーカイブ"""
+
+    def __init__(self, root: Path, durability: Optional[str] = None):
+        """初期化
+
+        Args:
+            root: セグメントと index.json を置くディレクトリ
+            durability: 耐久性モード
+        """
+        self.root = root
+        self.durability = durability or default_durability()
+        self.index_path = root / "index.json"
+        self._segments: List[Dict[str, Any]] = []
+        # id 昇順の要約
+        self._items: List[Dict[str, Any]] = []
+        self._ids: List[int] = []
+        # (created_at, id) 昇順の要約とそのキー（カーソルでのページング用）
+        self._by_created: List[Dict[str, Any]] = []
+        self._created_keys: List[Tuple[str, int]] = []
+        self._file_key: Optional[StatKey] = None
+
+    # ----- 内部処理 -----
+    def _load_if_changed(self) -> None:
+        """他プロセスが書き換えた索引を読み直す"""
+        key = stat_key(self.index_path)
+        if key == self._file_key:
+            return
+        self._segments, self._items, self._ids = [], [], []
+        self._reorder()
+        self._file_key = key
+        if key is None:
+            return
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return
+        self._segments = list(data.get("segments", []))
+        self._items = sorted(data.get("items", []), key=lambda it: int(it["id"]))
+        self._ids = [int(it["id"]) for it in self._items]
+        self._reorder()
+
+    def _reorder(self) -> None:
+        self._by_created = sorted(self._items, key=_created_key)
+        self._created_keys = [_created_key(it) for it in self._by_created]
+
+    def _save_index(self) -> None:
+        payload = {
+            "version": INDEX_VERSION,
+            "segments": self._segments,
+            "items": self._items,
+        }
+        write_json(self.index_path, payload, self.durability, compact=True)
+        self._file_key = stat_key(self.index_path)
+
+    def _write_segment(
+        self, month: str, items: List[Dict[str, Any]], name: Optional[str] = None
+    ) -> str:
+        name = name or f"{month}-{int(items[0]['id']):08d}.jsonl.gz"
+        with atomic_file(self.root / name, self.durability) as raw:
+            with gzip.open(raw, "wt", encoding="utf-8") as f:
+                for it in items:
+                    f.write(json.dumps(it, ensure_ascii=False, separators=(",", ":")))
+                    f.write("\n")
+        return name
+
+    def _read_segment(self, name: str) -> List[Dict[str, Any]]:
+        try:
+            with gzip.open(self.root / name, "rt", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except (OSError, EOFError, json.JSONDecodeError) as e:
+            _logger.error(f"履歴アーカイブの読み込みエラー {name}: {e}")
+            return []
+
+    def _position(self, history_id: int) -> Optional[int]:
+        i = bisect.bisect_left(self._ids, history_id)
+        if i < len(self._ids) and self._ids[i] == history_id:
+            return i
+        return None
+
+    # ----- 公開 API -----
+    def append(self, items: List[Dict[str, Any]]) -> int:
+        """本文を含む履歴をセグメントへ書き出して索引に加える（件数を返す）"""
+        self._load_if_changed()
+        # 前回ホットファイルの更新前に中断した分は二重に書かない
+        fresh = [it for it in items if self._position(int(it["id"])) is None]
+        if not fresh:
+            return 0
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for it in sorted(fresh, key=lambda x: int(x["id"])):
+            groups.setdefault(_month(str(it.get("created_at", ""))), []).append(it)
+        for month, group in sorted(groups.items()):
+            name = self._write_segment(month, group)
+            self._segments.append(
+                {
+                    "name": name,
+                    "month": month,
+                    "count": len(group),
+                    "id_min": int(group[0]["id"]),
+                    "id_max": int(group[-1]["id"]),
+                }
+            )
+            for it in group:
+                summary = {k: it.get(k) for k in _SUMMARY_KEYS}
+                content = str(it.get("generated_content", ""))
+                summary.update(
+                    id=int(it["id"]),
+                    content_length=len(content),
+                    preview=content[:PREVIEW_CHARS],
+                    segment=name,
+                )
+                self._items.append(summary)
+        self._items.sort(key=lambda it: int(it["id"]))
+        self._ids = [int(it["id"]) for it in self._items]
+        self._reorder()
+        # 索引の差し替えを最後に行い、途中で落ちても孤立セグメントが残るだけにする
+        self._save_index()
+        return len(fresh)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """アーカイブ済み履歴の要約（id 昇順・本文なし。変更しないこと）"""
+        self._load_if_changed()
+        return list(self._items)
+
+    def page(
+        self, after: Optional[Tuple[str, int]], limit: int
+    ) -> List[Dict[str, Any]]:
+        """(created_at, id) が after より前の要約を新しい順に最大 limit 件返す
+
+        キーの昇順リストを二分探索してカーソルの位置から切り出すため、
+        ページごとのコストはアーカイブ全体の件数によらない。
+        """
+        self._load_if_changed()
+        end = len(self._created_keys)
+        if after is not None:
+            end = bisect.bisect_left(self._created_keys, after)
+        start = max(0, end - max(0, limit))
+        return self._by_created[start:end][::-1]
+
+    def get(self, history_id: int) -> Optional[Dict[str, Any]]:
+        """該当セグメントだけを展開して履歴を返す"""
+        self._load_if_changed()
+        i = self._position(history_id)
+        if i is None:
+            return None
+        for it in self._read_segment(str(self._items[i]["segment"])):
+            if int(it.get("id", -1)) == history_id:
+                return it
+        return None
+
+    def delete(self, history_id: int) -> bool:
+        """索引から外し、セグメントを本文ごと書き直す（空になったら消す）"""
+        self._load_if_changed()
+        i = self._position(history_id)
+        if i is None:
+            return False
+        segment = str(self._items[i]["segment"])
+        del self._items[i]
+        del self._ids[i]
+        self._reorder()
+        live = {int(it["id"]) for it in self._items if it["segment"] == segment}
+        if not live:
+            self._segments = [s for s in self._segments if s["name"] != segment]
+            self._save_index()
+            (self.root / segment).unlink(missing_ok=True)
+            return True
+        # 先にセグメントを差し替える（索引の保存前に落ちても本文は残らない）
+        kept = [
+            it for it in self._read_segment(segment) if int(it.get("id", -1)) in live
+        ]
+        if len(kept) != len(live):
+            # 読めなかったセグメントは残りの履歴を失わないよう書き直さない
+            _logger.error(f"履歴アーカイブを書き直せません {segment}")
+            self._save_index()
+            return True
+        for seg in self._segments:
+            if seg["name"] == segment:
+                self._write_segment(str(seg["month"]), kept, segment)
+                seg.update(
+                    count=len(kept),
+                    id_min=int(kept[0]["id"]),
+                    id_max=int(kept[-1]["id"]),
+                )
+        self._save_index()
+        return True
+
+    def export(self) -> List[Dict[str, Any]]:
+        """索引に残っている全履歴を本文付きで返す（SQLite への移行用）"""
+        self._load_if_changed()
+        live: Set[int] = set(self._ids)
+        out: List[Dict[str, Any]] = []
+        for seg in self._segments:
+            out.extend(
+                it
+                for it in self._read_segment(str(seg["name"]))
+                if int(it.get("id", -1)) in live
+            )
+        return sorted(out, key=lambda it: int(it["id"]))
+
+    def stats(self) -> Dict[str, int]:
+        self._load_if_changed()
+        return {"segments": len(self._segments), "items": len(self._items)}
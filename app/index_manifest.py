@@ -0,0 +1,99 @@
+"""EPUB の再インデックス判定用のマニフェスト
+
+インデックス化した EPUB ごとに、ファイルの (サイズ, mtime, sha256) と
+インデックス化の条件（モデル名・チャンクサイズ・オーバーラップ）を
+キャッシュディレクトリの manifest.json に記録する。
+
+    {"version": 1,
+     "files": {EPUB のパス: {"book_title", "size", "mtime_ns", "sha256",
+                            "model_name", "chunk_size", "overlap"}}}
+
+サイズと mtime が同じファイルは読まずに変更なしとみなし、異なる場合も
+sha256 が同じなら変更なし（mtime だけ更新）とする。
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app import file_lock
+from app.durable_write import write_json
+
+MANIFEST_VERSION = 1
+_HASH_BLOCK = 1 << 20
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    """manifest.json の読み書き
+
+    変更は save() まで書き出さない。複数プロセスからの更新は locked() の
+    中で load() から save() までを行う。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+
+    def locked(self) -> Any:
+        return file_lock.locked(file_lock.lock_path_for(self.path))
+
+    def load(self) -> None:
+        self.files = {}
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.files = dict(data.get("files") or {})
+
+    def save(self) -> None:
+        write_json(
+            self.path, {"version": MANIFEST_VERSION, "files": self.files}, compact=True
+        )
+
+    def unchanged(self, epub_path: Path, conditions: Dict[str, Any]) -> bool:
+        """前回と同じ内容・条件でインデックス化済みか
+
+        内容が同じで mtime だけ変わった場合は記録を更新して True を返す。
+        """
+        entry = self.files.get(str(epub_path))
+        if entry is None or any(entry.get(k) != v for k, v in conditions.items()):
+            return False
+        try:
+            st = epub_path.stat()
+        except OSError:
+            return False
+        if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            return True
+        if entry.get("size") != st.st_size or entry.get("sha256") != file_sha256(
+            epub_path
+        ):
+            return False
+        entry["mtime_ns"] = st.st_mtime_ns
+        return True
+
+    def record(
+        self, epub_path: Path, book_title: str, conditions: Dict[str, Any]
+    ) -> None:
+        st = epub_path.stat()
+        self.files[str(epub_path)] = {
+            "book_title": book_title,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": file_sha256(epub_path),
+            **conditions,
+        }
+
+    def book_title(self, epub_path: Path) -> Optional[str]:
+        entry = self.files.get(str(epub_path))
+        return str(entry["book_title"]) if entry else None
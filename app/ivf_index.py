@@ -0,0 +1,189 @@
+"""転置ファイル（IVF）による近似最近傍検索
+
+正規化済みの埋め込みを球面 k-means で `nlist` 個のクラスタに分け、各行の
+所属クラスタ（assign）を持つ。検索ではクエリに近いクラスタを `nprobe` 個
+選び、そこに属する行だけと内積を取る。`nprobe` を増やすほど厳密検索に
+近づき（再現率が上がり）、遅くなる。
+
+所属の判定は assign 配列との比較だけで済むため、行の追加は新しい行を
+既存のクラスタに割り当てて assign を伸ばすだけで行える。
+"""
+
+import math
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.dense_index import DenseIndex, top_k_indices
+
+DEFAULT_NPROBE = 8
+# これより行数が少ない場合は IVF を作らずに厳密検索する
+MIN_TRAIN_ROWS = 4096
+KMEANS_ITERATIONS = 10
+# k-means の学習に使う行数の上限
+TRAIN_SAMPLE_ROWS = 65536
+_ASSIGN_BLOCK_ROWS = 8192
+
+
+def default_nlist(rows: int) -> int:
+    return int(min(4096, max(16, math.sqrt(rows))))
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    normalized: np.ndarray = x / norms
+    return normalized
+
+
+def assign_rows(matrix: Any, centroids: np.ndarray) -> np.ndarray:
+    """各行に最も近いクラスタ番号（int32）"""
+    n = int(matrix.shape[0])
+    out = np.empty(n, dtype=np.int32)
+    for start in range(0, n, _ASSIGN_BLOCK_ROWS):
+        block = np.asarray(matrix[start : start + _ASSIGN_BLOCK_ROWS], np.float32)
+        out[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(
+    matrix: Any,
+    nlist: Optional[int] = None,
+    iterations: int = KMEANS_ITERATIONS,
+    seed: int = 0,
+) -> np.ndarray:
+    """行列の標本から球面 k-means でクラスタ中心（正規化済み float32）を求める"""
+    n = int(matrix.shape[0])
+    nlist = min(nlist or default_nlist(n), n)
+    rng = np.random.default_rng(seed)
+    if n > TRAIN_SAMPLE_ROWS:
+        rows = np.sort(rng.choice(n, TRAIN_SAMPLE_ROWS, replace=False))
+        sample = np.asarray(matrix[rows], dtype=np.float32)
+    else:
+        sample = np.asarray(matrix, dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign_rows(sample, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.add.reduceat(sample[order], starts[filled], axis=0)
+        centroids[filled] = sums
+        # 空のクラスタは標本の別の行から選び直す
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty))]
+        centroids = _normalize(centroids)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """IVF による近似検索インデックス（DenseIndex と同じ検索 API を持つ）"""
+
+    def __init__(
+        self,
+        matrix: Any,
+        centroids: Any,
+        assign: Any,
+        nprobe: int = DEFAULT_NPROBE,
+    ):
+        """初期化
+
+        Args:
+            matrix: (件数, 次元) の正規化済み埋め込み行列（mmap 可）
+            centroids: (nlist, 次元) のクラスタ中心
+            assign: 各行の所属クラスタ（件数分）
+            nprobe: 検索時に調べるクラスタ数
+        """
+        self.exact = DenseIndex(matrix)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assign = assign
+        self.nprobe = max(1, nprobe)
+
+    @classmethod
+    def train(
+        cls,
+        matrix: Any,
+        nlist: Optional[int] = None,
+        nprobe: int = DEFAULT_NPROBE,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        centroids = train_centroids(matrix, nlist, seed=seed)
+        return cls(matrix, centroids, assign_rows(matrix, centroids), nprobe)
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    def candidates(self, query: Any, nprobe: Optional[int] = None) -> np.ndarray:
+        """クエリに近い nprobe 個のクラスタに属する行番号"""
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        probes = top_k_indices(self.centroids @ q, nprobe or self.nprobe)
+        selected = np.zeros(self.nlist, dtype=bool)
+        selected[probes] = True
+        return np.flatnonzero(selected[self.assign])
+
+    def search(
+        self, query: Any, k: int, nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """1 クエリの上位 k 件の (類似度, 行番号)（候補が k 未満なら短くなる）"""
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        rows = self.candidates(q, nprobe)
+        if len(rows) == 0 or k <= 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        scores = DenseIndex(self.exact.matrix[rows]).scores(q)
+        top = top_k_indices(scores, k)
+        return scores[top], rows[top]
+
+    def search_batch(
+        self, queries: Any, k: int, nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """複数クエリの上位 k 件（足りない分は類似度 -inf・行番号 -1 で埋める）"""
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim == 1:
+            q = q.reshape(1, -1)
+        k = max(0, min(k, len(self)))
+        scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+        indices = np.full((len(q), k), -1, dtype=np.int64)
+        for i, query in enumerate(q):
+            s, idx = self.search(query, k, nprobe)
+            scores[i, : len(s)] = s
+            indices[i, : len(idx)] = idx
+        return scores, indices
+
+    def recall_report(
+        self,
+        queries: Any,
+        k: int = 10,
+        nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32),
+    ) -> List[Dict[str, float]]:
+        """厳密検索に対する recall@k と 1 クエリあたりの時間を nprobe ごとに測る"""
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim == 1:
+            q = q.reshape(1, -1)
+        started = time.perf_counter()
+        exact = np.stack([self.exact.search(query, k)[1] for query in q])
+        exact_ms = (time.perf_counter() - started) * 1000 / max(1, len(q))
+        report: List[Dict[str, float]] = []
+        for nprobe in sorted({min(p, self.nlist) for p in nprobes if p > 0}):
+            started = time.perf_counter()
+            found = [self.search(query, k, nprobe)[1] for query in q]
+            elapsed = (time.perf_counter() - started) * 1000 / max(1, len(q))
+            hit = sum(len(np.intersect1d(idx, exact[i])) for i, idx in enumerate(found))
+            scanned = sum(len(self.candidates(query, nprobe)) for query in q)
+            report.append(
+                {
+                    "nprobe": nprobe,
+                    "k": k,
+                    "recall": round(hit / max(1, exact.size), 4),
+                    "mean_ms": round(elapsed, 3),
+                    "exact_mean_ms": round(exact_ms, 3),
+                    "scanned_fraction": round(scanned / max(1, len(q) * len(self)), 4),
+                }
+            )
+        return report
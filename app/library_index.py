@@ -0,0 +1,564 @@
+"""全書籍をまたぐ埋め込み行列（書籍オフセット表つき）
+
+書籍ごとのインデックス（app.vector_store）の行列を 1 つの float16 の
+生データファイルに連結し、書籍名 -> (開始行, 行数) の表で管理する。
+
+    library.json       {"version", "model_name", "dim", "generation", "rows",
+                        "books": {書籍名: {"path", "offset", "count", "source"}}}
+    vectors-<世代>.f16  全書籍の行列を連結したもの（追記のみ）
+    codes-<世代>.i8     行列を int8 に量子化した符号（追記のみ）
+    scales-<世代>.f32   符号の行ごとの倍率（追記のみ）
+    centroids-<n>.npy  IVF のクラスタ中心（ann="ivf" のとき）
+    assign-<n>.i32     行列の各行の所属クラスタ（追記のみ）
+
+書籍の追加は行列ファイルへの追記と library.json の置き換えだけで済む。
+削除・再インデックスで参照されなくなった行は表から外すだけにし、
+使われていない行が半分を超えたら新しい世代のファイルへ詰め直す。
+全書籍の検索は int8 の符号とクエリの内積 1 回で書籍の範囲ごとに候補を選び、
+候補の行だけを float16 の行列で並べ直す（app.quantized_index）。
+テキストとメタデータは各書籍のインデックスから該当行だけを読む。
+
+ann="ivf" の場合は行列の変更のたびに IVF（app.ivf_index）を更新する。
+追加された行は既存のクラスタへ割り当てるだけにし、学習時の 2 倍を
+超える行数になったら学習し直す。詰め直した後も学習し直す。
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app import file_lock, vector_store
+from app.dense_index import DenseIndex, top_k_indices
+from app.durable_write import write_json
+from app.ivf_index import (
+    DEFAULT_NPROBE,
+    MIN_TRAIN_ROWS,
+    IVFIndex,
+    assign_rows,
+    train_centroids,
+)
+from app.quantized_index import QuantizedIndex, quantize_int8, rerank_count
+
+_logger = logging.getLogger(__name__)
+
+LIBRARY_VERSION = 2
+LIBRARY_DTYPE = np.float16
+# 使われていない行がこの割合を超えたら詰め直す
+COMPACT_RATIO = 0.5
+# 学習時の行数のこの倍を超えたら IVF を学習し直す
+RETRAIN_GROWTH = 2.0
+
+
+def _top_k(scores: np.ndarray, k: int, min_score: float) -> np.ndarray:
+    """スコアの高い順に最大 k 個の位置（min_score 未満は除く）"""
+    order = top_k_indices(scores, k)
+    keep: np.ndarray = order[scores[order] >= min_score]
+    return keep
+
+
+class LibraryIndex:
+    """全書籍の埋め込み行列"""
+
+    def __init__(
+        self,
+        root: Path,
+        model_name: str,
+        ann: str = "none",
+        nprobe: int = DEFAULT_NPROBE,
+    ):
+        """初期化
+
+        Args:
+            root: library.json と行列ファイルを置くディレクトリ
+            model_name: 埋め込みモデル名（異なるモデルの書籍は含めない）
+            ann: 近似検索の方式（"none" / "ivf"）
+            nprobe: IVF で検索時に調べるクラスタ数
+        """
+        self.root = root
+        self.model_name = model_name
+        self.ann = ann
+        self.nprobe = nprobe
+        self.path = root / "library.json"
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = self._empty_state()
+        self._file_key: Optional[file_lock.StatKey] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._ivf: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._codes: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._stores: Dict[str, Tuple[Optional[file_lock.StatKey], Any]] = {}
+        self._synced_dir_mtime: Optional[int] = None
+
+    # ----- 内部処理 -----
+    def _empty_state(self) -> Dict[str, Any]:
+        return {
+            "version": LIBRARY_VERSION,
+            "model_name": self.model_name,
+            "dim": 0,
+            "generation": 0,
+            "rows": 0,
+            "books": {},
+        }
+
+    def _vectors_path(self, generation: int) -> Path:
+        return self.root / f"vectors-{generation}.f16"
+
+    def _codes_path(self, generation: int) -> Path:
+        return self.root / f"codes-{generation}.i8"
+
+    def _scales_path(self, generation: int) -> Path:
+        return self.root / f"scales-{generation}.f32"
+
+    def _centroids_path(self, n: int) -> Path:
+        return self.root / f"centroids-{n}.npy"
+
+    def _assign_path(self, n: int) -> Path:
+        return self.root / f"assign-{n}.i32"
+
+    def _load_if_changed(self) -> None:
+        """他プロセスが書き換えた表を読み直す"""
+        key = file_lock.stat_key(self.path)
+        if key == self._file_key:
+            return
+        self._file_key = key
+        self._matrix = None
+        self._codes = None
+        self._ivf = None
+        self._state = self._empty_state()
+        if key is None:
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (
+            isinstance(data, dict)
+            and data.get("version") == LIBRARY_VERSION
+            and data.get("model_name") == self.model_name
+        ):
+            self._state = data
+
+    def _save(self) -> None:
+        write_json(self.path, self._state, compact=True)
+        self._file_key = file_lock.stat_key(self.path)
+        self._matrix = None
+        self._codes = None
+        self._ivf = None
+
+    def _matrix_locked(self) -> Optional[np.ndarray]:
+        rows, dim = int(self._state["rows"]), int(self._state["dim"])
+        if rows == 0 or dim == 0:
+            return None
+        if self._matrix is None:
+            self._matrix = np.memmap(
+                self._vectors_path(int(self._state["generation"])),
+                dtype=LIBRARY_DTYPE,
+                mode="r",
+                shape=(rows, dim),
+            )
+        return self._matrix
+
+    def _codes_locked(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """行列の int8 の符号と行ごとの倍率"""
+        rows, dim = int(self._state["rows"]), int(self._state["dim"])
+        if rows == 0 or dim == 0:
+            return None
+        if self._codes is None:
+            generation = int(self._state["generation"])
+            self._codes = (
+                np.memmap(
+                    self._codes_path(generation),
+                    dtype=np.int8,
+                    mode="r",
+                    shape=(rows, dim),
+                ),
+                np.memmap(
+                    self._scales_path(generation),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(rows,),
+                ),
+            )
+        return self._codes
+
+    def _append_file(self, path: Path, keep: int, payload: bytes) -> None:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # 中断した追記の残りは表に載っていないため切り捨てる
+            os.ftruncate(fd, keep)
+            os.lseek(fd, 0, os.SEEK_END)
+            os.write(fd, payload)
+        finally:
+            os.close(fd)
+
+    def _append_rows(self, vectors: np.ndarray) -> int:
+        """行列ファイルの末尾へ追記して開始行を返す"""
+        rows, dim = int(self._state["rows"]), int(self._state["dim"])
+        generation = int(self._state["generation"])
+        self.root.mkdir(parents=True, exist_ok=True)
+        matrix = np.ascontiguousarray(vectors, dtype=LIBRARY_DTYPE)
+        # 符号は保存する float16 の値から作る（詰め直しでも同じ符号になる）
+        codes, scales = quantize_int8(matrix)
+        self._append_file(
+            self._vectors_path(generation),
+            rows * dim * matrix.itemsize,
+            matrix.tobytes(),
+        )
+        self._append_file(self._codes_path(generation), rows * dim, codes.tobytes())
+        self._append_file(self._scales_path(generation), rows * 4, scales.tobytes())
+        self._state["rows"] = rows + len(vectors)
+        return rows
+
+    def _live_rows(self) -> int:
+        return sum(int(b["count"]) for b in self._state["books"].values())
+
+    def _compact_locked(self) -> None:
+        """使われている行だけを新しい世代のファイルへ詰め直す"""
+        matrix = self._matrix_locked()
+        old_generation = int(self._state["generation"])
+        books: Dict[str, Dict[str, Any]] = self._state["books"]
+        self._state["generation"] = old_generation + 1
+        self._state["rows"] = 0
+        # 行番号が変わるため IVF は学習し直す
+        self._drop_ivf_locked()
+        for path in (
+            self._vectors_path(old_generation + 1),
+            self._codes_path(old_generation + 1),
+            self._scales_path(old_generation + 1),
+        ):
+            path.unlink(missing_ok=True)
+        for entry in sorted(books.values(), key=lambda e: int(e["offset"])):
+            start, count = int(entry["offset"]), int(entry["count"])
+            assert matrix is not None
+            entry["offset"] = self._append_rows(matrix[start : start + count])
+        self._matrix = None
+        self._codes = None
+        self._update_ivf_locked()
+        self._save()
+        # 他プロセスが開いている古い行列は inode が残るため消してよい
+        self._vectors_path(old_generation).unlink(missing_ok=True)
+        self._codes_path(old_generation).unlink(missing_ok=True)
+        self._scales_path(old_generation).unlink(missing_ok=True)
+
+    def _add_locked(self, name: str, path: Path) -> bool:
+        source = file_lock.stat_key(path)
+        stored = vector_store.read_index(path) if source is not None else None
+        if stored is None or stored.model_name != self.model_name:
+            # 旧形式や別モデルの書籍は書籍ごとの検索に任せる
+            if stored is not None:
+                stored.close()
+            self._drop_locked(name)
+            return False
+        # 行列だけを使うので本文の fd はすぐ閉じる
+        stored.close()
+        vectors = stored.embeddings
+        if len(vectors) == 0:
+            self._drop_locked(name)
+            return False
+        dim = int(vectors.shape[1])
+        if self._state["dim"] not in (0, dim):
+            self._drop_locked(name)
+            return False
+        self._state["dim"] = dim
+        self._state["books"].pop(name, None)
+        offset = self._append_rows(vectors)
+        self._state["books"][name] = {
+            "path": str(path),
+            "offset": offset,
+            "count": int(len(vectors)),
+            "source": list(source) if source is not None else None,
+        }
+        return True
+
+    def _drop_locked(self, name: str) -> bool:
+        self._stores.pop(name, None)
+        return self._state["books"].pop(name, None) is not None
+
+    def _maybe_compact_locked(self) -> None:
+        rows = int(self._state["rows"])
+        if rows and rows - self._live_rows() > rows * COMPACT_RATIO:
+            self._compact_locked()
+        else:
+            self._matrix = None
+            self._codes = None
+            self._update_ivf_locked()
+            self._save()
+
+    def _drop_ivf_locked(self) -> None:
+        ivf = self._state.pop("ivf", None)
+        self._ivf = None
+        if ivf is not None:
+            self._centroids_path(int(ivf["id"])).unlink(missing_ok=True)
+            self._assign_path(int(ivf["id"])).unlink(missing_ok=True)
+
+    def _update_ivf_locked(self) -> None:
+        """行列の変更を IVF に反映する（ann="ivf" のときのみ）"""
+        if self.ann != "ivf":
+            return
+        rows = int(self._state["rows"])
+        matrix = self._matrix_locked()
+        if matrix is None or self._live_rows() < MIN_TRAIN_ROWS:
+            self._drop_ivf_locked()
+            return
+        ivf: Optional[Dict[str, Any]] = self._state.get("ivf")
+        if ivf is None or rows > int(ivf["trained_rows"]) * RETRAIN_GROWTH:
+            previous = ivf
+            centroids = train_centroids(matrix)
+            n = int(previous["id"]) + 1 if previous is not None else 0
+            np.save(self._centroids_path(n), centroids)
+            assign_rows(matrix, centroids).tofile(self._assign_path(n))
+            self._state["ivf"] = {
+                "id": n,
+                "nlist": int(len(centroids)),
+                "rows": rows,
+                "trained_rows": rows,
+            }
+            if previous is not None:
+                self._centroids_path(int(previous["id"])).unlink(missing_ok=True)
+                self._assign_path(int(previous["id"])).unlink(missing_ok=True)
+            _logger.info(f"IVF を学習しました: {rows}行 / {len(centroids)}クラスタ")
+            return
+        done = int(ivf["rows"])
+        if done < rows:
+            centroids = np.load(self._centroids_path(int(ivf["id"])))
+            tail = assign_rows(matrix[done:], centroids)
+            fd = os.open(self._assign_path(int(ivf["id"])), os.O_RDWR | os.O_CREAT)
+            try:
+                os.ftruncate(fd, done * 4)
+                os.lseek(fd, 0, os.SEEK_END)
+                os.write(fd, tail.astype(np.int32).tobytes())
+            finally:
+                os.close(fd)
+            ivf["rows"] = rows
+
+    def _ivf_locked(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """検索に使える IVF の (クラスタ中心, 所属)（行列と揃っていなければ None）"""
+        ivf = self._state.get("ivf")
+        if self.ann != "ivf" or ivf is None:
+            return None
+        rows = int(self._state["rows"])
+        if int(ivf["rows"]) != rows:
+            return None
+        if self._ivf is None:
+            try:
+                centroids = np.load(self._centroids_path(int(ivf["id"])))
+                assign = np.memmap(
+                    self._assign_path(int(ivf["id"])),
+                    dtype=np.int32,
+                    mode="r",
+                    shape=(rows,),
+                )
+            except (OSError, ValueError) as e:
+                _logger.warning(f"IVF を読み込めません: {e}")
+                return None
+            self._ivf = (centroids, assign)
+        return self._ivf
+
+    def _store(self, name: str, path: Path) -> Any:
+        key = file_lock.stat_key(path)
+        cached = self._stores.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        stored = vector_store.read_index(path)
+        self._stores[name] = (key, stored)
+        return stored
+
+    # ----- 公開 API -----
+    def add_book(self, name: str, path: Path) -> bool:
+        """書籍のインデックスを追加する（既存なら置き換え）"""
+        with self._lock, file_lock.locked(file_lock.lock_path_for(self.path)):
+            self._load_if_changed()
+            existed = name in self._state["books"]
+            added = self._add_locked(name, path)
+            if added or existed:
+                self._maybe_compact_locked()
+            return added
+
+    def remove_book(self, name: str) -> bool:
+        with self._lock:
+            self._load_if_changed()
+            if name not in self._state["books"]:
+                return False
+            with file_lock.locked(file_lock.lock_path_for(self.path)):
+                self._load_if_changed()
+                removed = self._drop_locked(name)
+                self._maybe_compact_locked()
+                return removed
+
+    def sync(self, books: Dict[str, Path], dir_mtime: Optional[int] = None) -> None:
+        """書籍ごとのインデックスと突き合わせて追加・更新・削除を反映する
+
+        Args:
+            books: 書籍名 -> インデックスのヘッダパス
+            dir_mtime: キャッシュディレクトリの mtime。前回と同じなら何もしない
+        """
+        with self._lock:
+            self._load_if_changed()
+            if dir_mtime is not None and dir_mtime == self._synced_dir_mtime:
+                return
+            current: Dict[str, Any] = self._state["books"]
+            stale = [
+                name
+                for name, path in books.items()
+                if name not in current
+                or current[name].get("path") != str(path)
+                or current[name].get("source") != list(file_lock.stat_key(path) or ())
+            ]
+            gone = [name for name in current if name not in books]
+            if stale or gone:
+                with file_lock.locked(file_lock.lock_path_for(self.path)):
+                    self._load_if_changed()
+                    for name in gone:
+                        self._drop_locked(name)
+                    for name in stale:
+                        self._add_locked(name, books[name])
+                    self._maybe_compact_locked()
+            self._synced_dir_mtime = dir_mtime
+
+    def books(self) -> List[str]:
+        with self._lock:
+            self._load_if_changed()
+            return sorted(self._state["books"])
+
+    def search(
+        self,
+        query: Any,
+        top_k: int = 5,
+        min_score: float = 0.1,
+        books: Optional[Iterable[str]] = None,
+    ) -> Dict[str, List[Tuple[int, float]]]:
+        """書籍ごとに上位 top_k 件の (書籍内の行番号, 類似度) を返す"""
+        with self._lock:
+            self._load_if_changed()
+            matrix = self._matrix_locked()
+            entries = dict(self._state["books"])
+            ivf = self._ivf_locked()
+            codes = self._codes_locked()
+        if matrix is None or codes is None:
+            return {}
+        wanted = set(books) if books is not None else None
+        ranges = sorted(
+            (int(e["offset"]), int(e["count"]), name)
+            for name, e in entries.items()
+            if wanted is None or name in wanted
+        )
+        if not ranges:
+            return {}
+        # 全書籍を指定された場合は絞り込まない（符号行列を複製しない）
+        restrict = len(ranges) < len(entries)
+        results: Dict[str, List[Tuple[int, float]]] = {}
+        if ivf is not None:
+            scores = self._ivf_scores(matrix, ivf, query, ranges, restrict)
+            for offset, count, name in ranges:
+                local = scores[offset : offset + count]
+                hits = _top_k(local, top_k, min_score)
+                if len(hits):
+                    results[name] = [(int(i), float(local[i])) for i in hits]
+            return results
+
+        index = QuantizedIndex(matrix, *codes)
+        # 書籍を絞り込む場合は、その範囲の符号だけで内積を取る
+        if restrict:
+            rows = np.concatenate(
+                [np.arange(off, off + count) for off, count, _ in ranges]
+            )
+            approx = QuantizedIndex(matrix, codes[0][rows], codes[1][rows])
+            scores = approx.approx_scores(query)
+            positions = np.cumsum([0] + [count for _, count, _ in ranges])
+            spans = [
+                (int(positions[i]), offset, count, name)
+                for i, (offset, count, name) in enumerate(ranges)
+            ]
+        else:
+            scores = index.approx_scores(query)
+            spans = [(offset, offset, count, name) for offset, count, name in ranges]
+        for start, offset, count, name in spans:
+            local = scores[start : start + count]
+            candidates = top_k_indices(local, rerank_count(top_k)) + offset
+            exact, found = index.rerank(query, candidates, top_k)
+            keep = exact >= min_score
+            if keep.any():
+                results[name] = [
+                    (int(r - offset), float(v))
+                    for v, r in zip(exact[keep], found[keep])
+                ]
+        return results
+
+    def _ivf_scores(
+        self,
+        matrix: np.ndarray,
+        ivf: Tuple[np.ndarray, np.ndarray],
+        query: Any,
+        ranges: List[Tuple[int, int, str]],
+        restrict: bool,
+    ) -> np.ndarray:
+        """IVF の候補行だけ内積を取り、それ以外の行は -inf にしたスコア"""
+        centroids, assign = ivf
+        index = IVFIndex(matrix, centroids, assign, self.nprobe)
+        rows = index.candidates(query)
+        if restrict:
+            in_range = np.zeros(len(matrix), dtype=bool)
+            for offset, count, _ in ranges:
+                in_range[offset : offset + count] = True
+            rows = rows[in_range[rows]]
+        scores = np.full(len(matrix), -np.inf, dtype=np.float32)
+        if len(rows):
+            scores[rows] = DenseIndex(matrix[rows]).scores(query)
+        return scores
+
+    def recall_report(
+        self,
+        k: int = 10,
+        samples: int = 100,
+        nprobes: Iterable[int] = (1, 2, 4, 8, 16, 32),
+        seed: int = 0,
+    ) -> Optional[Dict[str, Any]]:
+        """IVF の recall@k と検索時間を nprobe ごとに測る（IVF が無ければ None）
+
+        クエリには行列から無作為に選んだ行を使う。
+        """
+        with self._lock:
+            self._load_if_changed()
+            matrix = self._matrix_locked()
+            ivf = self._ivf_locked()
+        if matrix is None or ivf is None:
+            return None
+        rng = np.random.default_rng(seed)
+        picked = np.sort(rng.choice(len(matrix), min(samples, len(matrix)), False))
+        index = IVFIndex(matrix, ivf[0], ivf[1], self.nprobe)
+        return {
+            "rows": len(index),
+            "nlist": index.nlist,
+            "nprobe": self.nprobe,
+            "report": index.recall_report(matrix[picked], k, list(nprobes)),
+        }
+
+    def row(self, name: str, i: int) -> Optional[Tuple[str, Dict[str, str]]]:
+        """書籍のインデックスから i 行目の (テキスト, メタデータ) を読む"""
+        with self._lock:
+            entry = self._state["books"].get(name)
+            if entry is None:
+                return None
+            path = Path(entry["path"])
+            # 再インデックス後の未同期の書籍は行番号がずれるため返さない
+            if list(file_lock.stat_key(path) or ()) != entry["source"]:
+                return None
+            stored = self._store(name, path)
+        if stored is None or i >= len(stored.texts):
+            return None
+        return stored.texts[i], stored.metadata[i]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._load_if_changed()
+            return {
+                "books": len(self._state["books"]),
+                "rows": int(self._state["rows"]),
+                "live_rows": self._live_rows(),
+                "dim": int(self._state["dim"]),
+            }
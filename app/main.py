@@ -1,7 +1,7 @@
 import logging
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -17,10 +17,11 @@ from app.routers import mcp as mcp_router
 from app.routers import migrations as migrations_router
 from app.routers import notion as notion_router
 from app.routers import obsidian as obsidian_router
+from app.routers import search as search_router
 from app.routers import templates as templates_router
 from app.routers import widgets as widgets_router
 from app.routers import writing_styles as writing_styles_router
-from app.storage import init_storage
+from app.storage import init_storage, lock_stats, write_stats
 
 
 def setup_logging() -> None:
@@ -133,11 +134,26 @@ def create_app() -> FastAPI:
         prefix="/api/widgets",
         tags=["widgets"],
     )
+    app.include_router(
+        search_router.router,
+        prefix="/api/search",
+        tags=["search"],
+    )
 
     @app.get("/api/health")
     def health() -> Dict[str, str]:
         return {"status": "ok"}
 
+    @app.get("/api/health/locks")
+    def health_locks() -> Dict[str, Dict[str, float]]:
+        """ストレージのロック取得回数と待ち時間（秒）"""
+        return lock_stats()
+
+    @app.get("/api/health/writes")
+    def health_writes() -> Dict[str, Any]:
+        """JSON ファイルの耐久性モードとまとめ書きの統計"""
+        return write_stats()
+
     ai_paths = [
         getattr(r, "path", "")
         for r in app.routes
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+import copy
 import hashlib
-import json
 import logging
 import re
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, cast
 
+from app import file_lock, settings_cache
+from app.durable_write import write_json
+
 logger = logging.getLogger("obsidian")
 
 _FRONT_KEY_RE = re.compile(r"^(title|author|asin)\s*:\s*(.+?)\s*$", re.I)
@@ -58,14 +61,10 @@ def _load_settings() -> Dict[str, Any]:
     path = _settings_path()
     try:
         if path.exists():
-            raw = json.loads(path.read_text(encoding="utf-8"))
-            if isinstance(raw, dict):
-                return cast(Dict[str, Any], raw)
-            logger.warning(
-                "obsidian.settings_invalid_type path=%s type=%s",
-                path,
-                type(raw).__name__,
-            )
+            snap = settings_cache.load(path)
+            if snap is not None:
+                return copy.deepcopy(snap.data)
+            logger.warning("obsidian.settings_invalid path=%s", path)
     except Exception as exc:  # noqa: BLE001
         logger.warning("obsidian.settings_read_failed path=%s err=%r", path, exc)
     return {}
@@ -74,10 +73,8 @@ def _load_settings() -> Dict[str, Any]:
 def _save_settings(data: Dict[str, object]) -> None:
     path = _settings_path()
     try:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(
-            json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
+        write_json(path, data)
+        settings_cache.store(path, cast(Dict[str, Any], data))
     except Exception as exc:  # noqa: BLE001
         logger.warning("obsidian.settings_write_failed path=%s err=%r", path, exc)
 
@@ -121,6 +118,16 @@ def set_configured_obsidian_config(
     highlights_dir: str = "kindle_highlights",
 ) -> Optional[ObsidianConfig]:
     """新しい設定構造でObsidian設定を保存"""
+    # app.storage と同じロックファイルで他ワーカーの更新と排他する
+    with file_lock.locked(file_lock.lock_path_for(_settings_path())):
+        return _set_configured_obsidian_config_locked(
+            root_dir, articles_dir, highlights_dir
+        )
+
+
+def _set_configured_obsidian_config_locked(
+    root_dir: Optional[str], articles_dir: str, highlights_dir: str
+) -> Optional[ObsidianConfig]:
     cfg = _load_settings()
 
     if root_dir and root_dir.strip():
@@ -0,0 +1,253 @@
+"""Markdown 記事ディレクトリのマニフェスト
+
+`data/posts/*.md` のファイル名・タイトル・mtime・サイズ・内容ハッシュと
+git コミット状態を JSON に保持し、一覧表示でファイルを読まずに済むようにする。
+保存/削除時に更新し、ディレクトリの mtime が記録と異なる場合
+（外部での追加・削除）だけ走査し直す。ロックは呼び出し側が取る。
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.durable_write import default_durability, write_json
+from app.file_lock import StatKey, stat_key
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+TitleFn = Callable[[str], Optional[str]]
+_SortKey = Tuple[int, str]
+
+
+class PostsManifest:
+    """記事ファイルのメタデータ索引"""
+
+    def __init__(
+        self,
+        posts_dir: Path,
+        path: Path,
+        title_fn: TitleFn,
+        durability: Optional[str] = None,
+    ):
+        """初期化
+
+        Args:
+            posts_dir: 記事ディレクトリ
+            path: マニフェスト JSON のパス
+            title_fn: 本文からタイトルを取り出す関数
+            durability: 耐久性モード
+        """
+        self.posts_dir = posts_dir
+        self.path = path
+        self.title_fn = title_fn
+        self.durability = durability or default_durability()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._order: List[_SortKey] = []
+        self._dir_mtime_ns: Optional[int] = None
+        self._file_key: Optional[StatKey] = None
+
+    # ----- 内部処理 -----
+    def _dir_mtime(self) -> Optional[int]:
+        try:
+            return self.posts_dir.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _rebuild_order(self) -> None:
+        self._order = sorted((e["mtime_ns"], name) for name, e in self._entries.items())
+
+    def _load_if_changed(self) -> None:
+        """他プロセスが書き換えたマニフェストを読み直す"""
+        key = stat_key(self.path)
+        if key is None or key == self._file_key:
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return
+        entries = data.get("entries")
+        self._entries = dict(entries) if isinstance(entries, dict) else {}
+        mtime = data.get("dir_mtime_ns")
+        self._dir_mtime_ns = int(mtime) if isinstance(mtime, int) else None
+        self._file_key = key
+        self._rebuild_order()
+
+    def _save(self) -> None:
+        payload = {
+            "version": MANIFEST_VERSION,
+            "dir_mtime_ns": self._dir_mtime_ns,
+            "entries": self._entries,
+        }
+        write_json(self.path, payload, self.durability, compact=True)
+        self._file_key = stat_key(self.path)
+
+    def _scan(self, path: Path, st: os.stat_result) -> Dict[str, Any]:
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            raw = b""
+        text = raw.decode("utf-8", errors="ignore")
+        return {
+            "title": self.title_fn(text),
+            "mtime_ns": int(st.st_mtime_ns),
+            "size": int(st.st_size),
+            "sha256": hashlib.sha256(raw).hexdigest(),
+        }
+
+    def _put(self, name: str, entry: Dict[str, Any]) -> None:
+        self._drop(name)
+        self._entries[name] = entry
+        bisect.insort(self._order, (entry["mtime_ns"], name))
+
+    def _drop(self, name: str) -> None:
+        prev = self._entries.pop(name, None)
+        if prev is None:
+            return
+        key = (prev["mtime_ns"], name)
+        i = bisect.bisect_left(self._order, key)
+        if i < len(self._order) and self._order[i] == key:
+            del self._order[i]
+
+    def _refresh(self, name: str) -> bool:
+        """1 ファイル分を stat で確認し、変わっていれば読み直す"""
+        path = self.posts_dir / name
+        try:
+            st = path.stat()
+        except OSError:
+            self._drop(name)
+            return True
+        entry = self._entries.get(name)
+        if entry and (entry["mtime_ns"], entry["size"]) == (
+            st.st_mtime_ns,
+            st.st_size,
+        ):
+            return False
+        fresh = self._scan(path, st)
+        if entry:
+            # git の状態は内容の再読込で失わない
+            fresh.update({k: v for k, v in entry.items() if k.startswith("git")})
+        self._put(name, fresh)
+        return True
+
+    # ----- 公開 API -----
+    def reconcile(self, force: bool = False) -> bool:
+        """ディレクトリの mtime が変わっていれば走査し直す（変更があれば True）"""
+        self._load_if_changed()
+        mtime = self._dir_mtime()
+        if not force and mtime is not None and mtime == self._dir_mtime_ns:
+            return False
+        seen: Set[str] = set()
+        changed = False
+        if self.posts_dir.exists():
+            for de in os.scandir(self.posts_dir):
+                if not de.name.endswith(".md") or not de.is_file():
+                    continue
+                seen.add(de.name)
+                changed |= self._refresh(de.name)
+        for name in [n for n in self._entries if n not in seen]:
+            self._drop(name)
+            changed = True
+        self._dir_mtime_ns = mtime
+        self._save()
+        _logger.info("posts manifest reconciled: %d entries", len(self._entries))
+        return changed
+
+    def record(self, name: str, dir_mtime_before: Optional[int]) -> None:
+        """保存したファイルを反映する
+
+        Args:
+            name: ファイル名
+            dir_mtime_before: 書き込み前のディレクトリ mtime。記録と一致して
+                いた場合のみ同期済みとして新しい mtime を記録する
+        """
+        self._load_if_changed()
+        in_sync = dir_mtime_before == self._dir_mtime_ns
+        path = self.posts_dir / name
+        try:
+            st = path.stat()
+        except OSError:
+            return
+        self._put(name, self._scan(path, st))
+        if in_sync:
+            self._dir_mtime_ns = self._dir_mtime()
+        self._save()
+
+    def remove(self, name: str, dir_mtime_before: Optional[int]) -> None:
+        """削除したファイルを反映する（引数は record と同じ）"""
+        self._load_if_changed()
+        in_sync = dir_mtime_before == self._dir_mtime_ns
+        self._drop(name)
+        if in_sync:
+            self._dir_mtime_ns = self._dir_mtime()
+        self._save()
+
+    def list(self, limit: int) -> List[Dict[str, Any]]:
+        """mtime の新しい順に最大 limit 件を返す"""
+        self.reconcile()
+        while True:
+            top = [name for _, name in reversed(self._order[-limit:])]
+            # 表示する分だけ stat で実体と突き合わせる（上書き編集の検知）
+            stale = [name for name in top if self._refresh(name)]
+            if not stale:
+                break
+            self._save()
+        result: List[Dict[str, Any]] = []
+        for name in top:
+            e = self._entries[name]
+            result.append(
+                {
+                    "filename": name,
+                    "title": e["title"] or Path(name).stem,
+                    "mtime": e["mtime_ns"] // 1_000_000_000,
+                    "size": e["size"],
+                    "sha256": e["sha256"],
+                    "git_status": e.get("git"),
+                    "git_commit": e.get("git_commit"),
+                }
+            )
+        return result
+
+    def set_git_status(
+        self, names: List[str], status: str, commit: Optional[str] = None
+    ) -> None:
+        """git コミット状態を記録する"""
+        self._load_if_changed()
+        for name in names:
+            entry = self._entries.get(name)
+            if entry is None:
+                continue
+            entry["git"] = status
+            if commit:
+                entry["git_commit"] = commit
+            else:
+                entry.pop("git_commit", None)
+        self._save()
+
+    def git_status(self, name: str) -> Optional[Dict[str, Any]]:
+        self._load_if_changed()
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        return {
+            "filename": name,
+            "git_status": entry.get("git"),
+            "git_commit": entry.get("git_commit"),
+        }
+
+    def pending_git(self) -> List[Tuple[str, str]]:
+        """コミット待ちのまま残っている (ファイル名, タイトル) の一覧"""
+        self._load_if_changed()
+        return [
+            (name, str(e.get("title") or Path(name).stem))
+            for name, e in self._entries.items()
+            if e.get("git") == "pending"
+        ]
@@ -0,0 +1,144 @@
+"""int8 に量子化した埋め込みによる 2 段階の検索
+
+各行を行ごとの倍率で int8 に量子化する（code = round(x / scale)、
+scale = max|x| / 127）。倍率が行ごとに独立しているため、行を追記しても
+既存の符号を作り直さなくてよい。
+
+検索はまず int8 の符号を走査して近似スコアの上位候補（k の数倍）を選び、
+候補の行だけを元の行列（mmap の float16 など）から読んで厳密なスコアで
+並べ直す。走査で触れるのは float16 の半分の大きさの符号だけになる。
+"""
+
+from typing import Any, Iterator, Optional, Tuple
+
+import numpy as np
+
+from app.dense_index import DenseIndex, merge_top_k, sort_top_k, top_k_indices
+
+# 並べ直す候補数（k の倍数と下限）
+RERANK_FACTOR = 4
+MIN_RERANK = 32
+# 1 回に float32 へ戻して内積を取る行数（int8 はブロックを小さくした方が速い）
+BLOCK_ROWS = 8192
+
+
+def quantize_int8(matrix: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """行列を (int8 の符号, 行ごとの倍率 float32) に量子化する"""
+    n = int(matrix.shape[0])
+    dim = int(matrix.shape[1]) if len(matrix.shape) == 2 else 0
+    codes = np.empty((n, dim), dtype=np.int8)
+    scales = np.empty(n, dtype=np.float32)
+    for start in range(0, n, BLOCK_ROWS):
+        block = np.asarray(matrix[start : start + BLOCK_ROWS], dtype=np.float32)
+        scale = np.abs(block).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        end = start + len(block)
+        codes[start:end] = np.rint(block / scale[:, None]).astype(np.int8)
+        scales[start:end] = scale
+    return codes, scales
+
+
+def rerank_count(k: int) -> int:
+    return max(k * RERANK_FACTOR, MIN_RERANK)
+
+
+class QuantizedIndex:
+    """int8 の符号で候補を選び、元の行列で並べ直す検索インデックス
+
+    DenseIndex と同じ検索 API を持つ。符号・倍率・行列は参照するだけで
+    変更しない（いずれも mmap した配列を渡せる）。
+    """
+
+    def __init__(
+        self,
+        matrix: Any,
+        codes: Any,
+        scales: Any,
+        block_rows: int = BLOCK_ROWS,
+    ):
+        """初期化
+
+        Args:
+            matrix: (件数, 次元) の正規化済み埋め込み行列（並べ直しに使う）
+            codes: quantize_int8 で得た int8 の符号
+            scales: quantize_int8 で得た行ごとの倍率
+            block_rows: 1 回に内積を取る行数
+        """
+        self.exact = DenseIndex(matrix)
+        self.codes = codes
+        self.scales = scales
+        self.block_rows = max(1, block_rows)
+
+    def __len__(self) -> int:
+        return int(self.codes.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        """走査で読む符号と倍率のバイト数"""
+        return int(self.codes.nbytes) + int(self.scales.nbytes)
+
+    def _blocks(self) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """(開始行, float32 に戻した符号, 倍率)（倍率は内積の後に掛ける）"""
+        for start in range(0, len(self), self.block_rows):
+            end = start + self.block_rows
+            block = np.asarray(self.codes[start:end], dtype=np.float32)
+            yield start, block, np.asarray(self.scales[start:end], dtype=np.float32)
+
+    def approx_scores(self, query: Any) -> np.ndarray:
+        """全行とクエリの近似スコア"""
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        out = np.empty(len(self), dtype=np.float32)
+        for start, block, scale in self._blocks():
+            out[start : start + len(block)] = (block @ q) * scale
+        return out
+
+    def rerank(
+        self, query: Any, rows: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """候補の行を厳密なスコアで並べ直して上位 k 件の (類似度, 行番号) を返す"""
+        rows = np.sort(rows[rows >= 0])
+        if len(rows) == 0 or k <= 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        scores = DenseIndex(self.exact.matrix[rows]).scores(query)
+        top = top_k_indices(scores, k)
+        return scores[top], rows[top]
+
+    def search(
+        self, query: Any, k: int, rerank: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """1 クエリの上位 k 件の (類似度, 行番号)"""
+        scores, indices = self.search_batch(query, k, rerank)
+        return scores[0], indices[0]
+
+    def search_batch(
+        self, queries: Any, k: int, rerank: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """複数クエリの上位 k 件を (クエリ数, k) の (類似度, 行番号) で返す
+
+        Args:
+            rerank: 並べ直す候補数（省略時は rerank_count(k)）
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim == 1:
+            q = q.reshape(1, -1)
+        m = q.shape[0]
+        k = min(k, len(self))
+        if k <= 0 or m == 0:
+            empty = np.empty((m, 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        candidates = min(max(k, rerank or rerank_count(k)), len(self))
+        if m == 1:
+            approx = top_k_indices(self.approx_scores(q[0]), candidates)[None, :]
+        else:
+            best = (
+                np.full((m, 0), -np.inf, dtype=np.float32),
+                np.empty((m, 0), dtype=np.int64),
+            )
+            for start, block, scale in self._blocks():
+                best = merge_top_k(best, (q @ block.T) * scale, start, candidates)
+            _, approx = sort_top_k(best)
+        scores = np.empty((m, k), dtype=np.float32)
+        indices = np.empty((m, k), dtype=np.int64)
+        for i in range(m):
+            scores[i], indices[i] = self.rerank(q[i], approx[i], k)
+        return scores, indices
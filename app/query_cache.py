@@ -0,0 +1,88 @@
+"""検索クエリの埋め込みの LRU キャッシュ
+
+同じクエリ（UI からの再検索、`/api/epub/search/format` の変数展開、
+RAG つき生成）では埋め込みモデルを呼ばずに前回の埋め込みを使う。
+キーは (モデル名, 正規化したクエリ)。正規化は NFKC と前後・連続する
+空白の除去だけにする（大文字小文字を区別するモデルもあるため）。
+"""
+
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+
+# 保持するクエリ数の上限
+DEFAULT_MAX_ENTRIES = int(os.getenv("BLOGWRITER_QUERY_CACHE_SIZE", "1024") or 1024)
+
+_SPACES = re.compile(r"\s+")
+
+Encoder = Callable[[str], Any]
+
+
+def normalize_query(query: str) -> str:
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", query)).strip()
+
+
+class QueryEmbeddingCache:
+    """クエリ埋め込みの件数上限つき LRU キャッシュ"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """初期化
+
+        Args:
+            max_entries: 保持するクエリ数の上限（0 ならキャッシュしない）
+        """
+        self.max_entries = max(0, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, model_name: str, query: str, encode: Encoder) -> np.ndarray:
+        """キャッシュ済みの埋め込みを返し、無ければ encode で作って登録する
+
+        返す配列は (1, 次元) の float32 で、共有されるため書き換えできない。
+        """
+        text = normalize_query(query)
+        key = (model_name, text)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return cached
+            self._misses += 1
+        # 埋め込みはロックの外で行う（同じクエリを同時に埋め込んだ場合は後勝ち）
+        embedding = np.asarray(encode(text), dtype=np.float32).reshape(1, -1)
+        embedding.setflags(write=False)
+        if self.max_entries == 0:
+            return embedding
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return embedding
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """件数・ヒット/ミス/追い出しの回数とヒット率"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
@@ -1,15 +1,51 @@
 """RAG（Retrieval-Augmented Generation）ユーティリティ"""
 
 import logging
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
+
+from app import vector_store
+from app.book_index_cache import DEFAULT_MAX_BYTES, BookIndex, BookIndexCache
 from app.embedding_util import EmbeddingManager
-from app.epub_util import chunk_text, extract_text_from_epub, get_epub_files
+from app.epub_ingest import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    IngestPipeline,
+    IngestStats,
+    ParsedBook,
+    parse_book,
+)
+from app.epub_util import extract_text_from_epub, get_epub_files
+from app.index_manifest import IndexManifest
+from app.ivf_index import DEFAULT_NPROBE
+from app.library_index import LibraryIndex
+from app.query_cache import DEFAULT_MAX_ENTRIES, QueryEmbeddingCache
 
 _logger = logging.getLogger(__name__)
 
 
+@dataclass
+class IndexReport:
+    """ディレクトリの再インデックスの結果"""
+
+    indexed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    embedded_chunks: int = 0
+    reused_chunks: int = 0
+    stats: IngestStats = field(default_factory=IngestStats)
+
+    @property
+    def books(self) -> List[str]:
+        """インデックスが最新になっている書籍（今回作ったものと変更なしのもの）"""
+        return self.indexed + self.unchanged
+
+
 class RAGManager:
     """RAG機能の管理クラス"""
 
@@ -17,17 +53,72 @@ class RAGManager:
         self,
         cache_dir: Path,
         embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        index_cache_bytes: int = DEFAULT_MAX_BYTES,
+        ann: str = "none",
+        nprobe: int = DEFAULT_NPROBE,
+        query_cache_size: int = DEFAULT_MAX_ENTRIES,
+        ingest_workers: int = DEFAULT_WORKERS,
+        ingest_batch_size: int = DEFAULT_BATCH_SIZE,
     ):
         """初期化
 
         Args:
             cache_dir: キャッシュディレクトリ
             embedding_model: 埋め込みモデル名
+            index_cache_bytes: 読み込み済み書籍インデックスを保持するバイト数の上限
+            ann: 近似検索の方式（"none" / "ivf"）
+            nprobe: IVF で検索時に調べるクラスタ数
+            query_cache_size: 埋め込みを保持するクエリ数の上限
+            ingest_workers: ディレクトリのインデックス化で EPUB を解析するプロセス数
+            ingest_batch_size: ディレクトリのインデックス化で 1 回に埋め込むチャンク数
         """
         self.cache_dir = cache_dir
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self.embedding_manager = EmbeddingManager(embedding_model)
+        self.ann = ann
+        self.nprobe = nprobe
+        self.embedding_manager = EmbeddingManager(
+            embedding_model, ann=ann, nprobe=nprobe
+        )
         self.book_indices: Dict[str, str] = {}  # book_name -> index_path
+        # 全書籍をまたぐ検索用の行列（旧形式の書籍は含まない）
+        self.library = LibraryIndex(
+            cache_dir / "library", embedding_model, ann=ann, nprobe=nprobe
+        )
+        # 読み込み済みの書籍インデックス（検索ごとに読み直さない）
+        self.index_cache = BookIndexCache(index_cache_bytes)
+        # 書籍が別モデルで作られている場合のクエリ埋め込み用（モデル名 -> manager）
+        self._encoders: Dict[str, EmbeddingManager] = {}
+        # 同じクエリを埋め込み直さないためのキャッシュ
+        self.query_cache = QueryEmbeddingCache(query_cache_size)
+        # EPUB ごとのファイルのハッシュとインデックス化の条件
+        self.manifest = IndexManifest(cache_dir / "manifest.json")
+        self.ingest_workers = ingest_workers
+        self.ingest_batch_size = ingest_batch_size
+        # 以降の追加・削除は _save_book / delete_book_index が反映する
+        self._sync_library()
+
+    def _cached_books(self) -> List[str]:
+        """キャッシュディレクトリにある書籍名（`<書籍名>.index` と旧形式の .pkl）"""
+        names = [p.name[: -len(".index")] for p in self.cache_dir.glob("*.index")]
+        for index_file in self.cache_dir.glob("*.pkl"):
+            if index_file.stem.endswith(".index"):
+                names.append(index_file.stem[:-6])  # ".index"を除去
+        return names
+
+    def _sync_library(self) -> None:
+        """書籍ごとのインデックスの追加・更新・削除を全書籍の行列へ反映する
+
+        キャッシュディレクトリを走査し IVF を学習し直すことがあるため、
+        起動時にだけ呼ぶ（検索のたびには呼ばない）。
+        """
+        paths = {name: Path(p) for name, p in self.book_indices.items()}
+        for index_file in self.cache_dir.glob("*.index"):
+            paths.setdefault(index_file.name[: -len(".index")], index_file)
+        try:
+            dir_mtime: Optional[int] = self.cache_dir.stat().st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        self.library.sync(paths, dir_mtime)
 
     def index_epub_file(
         self, epub_path: Path, chunk_size: int = 500, overlap: int = 50
@@ -42,48 +133,96 @@ class RAGManager:
         Returns:
             インデックス化された書籍名
         """
+        return self._index_epub(epub_path, chunk_size, overlap)[0]
+
+    def _previous_embeddings(
+        self, index_path: Path, chunks: List[str]
+    ) -> Tuple[Optional[np.ndarray], List[int]]:
+        """前回のインデックスと本文が同じチャンクの埋め込みを使い回す
+
+        Returns:
+            (使い回した行だけを埋めた埋め込み行列, 埋め込みが必要なチャンクの位置)。
+            前回のインデックスが使えない場合は (None, 全チャンクの位置)
+        """
+        stored = (
+            vector_store.read_index(index_path)
+            if vector_store.is_index_header(index_path)
+            else None
+        )
+        if stored is None:
+            return None, list(range(len(chunks)))
+        with stored:
+            return self._reuse_embeddings(stored, chunks)
+
+    def _reuse_embeddings(
+        self, stored: vector_store.StoredIndex, chunks: List[str]
+    ) -> Tuple[Optional[np.ndarray], List[int]]:
+        if (
+            stored.model_name != self.embedding_manager.model_name
+            or vector_store.DIGEST_EXTRA not in stored.extras
+            or not len(stored.embeddings)
+        ):
+            return None, list(range(len(chunks)))
+        previous = vector_store.digest_rows(stored.extras[vector_store.DIGEST_EXTRA])
+        current = vector_store.chunk_digests(chunks)
+        found = [previous.get(d.tobytes(), -1) for d in current]
+        reused = [i for i, row in enumerate(found) if row >= 0]
+        missing = [i for i, row in enumerate(found) if row < 0]
+        matrix = np.empty((len(chunks), stored.embeddings.shape[1]), dtype=np.float32)
+        if reused:
+            matrix[reused] = stored.embeddings[[found[i] for i in reused]]
+        return matrix, missing
+
+    def _prepare_book(self, book: ParsedBook) -> Tuple[Optional[np.ndarray], List[int]]:
+        index_path = self.cache_dir / f"{book.book_title}.index"
+        return self._previous_embeddings(index_path, book.chunks)
+
+    def _save_book(
+        self, book: ParsedBook, embeddings: Optional[np.ndarray], embedded: int
+    ) -> None:
+        """書籍のインデックスを保存して検索対象に加える
+
+        Args:
+            embeddings: 全チャンクの埋め込み（None ならここで埋め込む）
+            embedded: 今回埋め込んだチャンク数（ログ用）
+        """
+        embedding_manager = self._new_manager()
+        if embeddings is None:
+            embedding_manager.build_index(book.chunks, book.metadata)
+        else:
+            embedding_manager.build_index(book.chunks, book.metadata, embeddings)
+
+        # インデックスを保存
+        index_path = self.cache_dir / f"{book.book_title}.index"
+        embedding_manager.save_index(index_path)
+
+        # 書籍インデックスに追加
+        self.book_indices[book.book_title] = str(index_path)
+        self.index_cache.invalidate(book.book_title)
+        self.library.add_book(book.book_title, index_path)
+
+        _logger.info(
+            f"インデックス化完了: {book.book_title} "
+            f"({len(book.chunks)}チャンク、うち埋め込み {embedded})"
+        )
+
+    def _index_epub(
+        self, epub_path: Path, chunk_size: int, overlap: int
+    ) -> Tuple[str, int, int]:
+        """EPUB をインデックス化して (書籍名, 埋め込んだチャンク数, 全チャンク数) を返す"""
         try:
-            # EPUBからテキストを抽出
-            book_title, chapters = extract_text_from_epub(epub_path)
-            _logger.info(f"EPUBを読み込み: {book_title}")
-
-            # チャプター毎にチャンク分割
-            all_chunks = []
-            all_metadata = []
-
-            for chapter_title, chapter_text in chapters.items():
-                chunks = chunk_text(chapter_text, chunk_size, overlap)
-
-                for i, chunk in enumerate(chunks):
-                    all_chunks.append(chunk)
-                    all_metadata.append(
-                        {
-                            "book_title": book_title,
-                            "chapter_title": chapter_title,
-                            "chunk_index": str(i),
-                            "file_path": str(epub_path),
-                            "text": chunk,
-                        }
-                    )
-
-            if not all_chunks:
-                raise ValueError(f"有効なテキストが見つかりません: {epub_path}")
-
-            # インデックスを構築
-            embedding_manager = EmbeddingManager(self.embedding_manager.model_name)
-            embedding_manager.build_index(all_chunks, all_metadata)
-
-            # インデックスを保存
-            index_path = self.cache_dir / f"{book_title}.index"
-            embedding_manager.save_index(index_path)
-
-            # 書籍インデックスに追加
-            self.book_indices[book_title] = str(index_path)
-
-            _logger.info(
-                f"インデックス化完了: {book_title} ({len(all_chunks)}チャンク)"
-            )
-            return book_title
+            book = parse_book(epub_path, chunk_size, overlap, extract_text_from_epub)
+            _logger.info(f"EPUBを読み込み: {book.book_title}")
+
+            # 前回と同じ本文のチャンクは埋め込み直さない
+            embeddings, missing = self._prepare_book(book)
+            if embeddings is not None and missing:
+                encoded = self.embedding_manager.encode_texts(
+                    [book.chunks[i] for i in missing]
+                )
+                embeddings[missing] = np.asarray(encoded, dtype=np.float32)
+            self._save_book(book, embeddings, len(missing))
+            return book.book_title, len(missing), len(book.chunks)
 
         except Exception as e:
             _logger.error(f"EPUBインデックス化エラー: {e}")
@@ -100,20 +239,103 @@ class RAGManager:
             overlap: オーバーラップサイズ
 
         Returns:
-            インデックス化された書籍名のリスト
+            インデックス化された書籍名のリスト（変更が無く作り直さなかった書籍を含む）
         """
-        epub_files = get_epub_files(epub_dir)
-        indexed_books = []
+        return self.update_directory_index(epub_dir, chunk_size, overlap).books
 
-        for epub_path in epub_files:
-            try:
-                book_title = self.index_epub_file(epub_path, chunk_size, overlap)
-                indexed_books.append(book_title)
-            except Exception as e:
-                _logger.error(f"ファイル処理エラー {epub_path}: {e}")
-                continue
+    def update_directory_index(
+        self,
+        epub_dir: Path,
+        chunk_size: int = 500,
+        overlap: int = 50,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ) -> IndexReport:
+        """ディレクトリの EPUB の変更だけをインデックスへ反映する
+
+        前回と同じ内容・条件のファイルは読み直さず、変更されたファイルは
+        本文が変わったチャンクだけを埋め込み直す。ディレクトリから消えた
+        ファイルの書籍はインデックスから削除する。変更されたファイルの
+        解析は並列に行い、埋め込みは書籍をまたいでまとめて行う
+        （app.epub_ingest）。
+
+        Args:
+            workers: 解析するプロセス数（省略時は ingest_workers）
+            batch_size: 1 回に埋め込むチャンク数（省略時は ingest_batch_size）
+        """
+        report = IndexReport()
+        conditions = {
+            "model_name": self.embedding_manager.model_name,
+            "chunk_size": chunk_size,
+            "overlap": overlap,
+        }
+        epub_files = sorted(get_epub_files(epub_dir))
+        with self.manifest.locked():
+            self.manifest.load()
+            changed: List[Path] = []
+            for epub_path in epub_files:
+                previous_title = self.manifest.book_title(epub_path)
+                if previous_title and self.manifest.unchanged(epub_path, conditions):
+                    index_path = self.cache_dir / f"{previous_title}.index"
+                    if index_path.exists():
+                        report.unchanged.append(previous_title)
+                        continue
+                changed.append(epub_path)
+
+            def finish(
+                book: ParsedBook, embeddings: Optional[np.ndarray], embedded: int
+            ) -> None:
+                previous_title = self.manifest.book_title(book.epub_path)
+                self._save_book(book, embeddings, embedded)
+                self.manifest.record(book.epub_path, book.book_title, conditions)
+                report.indexed.append(book.book_title)
+                report.embedded_chunks += embedded
+                report.reused_chunks += len(book.chunks) - embedded
+                if previous_title and previous_title != book.book_title:
+                    self._remove_orphan(previous_title, report)
+
+            pipeline = IngestPipeline(
+                self.embedding_manager.encode_texts,
+                self.ingest_workers if workers is None else workers,
+                batch_size or self.ingest_batch_size,
+            )
+            report.stats = pipeline.run(
+                changed,
+                partial(
+                    parse_book,
+                    chunk_size=chunk_size,
+                    overlap=overlap,
+                    extract=extract_text_from_epub,
+                ),
+                self._prepare_book,
+                finish,
+                lambda path, _: report.failed.append(str(path)),
+            )
 
-        return indexed_books
+            current = {str(p) for p in epub_files}
+            for path in list(self.manifest.files):
+                if path in current or not Path(path).is_relative_to(epub_dir):
+                    continue
+                title = self.manifest.files.pop(path)["book_title"]
+                self._remove_orphan(title, report)
+            self.manifest.save()
+
+        _logger.info(
+            f"再インデックス: 更新 {len(report.indexed)}冊・変更なし "
+            f"{len(report.unchanged)}冊・削除 {len(report.removed)}冊 "
+            f"(埋め込み {report.embedded_chunks}チャンク、"
+            f"再利用 {report.reused_chunks}チャンク、"
+            f"{report.stats.chunks_per_sec:.1f} チャンク/秒)"
+        )
+        return report
+
+    def _remove_orphan(self, book_title: str, report: IndexReport) -> None:
+        """どの EPUB からも参照されなくなった書籍のインデックスを削除する"""
+        titles = {e.get("book_title") for e in self.manifest.files.values()}
+        if book_title in titles or book_title in report.books:
+            return
+        if self.delete_book_index(book_title):
+            report.removed.append(book_title)
 
     def load_book_index(self, book_name: str) -> bool:
         """指定された書籍のインデックスを読み込み
@@ -124,19 +346,42 @@ class RAGManager:
         Returns:
             読み込み成功の可否
         """
+        return self._book_index(book_name) is not None
+
+    def _book_index(self, book_name: str) -> Optional[BookIndex]:
+        """書籍インデックスをキャッシュから取得（無ければ読み込む）"""
         if book_name in self.book_indices:
             index_path = Path(self.book_indices[book_name])
-            return self.embedding_manager.load_index(index_path)
-
-        # キャッシュディレクトリから検索
-        index_path = self.cache_dir / f"{book_name}.index"
-        if index_path.with_suffix(".pkl").exists():
-            success = self.embedding_manager.load_index(index_path)
-            if success:
-                self.book_indices[book_name] = str(index_path)
-            return success
-
-        return False
+        else:
+            # キャッシュディレクトリから検索
+            index_path = self.cache_dir / f"{book_name}.index"
+            legacy_path = self.cache_dir / f"{book_name}.index.pkl"
+            if legacy_path.exists() and not index_path.exists():
+                index_path = legacy_path
+        book = self.index_cache.get(book_name, index_path, self._load_manager)
+        if book is not None:
+            self.book_indices.setdefault(book_name, str(index_path))
+        return book
+
+    def _new_manager(self) -> EmbeddingManager:
+        return EmbeddingManager(
+            self.embedding_manager.model_name, ann=self.ann, nprobe=self.nprobe
+        )
+
+    def _load_manager(self, index_path: Path) -> Optional[EmbeddingManager]:
+        manager = self._new_manager()
+        return manager if manager.load_index(index_path) else None
+
+    def _query_embedding(self, model_name: str, query: str) -> Any:
+        """書籍と同じモデルでクエリを埋め込む（同じクエリはキャッシュから返す）"""
+        encoder = self.embedding_manager
+        if model_name != encoder.model_name:
+            encoder = self._encoders.setdefault(
+                model_name, EmbeddingManager(model_name)
+            )
+        return self.query_cache.get(
+            model_name, query, lambda text: encoder.encode_texts([text])
+        )
 
     def search_in_book(
         self, book_name: str, query: str, top_k: int = 5, min_score: float = 0.1
@@ -152,37 +397,75 @@ class RAGManager:
         Returns:
             検索結果のリスト
         """
-        if not self.load_book_index(book_name):
+        book = self._book_index(book_name)
+        if book is None or not len(book.manager.texts):
             return []
 
-        return self.embedding_manager.search(query, top_k, min_score)
+        query_embedding = self._query_embedding(book.manager.model_name, query)
+        return book.manager.search_by_vector(query_embedding, top_k, min_score)
 
     def search_all_books(
-        self, query: str, top_k: int = 5, min_score: float = 0.1
+        self,
+        query: str,
+        top_k: int = 5,
+        min_score: float = 0.1,
+        books: Optional[Iterable[str]] = None,
     ) -> Dict[str, List[Tuple[str, Dict[str, str], float]]]:
         """全書籍で検索
 
+        全書籍の行列に対する内積 1 回で検索し、行列に含まれない書籍
+        （旧形式など）だけを書籍ごとに検索する。
+
         Args:
             query: 検索クエリ
             top_k: 書籍ごとの返す結果数
             min_score: 最小類似度スコア
+            books: 対象の書籍名（省略時は全書籍）
 
         Returns:
             書籍名をキーとした検索結果の辞書
         """
-        results = {}
+        results: Dict[str, List[Tuple[str, Dict[str, str], float]]] = {}
 
         # 利用可能な書籍インデックスを探索
         available_books = list(self.book_indices.keys())
 
         # キャッシュディレクトリから追加の書籍を探索
-        for index_file in self.cache_dir.glob("*.pkl"):
-            if index_file.stem.endswith(".index"):
-                book_name = index_file.stem[:-6]  # ".index"を除去
-                if book_name not in available_books:
-                    available_books.append(book_name)
+        for book_name in self._cached_books():
+            if book_name not in available_books:
+                available_books.append(book_name)
+        if books is not None:
+            wanted = set(books)
+            available_books = [b for b in available_books if b in wanted]
+
+        in_library = set(self.library.books())
+        library_books = [b for b in available_books if b in in_library]
+        if library_books:
+            try:
+                query_embedding = self._query_embedding(
+                    self.embedding_manager.model_name, query
+                )
+                # 絞り込みが無ければ行列全体に対する内積 1 回で済ませる
+                hits = self.library.search(
+                    query_embedding,
+                    top_k,
+                    min_score,
+                    library_books if books is not None else None,
+                )
+                for book_name, book_hits in hits.items():
+                    book_results = []
+                    for i, score in book_hits:
+                        row = self.library.row(book_name, i)
+                        if row is not None:
+                            book_results.append((row[0], row[1], score))
+                    if book_results:
+                        results[book_name] = book_results
+            except Exception as e:
+                _logger.error(f"全書籍検索エラー: {e}")
 
         for book_name in available_books:
+            if book_name in in_library:
+                continue
             try:
                 book_results = self.search_in_book(book_name, query, top_k, min_score)
                 if book_results:
@@ -193,6 +476,14 @@ class RAGManager:
 
         return results
 
+    def ann_recall_report(
+        self, k: int = 10, samples: int = 100, nprobes: Iterable[int] = ()
+    ) -> Optional[Dict[str, Any]]:
+        """全書籍の行列に対する IVF の recall@k と検索時間（IVF が無ければ None）"""
+        if nprobes:
+            return self.library.recall_report(k, samples, nprobes)
+        return self.library.recall_report(k, samples)
+
     def get_available_books(self) -> List[str]:
         """利用可能な書籍名のリストを取得
 
@@ -202,10 +493,7 @@ class RAGManager:
         books = set(self.book_indices.keys())
 
         # キャッシュディレクトリから追加
-        for index_file in self.cache_dir.glob("*.pkl"):
-            if index_file.stem.endswith(".index"):
-                book_name = index_file.stem[:-6]  # ".index"を除去
-                books.add(book_name)
+        books.update(self._cached_books())
 
         return sorted(list(books))
 
@@ -225,11 +513,17 @@ class RAGManager:
             else:
                 index_path = self.cache_dir / f"{book_name}.index"
 
-            # ファイルを削除
-            pkl_file = index_path.with_suffix(".pkl")
-
-            if pkl_file.exists():
-                pkl_file.unlink()
+            self.index_cache.invalidate(book_name)
+            self.library.remove_book(book_name)
+
+            # ファイルを削除（行列・メタデータと旧形式の .pkl）
+            vector_store.remove_index(index_path)
+            for pkl_file in (
+                index_path.with_suffix(".pkl"),
+                index_path.with_name(index_path.name + ".pkl"),
+            ):
+                if pkl_file.exists():
+                    pkl_file.unlink()
 
             return True
 
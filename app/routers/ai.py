@@ -19,8 +19,13 @@ from app.ai_utils import (
 )
 from app.ai_utils import call_ai as _call_ai_internal
 from app.ai_utils import call_ai_stream as _call_ai_stream_internal
-from app.security import decrypt_text, encrypt_text, is_url_allowed
-from app.storage import get_ai_settings, save_ai_settings
+from app.security import encrypt_text, is_url_allowed
+from app.storage import (
+    adecrypt_setting,
+    aget_ai_settings,
+    get_ai_settings,
+    save_ai_settings,
+)
 from app.widget_util import process_widget_with_media
 
 router = APIRouter()
@@ -186,7 +191,7 @@ except Exception:  # pragma: no cover
 
 @router.post("/generate")
 async def generate(req: GenerateRequest):
-    row = get_ai_settings()
+    row = await aget_ai_settings()
     provider = str(row.get("provider", "gemini"))
     model_name = req.model or str(row.get("model", "gemini-2.5-flash"))
     max_len = int(row.get("max_prompt_len", 32768))
@@ -264,9 +269,9 @@ async def generate(req: GenerateRequest):
         if os.getenv("PYTEST_CURRENT_TEST") or os.getenv("CI"):
             _logger.info("lmstudio.generate skipped in tests")
             return {"text": f"[stub-lmstudio] {base_prompt}"}
-        base = decrypt_text(str(row.get("api_key", "")), app_secret) or os.getenv(
-            "LMSTUDIO_BASE", "http://localhost:1234/v1"
-        )
+        base = await adecrypt_setting(
+            str(row.get("api_key", "")), app_secret
+        ) or os.getenv("LMSTUDIO_BASE", "http://localhost:1234/v1")
         url = (base.rstrip("/")) + "/chat/completions"
         prompt = base_prompt
         if req.url_context:
@@ -308,7 +313,7 @@ async def generate(req: GenerateRequest):
 
     # Gemini 既存経路
     stored = row.get("api_key") or os.getenv("GEMINI_API_KEY")
-    api_key = decrypt_text(str(stored or ""), app_secret)
+    api_key = await adecrypt_setting(str(stored or ""), app_secret)
     if model_name not in ALLOWED_MODELS:
         model_name = "gemini-2.5-flash"
     if not api_key:
@@ -490,7 +495,7 @@ async def widget_suggestions_stream(payload: WidgetSuggestionsRequest):
 
 @router.post("/from-bullets")
 async def from_bullets(req: BulletsRequest):
-    row = get_ai_settings()
+    row = await aget_ai_settings()
     provider = str(row.get("provider", "gemini"))
     app_secret = os.getenv("APP_SECRET")
     model_name = req.model or str(row.get("model", "gemini-2.5-flash"))
@@ -514,9 +519,9 @@ async def from_bullets(req: BulletsRequest):
         if os.getenv("PYTEST_CURRENT_TEST") or os.getenv("CI"):
             _logger.info("lmstudio.from_bullets skipped in tests")
             return {"text": _build_stub_text_from_bullets(bullets)}
-        base = decrypt_text(str(row.get("api_key", "")), app_secret) or os.getenv(
-            "LMSTUDIO_BASE", "http://localhost:1234/v1"
-        )
+        base = await adecrypt_setting(
+            str(row.get("api_key", "")), app_secret
+        ) or os.getenv("LMSTUDIO_BASE", "http://localhost:1234/v1")
         url = (base.rstrip("/")) + "/chat/completions"
         if req2.url_context:
             ctx, err = await _fetch_url_context(req2.url_context)
@@ -558,7 +563,7 @@ async def from_bullets(req: BulletsRequest):
 
     # Gemini
     stored = row.get("api_key") or os.getenv("GEMINI_API_KEY")
-    api_key = decrypt_text(str(stored or ""), app_secret)
+    api_key = await adecrypt_setting(str(stored or ""), app_secret)
     if model_name not in ALLOWED_MODELS:
         model_name = "gemini-2.5-flash"
     if not api_key:
@@ -638,7 +643,7 @@ def _build_stub_text_from_bullets(bullets: List[str]) -> str:
 
 @router.post("/from-bullets/stream")
 async def from_bullets_stream(req: BulletsRequest):
-    row = get_ai_settings()
+    row = await aget_ai_settings()
     provider = str(row.get("provider", "gemini"))
     app_secret = os.getenv("APP_SECRET")
     model_name = req.model or str(row.get("model", "gemini-2.5-flash"))
@@ -677,9 +682,9 @@ async def from_bullets_stream(req: BulletsRequest):
                     "X-Accel-Buffering": "no",
                 },
             )
-        base = decrypt_text(str(row.get("api_key", "")), app_secret) or os.getenv(
-            "LMSTUDIO_BASE", "http://localhost:1234/v1"
-        )
+        base = await adecrypt_setting(
+            str(row.get("api_key", "")), app_secret
+        ) or os.getenv("LMSTUDIO_BASE", "http://localhost:1234/v1")
         url = (base.rstrip("/")) + "/chat/completions"
 
         async def _lm_stream():
@@ -773,7 +778,7 @@ async def from_bullets_stream(req: BulletsRequest):
 
     # Gemini 既存経路
     stored = row.get("api_key") or os.getenv("GEMINI_API_KEY")
-    api_key = decrypt_text(str(stored or ""), app_secret)
+    api_key = await adecrypt_setting(str(stored or ""), app_secret)
     if model_name not in ALLOWED_MODELS:
         model_name = "gemini-2.5-flash"
 
@@ -890,7 +895,7 @@ async def from_bullets_prompt(req: BulletsRequest):
                 prompt
                 + "\n[参考URL] 指定URLの本文取得に失敗したため、一般知識で補ってください。\n"
             )
-    row = get_ai_settings()
+    row = await aget_ai_settings()
     max_len = int(row.get("max_prompt_len", 32768))
     return {"prompt": prompt[:max_len]}
 
@@ -903,7 +908,7 @@ class EditRequest(BaseModel):
 
 @router.post("/edit")
 async def edit_content(req: EditRequest):
-    row = get_ai_settings()
+    row = await aget_ai_settings()
     provider = str(row.get("provider", "gemini"))
     app_secret = os.getenv("APP_SECRET")
     model_name = req.model or str(row.get("model", "gemini-2.5-flash"))
@@ -924,9 +929,9 @@ async def edit_content(req: EditRequest):
     )
 
     if provider == "lmstudio":
-        base = decrypt_text(str(row.get("api_key", "")), app_secret) or os.getenv(
-            "LMSTUDIO_BASE", "http://localhost:1234/v1"
-        )
+        base = await adecrypt_setting(
+            str(row.get("api_key", "")), app_secret
+        ) or os.getenv("LMSTUDIO_BASE", "http://localhost:1234/v1")
         url = (base.rstrip("/")) + "/chat/completions"
         try:
             async with httpx.AsyncClient(timeout=60.0) as client:
@@ -949,7 +954,7 @@ async def edit_content(req: EditRequest):
             return {"text": content + "\n\n[stub-edit] " + instruction}
 
     stored = row.get("api_key") or os.getenv("GEMINI_API_KEY")
-    api_key = decrypt_text(str(stored or ""), app_secret)
+    api_key = await adecrypt_setting(str(stored or ""), app_secret)
     if not api_key:
         return {"text": content + "\n\n[stub-edit] " + instruction}
     gclient = genai_client.Client(api_key=api_key)
@@ -960,7 +965,7 @@ async def edit_content(req: EditRequest):
 # 編集ストリーミングAPI
 @router.post("/edit/stream")
 async def edit_content_stream(req: EditRequest):
-    row = get_ai_settings()
+    row = await aget_ai_settings()
     provider = str(row.get("provider", "gemini"))
     app_secret = os.getenv("APP_SECRET")
     model_name = req.model or str(row.get("model", "gemini-2.5-flash"))
@@ -981,9 +986,9 @@ async def edit_content_stream(req: EditRequest):
     )
 
     if provider == "lmstudio":
-        base = decrypt_text(str(row.get("api_key", "")), app_secret) or os.getenv(
-            "LMSTUDIO_BASE", "http://localhost:1234/v1"
-        )
+        base = await adecrypt_setting(
+            str(row.get("api_key", "")), app_secret
+        ) or os.getenv("LMSTUDIO_BASE", "http://localhost:1234/v1")
         url = (base.rstrip("/")) + "/chat/completions"
 
         async def _lm_stream():
@@ -1036,7 +1041,7 @@ async def edit_content_stream(req: EditRequest):
         )
 
     stored = row.get("api_key") or os.getenv("GEMINI_API_KEY")
-    api_key = decrypt_text(str(stored or ""), app_secret)
+    api_key = await adecrypt_setting(str(stored or ""), app_secret)
     if not api_key:
 
         async def _stub_stream():
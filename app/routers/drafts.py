@@ -7,12 +7,17 @@ from app.storage import create_draft as store_create
 from app.storage import delete_draft as store_delete
 from app.storage import (
     delete_markdown_post,
+    get_markdown_post_git_status,
     list_markdown_posts,
     read_markdown_post,
     save_markdown_post,
 )
 from app.storage import get_draft as store_get
+from app.storage import get_draft_revision as store_get_revision
+from app.storage import list_draft_revisions as store_revisions
+from app.storage import list_draft_summaries as store_summaries
 from app.storage import list_drafts as store_list
+from app.storage import restore_draft_revision as store_restore_revision
 from app.storage import update_draft as store_update
 
 router = APIRouter()
@@ -54,6 +59,14 @@ def get_post(filename: str) -> dict:
     return {"filename": filename, "content": content}
 
 
+@router.get("/posts/{filename}/git-status")
+def get_post_git_status(filename: str) -> dict:
+    status = get_markdown_post_git_status(filename)
+    if status is None:
+        raise HTTPException(status_code=404, detail="post not found")
+    return status
+
+
 @router.delete("/posts/{filename}")
 def delete_post(filename: str) -> dict:
     ok = delete_markdown_post(filename)
@@ -67,6 +80,16 @@ def list_drafts() -> List[dict]:
     return store_list()
 
 
+@router.get("/summaries")
+def list_draft_summaries(
+    after: Optional[str] = None, limit: int = 50, preview: int = 120
+) -> dict:
+    try:
+        return store_summaries(after, limit, preview)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
 @router.post("")
 def create_draft(payload: DraftCreate) -> dict:
     return store_create(payload.title.strip() or "無題", payload.content)
@@ -80,6 +103,30 @@ def get_draft(draft_id: int) -> dict:
     return row
 
 
+@router.get("/{draft_id}/revisions")
+def list_draft_revisions(draft_id: int) -> dict:
+    revisions = store_revisions(draft_id)
+    if revisions is None:
+        raise HTTPException(status_code=404, detail="draft not found")
+    return {"draft_id": draft_id, "revisions": revisions}
+
+
+@router.get("/{draft_id}/revisions/{revision}")
+def get_draft_revision(draft_id: int, revision: int) -> dict:
+    row = store_get_revision(draft_id, revision)
+    if not row:
+        raise HTTPException(status_code=404, detail="revision not found")
+    return {"draft_id": draft_id, **row}
+
+
+@router.post("/{draft_id}/revisions/{revision}/restore")
+def restore_draft_revision(draft_id: int, revision: int) -> dict:
+    row = store_restore_revision(draft_id, revision)
+    if not row:
+        raise HTTPException(status_code=404, detail="revision not found")
+    return row
+
+
 @router.put("/{draft_id}")
 def update_draft(draft_id: int, payload: DraftUpdate) -> dict:
     row = store_update(draft_id, payload.title, payload.content)
@@ -2,7 +2,7 @@
 
 import logging
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
@@ -32,7 +32,10 @@ def get_rag_manager() -> RAGManager:
     if _rag_manager is None:
         settings = get_epub_settings()
         _rag_manager = RAGManager(
-            cache_dir=EPUB_CACHE_DIR, embedding_model=settings["embedding_model"]
+            cache_dir=EPUB_CACHE_DIR,
+            embedding_model=settings["embedding_model"],
+            ann=settings["ann_index"],
+            nprobe=settings["ann_nprobe"],
         )
     return _rag_manager
 
@@ -44,17 +47,25 @@ class EpubSettingsUpdate(BaseModel):
     overlap_size: int = 50
     search_top_k: int = 5
     min_similarity_score: float = 0.1
+    # 近似検索（"none" は厳密検索、"ivf" は IVF）と IVF で調べるクラスタ数
+    ann_index: Literal["none", "ivf"] = "none"
+    ann_nprobe: int = 8
 
 
 class IndexRequest(BaseModel):
     epub_directory: Optional[str] = None
     chunk_size: Optional[int] = None
     overlap_size: Optional[int] = None
+    # EPUB を解析するプロセス数と 1 回に埋め込むチャンク数（省略時は環境変数の既定値）
+    workers: Optional[int] = None
+    batch_size: Optional[int] = None
 
 
 class SearchRequest(BaseModel):
     query: str
     book_name: Optional[str] = None
+    # 全書籍検索の対象を絞り込む書籍名
+    books: Optional[list[str]] = None
     top_k: Optional[int] = None
     min_score: Optional[float] = None
 
@@ -98,6 +109,8 @@ def update_settings(settings: EpubSettingsUpdate):
             overlap_size=settings.overlap_size,
             search_top_k=settings.search_top_k,
             min_similarity_score=settings.min_similarity_score,
+            ann_index=settings.ann_index,
+            ann_nprobe=settings.ann_nprobe,
         )
 
         # RAGマネージャーをリセット（新しい設定で再初期化）
@@ -146,12 +159,29 @@ def index_epub_files(request: IndexRequest):
             )
 
         rag_manager = get_rag_manager()
-        indexed_books = rag_manager.index_directory(epub_dir, chunk_size, overlap_size)
+        report = rag_manager.update_directory_index(
+            epub_dir,
+            chunk_size,
+            overlap_size,
+            workers=request.workers,
+            batch_size=request.batch_size,
+        )
 
         return {
             "status": "success",
-            "message": f"{len(indexed_books)}冊の書籍をインデックス化しました",
-            "indexed_books": indexed_books,
+            "message": (
+                f"{len(report.books)}冊の書籍をインデックス化しました"
+                f"（更新 {len(report.indexed)}冊・変更なし {len(report.unchanged)}冊・"
+                f"削除 {len(report.removed)}冊）"
+            ),
+            "indexed_books": report.books,
+            "updated_books": report.indexed,
+            "unchanged_books": report.unchanged,
+            "removed_books": report.removed,
+            "failed_files": report.failed,
+            "embedded_chunks": report.embedded_chunks,
+            "reused_chunks": report.reused_chunks,
+            "throughput": report.stats.as_dict(),
         }
 
     except HTTPException:
@@ -194,7 +224,9 @@ def search_books(request: SearchRequest):
             }
         else:
             # 全書籍で検索
-            all_results = rag_manager.search_all_books(request.query, top_k, min_score)
+            all_results = rag_manager.search_all_books(
+                request.query, top_k, min_score, books=request.books
+            )
 
             results_by_book: dict[str, list[dict[str, object]]] = {}
             total_count = 0
@@ -284,10 +316,14 @@ def health_check():
     try:
         settings = get_epub_settings()
         available_books = []
+        index_cache: dict[str, int] = {}
+        query_cache: dict[str, float] = {}
 
         if EPUB_CACHE_DIR.exists():
             rag_manager = get_rag_manager()
             available_books = rag_manager.get_available_books()
+            index_cache = rag_manager.index_cache.stats()
+            query_cache = rag_manager.query_cache.stats()
 
         return {
             "status": "healthy",
@@ -295,12 +331,32 @@ def health_check():
             "cache_directory": str(EPUB_CACHE_DIR),
             "available_books_count": len(available_books),
             "embedding_model": settings["embedding_model"],
+            "index_cache": index_cache,
+            "query_cache": query_cache,
         }
     except Exception as e:
         _logger.error(f"ヘルスチェックエラー: {e}")
         return {"status": "error", "error": str(e)}
 
 
+@router.get("/ann/recall")
+def ann_recall(k: int = 10, samples: int = 100):
+    """IVF の recall@k と 1 クエリあたりの検索時間を nprobe ごとに返す"""
+    try:
+        report = get_rag_manager().ann_recall_report(
+            max(1, min(100, k)), max(1, min(1000, samples))
+        )
+    except Exception as e:
+        _logger.error(f"recall 計測エラー: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if report is None:
+        raise HTTPException(
+            status_code=404,
+            detail="IVF インデックスがありません（ann_index を ivf にしてください）",
+        )
+    return report
+
+
 @router.get("/books/{book_name}/chapters")
 def get_book_chapters(book_name: str):
     """書籍のチャプター一覧を取得"""
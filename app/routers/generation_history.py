@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
@@ -7,6 +7,7 @@ from app.storage import (
     delete_generation_history,
     get_generation_history,
     list_generation_history,
+    list_generation_history_summaries,
     save_generation_history,
 )
 
@@ -28,6 +29,17 @@ def list_history(limit: int = 20):
     return {"history": list_generation_history(limit)}
 
 
+@router.get("/summaries")
+def list_history_summaries(
+    after: Optional[str] = None, limit: int = 20, preview: int = 120
+):
+    """生成履歴の要約一覧（本文なし・カーソルページング）"""
+    try:
+        return list_generation_history_summaries(after, limit, preview)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.post("")
 def save_history(request: GenerationHistoryRequest):
     """生成履歴の保存"""
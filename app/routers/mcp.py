@@ -8,10 +8,10 @@ from pydantic import BaseModel, Field
 
 from app.mcp_util import GenericMCPClient, test_mcp_connection
 from app.storage import (
-    add_mcp_server,
-    get_mcp_settings,
-    remove_mcp_server,
-    save_mcp_settings,
+    aadd_mcp_server,
+    aget_mcp_settings,
+    aremove_mcp_server,
+    asave_mcp_settings,
 )
 
 logger = logging.getLogger(__name__)
@@ -57,7 +57,7 @@ class MCPToolCallRequest(BaseModel):
 async def get_settings() -> MCPSettings:
     """Get MCP settings."""
     try:
-        settings = get_mcp_settings()
+        settings = await aget_mcp_settings()
 
         # Convert server configs to Pydantic models
         servers = {}
@@ -79,7 +79,7 @@ async def save_settings(settings: MCPSettings) -> Dict[str, str]:
         for server_id, config in settings.servers.items():
             servers[server_id] = config.model_dump()
 
-        save_mcp_settings(servers=servers, enabled=settings.enabled)
+        await asave_mcp_settings(servers=servers, enabled=settings.enabled)
         return {"status": "saved"}
     except Exception as e:
         logger.error(f"Error saving MCP settings: {e}")
@@ -90,7 +90,7 @@ async def save_settings(settings: MCPSettings) -> Dict[str, str]:
 async def add_server(server_id: str, config: MCPServerConfig) -> Dict[str, str]:
     """Add or update an MCP server configuration."""
     try:
-        add_mcp_server(
+        await aadd_mcp_server(
             server_id=server_id,
             name=config.name,
             command=config.command,
@@ -108,7 +108,7 @@ async def add_server(server_id: str, config: MCPServerConfig) -> Dict[str, str]:
 async def delete_server(server_id: str) -> Dict[str, str]:
     """Delete an MCP server configuration."""
     try:
-        if remove_mcp_server(server_id):
+        if await aremove_mcp_server(server_id):
             return {"status": "deleted"}
         else:
             raise HTTPException(status_code=404, detail="Server not found")
@@ -123,7 +123,7 @@ async def delete_server(server_id: str) -> Dict[str, str]:
 async def test_connection(request: MCPTestRequest) -> Dict[str, Any]:
     """Test connection to an MCP server."""
     try:
-        settings = get_mcp_settings()
+        settings = await aget_mcp_settings()
         servers = settings.get("servers", {})
 
         if request.server_id not in servers:
@@ -144,7 +144,7 @@ async def test_connection(request: MCPTestRequest) -> Dict[str, Any]:
 async def list_server_tools(server_id: str) -> Dict[str, Any]:
     """List available tools for an MCP server."""
     try:
-        settings = get_mcp_settings()
+        settings = await aget_mcp_settings()
         servers = settings.get("servers", {})
 
         if server_id not in servers:
@@ -169,7 +169,7 @@ async def list_server_tools(server_id: str) -> Dict[str, Any]:
 async def call_tool(request: MCPToolCallRequest) -> Dict[str, Any]:
     """Call a tool on an MCP server."""
     try:
-        settings = get_mcp_settings()
+        settings = await aget_mcp_settings()
         servers = settings.get("servers", {})
 
         if request.server_id not in servers:
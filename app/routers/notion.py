@@ -11,7 +11,7 @@ from app.notion_util import (
     format_notion_page_for_context,
     test_notion_connection,
 )
-from app.storage import get_notion_settings, save_notion_settings
+from app.storage import aget_notion_settings, asave_notion_settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -55,7 +55,7 @@ class NotionSearchRequest(BaseModel):
 async def get_settings() -> NotionMCPSettings:
     """Get Notion MCP settings."""
     try:
-        settings = get_notion_settings()
+        settings = await aget_notion_settings()
         return NotionMCPSettings(**settings)
     except Exception as e:
         logger.error(f"Error getting Notion settings: {e}")
@@ -66,7 +66,7 @@ async def get_settings() -> NotionMCPSettings:
 async def save_settings(settings: NotionMCPSettings) -> Dict[str, str]:
     """Save Notion MCP settings."""
     try:
-        save_notion_settings(
+        await asave_notion_settings(
             command=settings.command,
             args=settings.args,
             env=settings.env,
@@ -83,7 +83,7 @@ async def save_settings(settings: NotionMCPSettings) -> Dict[str, str]:
 async def test_connection() -> Dict[str, Any]:
     """Test connection to Notion MCP server."""
     try:
-        settings = get_notion_settings()
+        settings = await aget_notion_settings()
 
         if not settings.get("enabled", False):
             return {"connected": False, "error": "Notion integration is disabled"}
@@ -110,7 +110,7 @@ async def test_connection() -> Dict[str, Any]:
 async def list_pages(limit: int = 10) -> List[Dict[str, Any]]:
     """List pages from Notion."""
     try:
-        settings = get_notion_settings()
+        settings = await aget_notion_settings()
 
         if not settings.get("enabled", False):
             raise HTTPException(
@@ -137,7 +137,7 @@ async def list_pages(limit: int = 10) -> List[Dict[str, Any]]:
 async def get_page(page_id: str) -> Dict[str, Any]:
     """Get a specific Notion page."""
     try:
-        settings = get_notion_settings()
+        settings = await aget_notion_settings()
 
         if not settings.get("enabled", False):
             raise HTTPException(
@@ -168,7 +168,7 @@ async def get_page(page_id: str) -> Dict[str, Any]:
 async def search_pages(request: NotionSearchRequest) -> List[Dict[str, Any]]:
     """Search pages in Notion."""
     try:
-        settings = get_notion_settings()
+        settings = await aget_notion_settings()
 
         if not settings.get("enabled", False):
             raise HTTPException(
@@ -195,7 +195,7 @@ async def search_pages(request: NotionSearchRequest) -> List[Dict[str, Any]]:
 async def create_page(request: NotionPageRequest) -> Dict[str, Any]:
     """Create a new page in Notion."""
     try:
-        settings = get_notion_settings()
+        settings = await aget_notion_settings()
 
         if not settings.get("enabled", False):
             raise HTTPException(
@@ -229,7 +229,7 @@ async def create_page(request: NotionPageRequest) -> Dict[str, Any]:
 async def get_page_context(page_id: str) -> Dict[str, str]:
     """Get formatted page content for use as context in article generation."""
     try:
-        settings = get_notion_settings()
+        settings = await aget_notion_settings()
 
         if not settings.get("enabled", False):
             raise HTTPException(
@@ -261,7 +261,7 @@ async def get_page_context(page_id: str) -> Dict[str, str]:
 async def publish_article(request: NotionPageRequest) -> Dict[str, Any]:
     """Publish generated article as a new page in Notion."""
     try:
-        settings = get_notion_settings()
+        settings = await aget_notion_settings()
 
         if not settings.get("enabled", False):
             raise HTTPException(
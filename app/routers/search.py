@@ -0,0 +1,26 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from app.storage import SEARCH_KINDS, search_documents
+
+router = APIRouter()
+
+
+@router.get("")
+def search(q: str, kinds: Optional[str] = None, limit: int = 20):
+    """下書き・記事・生成履歴の全文検索
+
+    kinds はカンマ区切り（draft, post, history）。省略時はすべて。
+    """
+    selected = None
+    if kinds:
+        selected = [k.strip() for k in kinds.split(",") if k.strip()]
+        invalid = [k for k in selected if k not in SEARCH_KINDS]
+        if invalid:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid kinds: {','.join(invalid)}"
+            )
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query is empty")
+    return search_documents(q, selected, limit)
@@ -0,0 +1,140 @@
+"""待ち時間を計測する読み取り/書き込みロック
+
+読み取りは並行に進み、書き込みは排他。書き込み待ちがいる間は新しい
+読み取りを待たせる（書き込み優先）。再入不可。
+`lock_file` を指定するとプロセス内ロックの取得後にファイルロック
+（読み取りは共有、書き込みは排他）も取り、他プロセスとも排他する。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+from app import file_lock
+
+
+@dataclass
+class LockStats:
+    """ロック取得回数と待ち時間（秒）の累計"""
+
+    reads: int = 0
+    writes: int = 0
+    read_wait: float = 0.0
+    write_wait: float = 0.0
+    max_read_wait: float = 0.0
+    max_write_wait: float = 0.0
+
+
+class RWLock:
+    """書き込み優先の読み取り/書き込みロック"""
+
+    def __init__(self, name: str, lock_file: Optional[Callable[[], Path]] = None):
+        """初期化
+
+        Args:
+            name: 統計表示用の名前
+            lock_file: プロセス間ロックに使うファイルのパスを返す関数
+        """
+        self.name = name
+        self._lock_file = lock_file
+        self._local = threading.local()
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+        self._stats = LockStats()
+
+    def acquire_read(self) -> None:
+        start = time.perf_counter()
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            self._local.fd = self._acquire_file(exclusive=False)
+        except BaseException:
+            self._release_reader()
+            raise
+        with self._cond:
+            waited = time.perf_counter() - start
+            self._stats.reads += 1
+            self._stats.read_wait += waited
+            self._stats.max_read_wait = max(self._stats.max_read_wait, waited)
+
+    def release_read(self) -> None:
+        try:
+            file_lock.release(self._local.fd)
+        finally:
+            self._local.fd = None
+            self._release_reader()
+
+    def _release_reader(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        start = time.perf_counter()
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            self._local.fd = self._acquire_file(exclusive=True)
+        except BaseException:
+            self._release_writer()
+            raise
+        with self._cond:
+            waited = time.perf_counter() - start
+            self._stats.writes += 1
+            self._stats.write_wait += waited
+            self._stats.max_write_wait = max(self._stats.max_write_wait, waited)
+
+    def release_write(self) -> None:
+        try:
+            file_lock.release(self._local.fd)
+        finally:
+            self._local.fd = None
+            self._release_writer()
+
+    def _release_writer(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    def _acquire_file(self, exclusive: bool) -> Optional[int]:
+        if self._lock_file is None:
+            return None
+        return file_lock.acquire(self._lock_file(), exclusive)
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return dict(asdict(self._stats))
+
+    def reset_stats(self) -> None:
+        with self._cond:
+            self._stats = LockStats()
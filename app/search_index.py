@@ -0,0 +1,286 @@
+"""日本語対応の全文検索インデックス
+
+NFKC 正規化・小文字化したテキストを、CJK（ひらがな・カタカナ・漢字・
+ハングル）の連続部分は文字 bigram に、それ以外の英数字は単語に分割して
+転置インデックスを作る。スコアは BM25。文書の追加・削除は差分で行う。
+スニペットは索引に登録したタイトル・本文から作り、文書を読み直さない。
+"""
+
+import bisect
+import heapq
+import itertools
+import math
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# BM25 パラメータ
+BM25_K1 = 1.2
+BM25_B = 0.75
+# タイトル中の語の重み（本文 1 回分に対する倍率）
+TITLE_WEIGHT = 2
+# 1 文字クエリを展開する bigram 数の上限
+SINGLE_CHAR_EXPANSION = 200
+# スニペットの一致箇所を探すときに一度に正規化する文字数
+SNIPPET_CHUNK = 1024
+# スニペット内で強調する一致の上限
+SNIPPET_MAX_MARKS = 32
+
+_CJK_RANGES = (
+    (0x3040, 0x30FF),  # ひらがな・カタカナ
+    (0x3400, 0x4DBF),  # CJK 統合漢字拡張 A
+    (0x4E00, 0x9FFF),  # CJK 統合漢字
+    (0xF900, 0xFAFF),  # CJK 互換漢字
+    (0xAC00, 0xD7AF),  # ハングル
+)
+
+
+def _is_cjk(ch: str) -> bool:
+    code = ord(ch)
+    return any(lo <= code <= hi for lo, hi in _CJK_RANGES)
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def segments(text: str) -> List[Tuple[str, bool]]:
+    """正規化済みテキストを (連続部分, CJK か) に分ける"""
+    out: List[Tuple[str, bool]] = []
+    buf: List[str] = []
+    buf_cjk = False
+    for ch in text:
+        if _is_cjk(ch):
+            kind: Optional[bool] = True
+        elif ch.isalnum() or ch == "_":
+            kind = False
+        else:
+            kind = None
+        if kind is None or (buf and kind != buf_cjk):
+            if buf:
+                out.append(("".join(buf), buf_cjk))
+                buf = []
+        if kind is not None:
+            buf.append(ch)
+            buf_cjk = kind
+    if buf:
+        out.append(("".join(buf), buf_cjk))
+    return out
+
+
+def tokenize(text: str) -> List[str]:
+    """CJK は bigram（1 文字だけの場合はその文字）、その他は単語に分割する"""
+    tokens: List[str] = []
+    for seg, cjk in segments(normalize(text)):
+        if not cjk:
+            tokens.append(seg)
+        elif len(seg) == 1:
+            tokens.append(seg)
+        else:
+            tokens.extend(seg[i : i + 2] for i in range(len(seg) - 1))
+    return tokens
+
+
+def _term_freqs(title: str, body: str) -> Dict[str, int]:
+    tf: Dict[str, int] = {}
+    for tok in tokenize(title):
+        tf[tok] = tf.get(tok, 0) + TITLE_WEIGHT
+    for tok in tokenize(body):
+        tf[tok] = tf.get(tok, 0) + 1
+    return tf
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    key: str
+    score: float
+
+
+class SearchIndex:
+    """BM25 による転置インデックス
+
+    文書キーは `<kind>:<id>` 形式で、kind による絞り込みに使う。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Dict[str, int]] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._docs: Dict[str, Tuple[str, str]] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._doc_len)
+
+    def _remove_locked(self, key: str) -> None:
+        terms = self._doc_terms.pop(key, None)
+        if terms is None:
+            return
+        for tok in terms:
+            posting = self._postings.get(tok)
+            if posting is None:
+                continue
+            posting.pop(key, None)
+            if not posting:
+                del self._postings[tok]
+        self._total_len -= self._doc_len.pop(key, 0)
+        self._docs.pop(key, None)
+
+    def add(self, key: str, title: str, body: str) -> None:
+        """文書を追加する（既存なら置き換え）"""
+        tf = _term_freqs(title, body)
+        with self._lock:
+            self._remove_locked(key)
+            for tok, n in tf.items():
+                self._postings.setdefault(tok, {})[key] = n
+            self._doc_terms[key] = tf
+            self._docs[key] = (title, body)
+            length = sum(tf.values())
+            self._doc_len[key] = length
+            self._total_len += length
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._remove_locked(key)
+
+    def document(self, key: str) -> Optional[Tuple[str, str]]:
+        """登録した (タイトル, 本文)（無ければ None）"""
+        with self._lock:
+            return self._docs.get(key)
+
+    def remove_kind(self, kind: str) -> None:
+        prefix = f"{kind}:"
+        with self._lock:
+            for key in [k for k in self._doc_len if k.startswith(prefix)]:
+                self._remove_locked(key)
+
+    def _expand(self, tok: str) -> List[str]:
+        if len(tok) == 1 and _is_cjk(tok):
+            # 1 文字の CJK クエリはその文字を含む bigram にも一致させる
+            found = [t for t in self._postings if tok in t]
+            return found[:SINGLE_CHAR_EXPANSION]
+        return [tok] if tok in self._postings else []
+
+    def search(
+        self, query: str, kinds: Optional[Iterable[str]] = None, limit: int = 20
+    ) -> List[SearchHit]:
+        """全クエリ語を含む文書を BM25 の高い順に返す"""
+        q_tokens = list(dict.fromkeys(tokenize(query)))
+        if not q_tokens:
+            return []
+        prefixes = tuple(f"{k}:" for k in kinds) if kinds else None
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if n_docs == 0:
+                return []
+            avg_len = self._total_len / n_docs
+            groups = [self._expand(tok) for tok in q_tokens]
+            if any(not g for g in groups):
+                return []
+            # 文書頻度の小さい語から積集合を取る
+            groups.sort(key=lambda g: sum(len(self._postings[t]) for t in g))
+            candidates: Optional[Set[str]] = None
+            for g in groups:
+                docs: Set[str] = set()
+                for t in g:
+                    docs.update(self._postings[t])
+                candidates = docs if candidates is None else candidates & docs
+                if not candidates:
+                    return []
+            assert candidates is not None
+            if prefixes is not None:
+                candidates = {k for k in candidates if k.startswith(prefixes)}
+            scores: Dict[str, float] = {}
+            for g in groups:
+                for t in g:
+                    posting = self._postings[t]
+                    idf = math.log(
+                        1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5)
+                    )
+                    for key in candidates:
+                        tf = posting.get(key)
+                        if not tf:
+                            continue
+                        norm = BM25_K1 * (
+                            1 - BM25_B + BM25_B * self._doc_len[key] / avg_len
+                        )
+                        scores[key] = scores.get(key, 0.0) + idf * (
+                            tf * (BM25_K1 + 1) / (tf + norm)
+                        )
+        top = heapq.nlargest(limit, scores.items(), key=lambda kv: (kv[1], kv[0]))
+        return [SearchHit(key, score) for key, score in top]
+
+
+def highlight_terms(query: str) -> List[str]:
+    """スニペットで強調する語（クエリの連続部分）"""
+    terms = [seg for seg, _ in segments(normalize(query))]
+    return sorted(set(terms), key=len, reverse=True)
+
+
+def _match_window(text: str, pattern: re.Pattern, overlap: int) -> Tuple[int, int]:
+    """最初の一致を含む text の範囲 [lo, hi)（一致が無ければ (0, 0)）
+
+    正規化は先頭から SNIPPET_CHUNK 文字ずつまとめて行い、一致した塊で止める。
+    """
+    for start in range(0, len(text), SNIPPET_CHUNK):
+        end = min(len(text), start + SNIPPET_CHUNK + overlap)
+        if pattern.search(normalize(text[start:end])):
+            return start, end
+    return 0, 0
+
+
+def _window_spans(
+    window: str, pattern: re.Pattern, offset: int
+) -> List[Tuple[int, int]]:
+    """window 内の重ならない一致範囲を、先頭から元の text の位置で返す"""
+    # 元の文字位置を保ったまま 1 文字ずつ正規化して照合する
+    norm_chars = [normalize(ch) for ch in window]
+    starts: List[int] = []
+    pos = 0
+    for piece in norm_chars:
+        starts.append(pos)
+        pos += len(piece)
+    norm = "".join(norm_chars)
+
+    def to_orig(n: int) -> int:
+        return bisect.bisect_right(starts, n) - 1
+
+    spans: List[Tuple[int, int]] = []
+    for m in itertools.islice(pattern.finditer(norm), SNIPPET_MAX_MARKS):
+        a = offset + to_orig(m.start())
+        b = offset + to_orig(m.end() - 1) + 1
+        # 正規化で複数文字に展開された文字の中では一致が重なりうる
+        if spans and a < spans[-1][1]:
+            continue
+        spans.append((a, b))
+    return spans
+
+
+def make_snippet(
+    text: str, query: str, width: int = 120
+) -> Tuple[str, List[Tuple[int, int]]]:
+    """最初の一致箇所周辺の抜粋と、抜粋内の一致範囲 [(start, end)] を返す"""
+    terms = highlight_terms(query)
+    spans: List[Tuple[int, int]] = []
+    if terms:
+        # 長い語を先に並べ、同じ位置では長い方に一致させる
+        pattern = re.compile("|".join(re.escape(t) for t in terms))
+        lo, hi = _match_window(text, pattern, max(len(t) for t in terms))
+        if hi:
+            lo, hi = max(0, lo - width), min(len(text), hi + width)
+            spans = _window_spans(text[lo:hi], pattern, lo)
+    first = spans[0][0] if spans else 0
+    begin = max(0, first - width // 3)
+    end = min(len(text), begin + width)
+    snippet = text[begin:end].replace("\n", " ")
+    marks = [(a - begin, b - begin) for a, b in spans if a >= begin and b <= end]
+    if begin > 0:
+        snippet = "…" + snippet
+        marks = [(a + 1, b + 1) for a, b in marks]
+    if end < len(text):
+        snippet += "…"
+    return snippet, marks
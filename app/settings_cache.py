@@ -0,0 +1,127 @@
+"""settings.json のプロセス内スナップショットキャッシュ
+
+ファイルの (inode, mtime_ns, size) が変わらない限り、パース済みの内容と
+復号済みの値を使い回す。保存側は `store()` で書き込み内容を反映する。
+"""
+
+import copy
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.file_lock import StatKey, stat_key
+from app.security import decrypt_text
+
+
+@dataclass
+class SettingsSnapshot:
+    """ある時点の settings.json の内容"""
+
+    key: StatKey
+    data: Dict[str, Any]
+    decrypted: Dict[Tuple[str, str], str] = field(default_factory=dict)
+    # 最後にファイルの stat と突き合わせた時刻（time.monotonic）
+    checked_at: float = field(default_factory=time.monotonic)
+
+
+_lock = threading.Lock()
+_snapshots: Dict[Path, SettingsSnapshot] = {}
+
+
+def load(path: Path) -> Optional[SettingsSnapshot]:
+    """スナップショットを取得する（ファイルが無い/壊れている場合は None）
+
+    返す `data` は共有オブジェクトのため、呼び出し側で変更しないこと。
+    """
+    key = stat_key(path)
+    if key is None:
+        with _lock:
+            _snapshots.pop(path, None)
+        return None
+    with _lock:
+        snap = _snapshots.get(path)
+        if snap is not None and snap.key == key:
+            snap.checked_at = time.monotonic()
+            return snap
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    snap = SettingsSnapshot(key=key, data=data)
+    with _lock:
+        _snapshots[path] = snap
+    return snap
+
+
+def peek(path: Path, max_age: float) -> Optional[SettingsSnapshot]:
+    """直近 max_age 秒以内に検証済みのスナップショットを I/O なしで返す"""
+    with _lock:
+        snap = _snapshots.get(path)
+    if snap is None or time.monotonic() - snap.checked_at > max_age:
+        return None
+    return snap
+
+
+def cached_decrypt(path: Path, value: str, secret: Optional[str]) -> Optional[str]:
+    """メモ化済みの復号結果（I/O なし。無ければ None）"""
+    if not value or not value.startswith("enc:"):
+        return value
+    with _lock:
+        snap = _snapshots.get(path)
+        if snap is None:
+            return None
+        return snap.decrypted.get((value, secret or ""))
+
+
+def read(path: Path, default: Dict[str, Any]) -> Dict[str, Any]:
+    """読み取り専用の設定内容を返す（共有オブジェクト）"""
+    snap = load(path)
+    return snap.data if snap is not None else default
+
+
+def read_for_update(path: Path, default: Dict[str, Any]) -> Dict[str, Any]:
+    """更新用に複製した設定内容を返す"""
+    return copy.deepcopy(read(path, default))
+
+
+def store(path: Path, data: Dict[str, Any]) -> None:
+    """書き込み直後の内容をキャッシュへ反映する（write-through）"""
+    key = stat_key(path)
+    with _lock:
+        if key is None:
+            _snapshots.pop(path, None)
+        else:
+            _snapshots[path] = SettingsSnapshot(key=key, data=copy.deepcopy(data))
+
+
+def invalidate(path: Optional[Path] = None) -> None:
+    """キャッシュを破棄する（path 省略時は全件）"""
+    with _lock:
+        if path is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(path, None)
+
+
+def decrypt(path: Path, value: str, secret: Optional[str]) -> str:
+    """`decrypt_text` の結果をスナップショット単位でメモ化する"""
+    if not value or not value.startswith("enc:"):
+        return value
+    snap = load(path)
+    if snap is None:
+        return decrypt_text(value, secret)
+    memo_key = (value, secret or "")
+    with _lock:
+        hit = snap.decrypted.get(memo_key)
+    if hit is not None:
+        return hit
+    plain = decrypt_text(value, secret)
+    with _lock:
+        snap.decrypted[memo_key] = plain
+    return plain
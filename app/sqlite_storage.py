@@ -0,0 +1,587 @@
+"""SQLite ストレージバックエンド
+
+下書き・生成履歴・文体・テンプレートのバージョン履歴を 1 つの SQLite
+ファイル（WAL モード）に保存する。`app.storage` の公開関数から呼び出され、
+関数シグネチャや戻り値の形は JSON バックエンドと同一に保つ。
+"""
+
+import json
+import logging
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Index,
+    Integer,
+    String,
+    Text,
+    create_engine,
+    delete,
+    event,
+    func,
+    select,
+    text,
+    tuple_,
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+_logger = logging.getLogger(__name__)
+
+# 生成履歴の保持件数（JSON バックエンドと同じ）
+HISTORY_LIMIT = 20000
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class DraftRow(Base):
+    """下書き"""
+
+    __tablename__ = "drafts"
+    __table_args__ = (
+        Index("ix_drafts_updated_at_id", "updated_at", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    title: Mapped[str] = mapped_column(Text, default="")
+    content: Mapped[str] = mapped_column(Text, default="")
+    created_at: Mapped[str] = mapped_column(String(40))
+    updated_at: Mapped[str] = mapped_column(String(40))
+
+
+class GenerationHistoryRow(Base):
+    """生成履歴"""
+
+    __tablename__ = "generation_history"
+    __table_args__ = (
+        Index("ix_generation_history_created_at_id", "created_at", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    title: Mapped[str] = mapped_column(Text, default="")
+    template_type: Mapped[str] = mapped_column(String(200), default="")
+    widgets_used: Mapped[str] = mapped_column(Text, default="[]")
+    properties: Mapped[str] = mapped_column(Text, default="{}")
+    generated_content: Mapped[str] = mapped_column(Text, default="")
+    reasoning: Mapped[str] = mapped_column(Text, default="")
+    created_at: Mapped[str] = mapped_column(String(40))
+
+
+class WritingStyleRow(Base):
+    """文体テンプレート"""
+
+    __tablename__ = "writing_styles"
+
+    id: Mapped[str] = mapped_column(String(200), primary_key=True)
+    name: Mapped[str] = mapped_column(Text, default="")
+    properties: Mapped[str] = mapped_column(Text, default="{}")
+    source_text: Mapped[str] = mapped_column(Text, default="")
+    description: Mapped[str] = mapped_column(Text, default="")
+    created_at: Mapped[str] = mapped_column(String(40))
+    updated_at: Mapped[str] = mapped_column(String(40), index=True)
+
+
+class TemplateVersionRow(Base):
+    """記事テンプレートのバージョンスナップショット"""
+
+    __tablename__ = "template_versions"
+    __table_args__ = (
+        Index("ix_template_versions_type_version", "template_type", "version"),
+        {"sqlite_autoincrement": True},
+    )
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    template_type: Mapped[str] = mapped_column(String(200))
+    created_at: Mapped[str] = mapped_column(String(40), index=True)
+    data: Mapped[str] = mapped_column(Text, default="{}")
+
+
+class MetaRow(Base):
+    """移行状況などのメタ情報"""
+
+    __tablename__ = "meta"
+
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    value: Mapped[str] = mapped_column(Text, default="")
+
+
+def _now_iso() -> str:
+    return datetime.now(UTC).isoformat()
+
+
+def _draft_dict(row: DraftRow) -> Dict[str, Any]:
+    return {
+        "id": int(row.id),
+        "title": str(row.title or ""),
+        "content": str(row.content or ""),
+        "created_at": str(row.created_at),
+        "updated_at": str(row.updated_at),
+    }
+
+
+def _history_dict(row: GenerationHistoryRow) -> Dict[str, Any]:
+    return {
+        "id": int(row.id),
+        "title": str(row.title or ""),
+        "template_type": str(row.template_type or ""),
+        "widgets_used": list(json.loads(row.widgets_used or "[]")),
+        "properties": dict(json.loads(row.properties or "{}")),
+        "generated_content": str(row.generated_content or ""),
+        "reasoning": str(row.reasoning or ""),
+        "created_at": str(row.created_at),
+    }
+
+
+def _style_dict(row: WritingStyleRow) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "name": str(row.name or ""),
+        "properties": dict(json.loads(row.properties or "{}")),
+        "source_text": str(row.source_text or ""),
+        "description": str(row.description or ""),
+        "created_at": str(row.created_at),
+        "updated_at": str(row.updated_at),
+    }
+
+
+class SQLiteStore:
+    """SQLite（WAL）によるストレージ実装"""
+
+    def __init__(self, path: Path):
+        """初期化
+
+        Args:
+            path: SQLite データベースファイルのパス
+        """
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.engine = create_engine(f"sqlite:///{path}", echo=False)
+        event.listen(self.engine, "connect", self._on_connect)
+        Base.metadata.create_all(bind=self.engine)
+
+    @staticmethod
+    def _on_connect(dbapi_conn: Any, _record: Any) -> None:
+        # WAL により読み取りが書き込みをブロックしない
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA busy_timeout=5000")
+        cur.close()
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+    def journal_mode(self) -> str:
+        with self.engine.connect() as conn:
+            return str(conn.execute(text("PRAGMA journal_mode")).scalar())
+
+    # ----- drafts -----
+    def list_drafts(self) -> List[Dict[str, Any]]:
+        with Session(self.engine) as s:
+            rows = s.scalars(
+                select(DraftRow).order_by(
+                    DraftRow.updated_at.desc(), DraftRow.id.desc()
+                )
+            )
+            return [_draft_dict(r) for r in rows]
+
+    def list_draft_summaries(
+        self, after: Optional[Tuple[str, int]], limit: int, preview_chars: int
+    ) -> List[Dict[str, Any]]:
+        stmt = select(
+            DraftRow.id,
+            DraftRow.title,
+            DraftRow.created_at,
+            DraftRow.updated_at,
+            func.length(DraftRow.content),
+            func.substr(DraftRow.content, 1, preview_chars),
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(DraftRow.updated_at, DraftRow.id) < after)
+        stmt = stmt.order_by(DraftRow.updated_at.desc(), DraftRow.id.desc()).limit(
+            limit
+        )
+        with Session(self.engine) as s:
+            return [
+                {
+                    "id": int(r[0]),
+                    "title": str(r[1] or ""),
+                    "created_at": str(r[2]),
+                    "updated_at": str(r[3]),
+                    "content_length": int(r[4] or 0),
+                    "preview": str(r[5] or ""),
+                }
+                for r in s.execute(stmt)
+            ]
+
+    def create_draft(self, title: str, content: str) -> Dict[str, Any]:
+        now = _now_iso()
+        with Session(self.engine) as s, s.begin():
+            row = DraftRow(
+                title=title or "無題", content=content, created_at=now, updated_at=now
+            )
+            s.add(row)
+            s.flush()
+            return _draft_dict(row)
+
+    def get_draft(self, draft_id: int) -> Optional[Dict[str, Any]]:
+        with Session(self.engine) as s:
+            row = s.get(DraftRow, draft_id)
+            return _draft_dict(row) if row else None
+
+    def update_draft(
+        self, draft_id: int, title: Optional[str], content: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        with Session(self.engine) as s, s.begin():
+            row = s.get(DraftRow, draft_id)
+            if row is None:
+                return None
+            changed = False
+            if title is not None and title.strip():
+                row.title = title.strip()
+                changed = True
+            if content is not None:
+                row.content = content
+                changed = True
+            if changed:
+                row.updated_at = _now_iso()
+            return _draft_dict(row)
+
+    def delete_draft(self, draft_id: int) -> bool:
+        with Session(self.engine) as s, s.begin():
+            res = s.execute(delete(DraftRow).where(DraftRow.id == draft_id))
+            return bool(getattr(res, "rowcount", 0))
+
+    # ----- generation history -----
+    def save_generation_history(
+        self,
+        title: str,
+        template_type: str,
+        widgets_used: List[str],
+        properties: Dict[str, str],
+        generated_content: str,
+        reasoning: str,
+    ) -> Dict[str, Any]:
+        with Session(self.engine) as s, s.begin():
+            row = GenerationHistoryRow(
+                title=title,
+                template_type=template_type,
+                widgets_used=json.dumps(widgets_used, ensure_ascii=False),
+                properties=json.dumps(properties, ensure_ascii=False),
+                generated_content=generated_content,
+                reasoning=reasoning,
+                created_at=_now_iso(),
+            )
+            s.add(row)
+            s.flush()
+            item = _history_dict(row)
+            # 最新 HISTORY_LIMIT 件まで保持
+            cutoff = s.scalar(
+                select(GenerationHistoryRow.id)
+                .order_by(GenerationHistoryRow.id.desc())
+                .offset(HISTORY_LIMIT)
+                .limit(1)
+            )
+            if cutoff is not None:
+                s.execute(
+                    delete(GenerationHistoryRow).where(
+                        GenerationHistoryRow.id <= cutoff
+                    )
+                )
+            return item
+
+    def list_generation_history(self, limit: int) -> List[Dict[str, Any]]:
+        cols = (
+            GenerationHistoryRow.id,
+            GenerationHistoryRow.title,
+            GenerationHistoryRow.template_type,
+            GenerationHistoryRow.widgets_used,
+            GenerationHistoryRow.properties,
+            GenerationHistoryRow.created_at,
+            func.length(GenerationHistoryRow.generated_content),
+        )
+        with Session(self.engine) as s:
+            rows = s.execute(
+                select(*cols)
+                .order_by(
+                    GenerationHistoryRow.created_at.desc(),
+                    GenerationHistoryRow.id.desc(),
+                )
+                .limit(max(0, limit))
+            )
+            return [
+                {
+                    "id": int(r[0]),
+                    "title": str(r[1] or ""),
+                    "template_type": str(r[2] or ""),
+                    "widgets_used": list(json.loads(r[3] or "[]")),
+                    "properties": dict(json.loads(r[4] or "{}")),
+                    "created_at": str(r[5]),
+                    "content_length": int(r[6] or 0),
+                }
+                for r in rows
+            ]
+
+    def list_generation_history_summaries(
+        self, after: Optional[Tuple[str, int]], limit: int, preview_chars: int
+    ) -> List[Dict[str, Any]]:
+        h = GenerationHistoryRow
+        stmt = select(
+            h.id,
+            h.title,
+            h.template_type,
+            h.widgets_used,
+            h.created_at,
+            func.length(h.generated_content),
+            func.substr(h.generated_content, 1, preview_chars),
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(h.created_at, h.id) < after)
+        stmt = stmt.order_by(h.created_at.desc(), h.id.desc()).limit(limit)
+        with Session(self.engine) as s:
+            return [
+                {
+                    "id": int(r[0]),
+                    "title": str(r[1] or ""),
+                    "template_type": str(r[2] or ""),
+                    "widgets_used": list(json.loads(r[3] or "[]")),
+                    "created_at": str(r[4]),
+                    "content_length": int(r[5] or 0),
+                    "preview": str(r[6] or ""),
+                }
+                for r in s.execute(stmt)
+            ]
+
+    def generation_history_documents(self) -> List[Tuple[int, str, str]]:
+        """保持している全履歴の (id, タイトル, 本文)（全文検索の構築用）"""
+        h = GenerationHistoryRow
+        with Session(self.engine) as s:
+            rows = s.execute(select(h.id, h.title, h.generated_content).order_by(h.id))
+            return [(int(r[0]), str(r[1] or ""), str(r[2] or "")) for r in rows]
+
+    def get_generation_history(self, history_id: int) -> Optional[Dict[str, Any]]:
+        with Session(self.engine) as s:
+            row = s.get(GenerationHistoryRow, history_id)
+            return _history_dict(row) if row else None
+
+    def delete_generation_history(self, history_id: int) -> bool:
+        with Session(self.engine) as s, s.begin():
+            res = s.execute(
+                delete(GenerationHistoryRow).where(
+                    GenerationHistoryRow.id == history_id
+                )
+            )
+            return bool(getattr(res, "rowcount", 0))
+
+    def change_marker(self, kind: str) -> Tuple[int, str, int]:
+        """下書き/生成履歴の変更検知用の (件数, 最新時刻, 最大 ID)"""
+        if kind == "draft":
+            cols = (DraftRow.id, DraftRow.updated_at)
+        else:
+            cols = (GenerationHistoryRow.id, GenerationHistoryRow.created_at)
+        with Session(self.engine) as s:
+            row = s.execute(
+                select(func.count(cols[0]), func.max(cols[1]), func.max(cols[0]))
+            ).one()
+        return (int(row[0] or 0), str(row[1] or ""), int(row[2] or 0))
+
+    # ----- writing styles -----
+    def save_writing_style(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        with Session(self.engine) as s, s.begin():
+            s.merge(
+                WritingStyleRow(
+                    id=item["id"],
+                    name=item["name"],
+                    properties=json.dumps(item["properties"], ensure_ascii=False),
+                    source_text=item["source_text"],
+                    description=item["description"],
+                    created_at=item["created_at"],
+                    updated_at=item["updated_at"],
+                )
+            )
+        return item
+
+    def get_writing_style(self, style_id: str) -> Optional[Dict[str, Any]]:
+        with Session(self.engine) as s:
+            row = s.get(WritingStyleRow, style_id)
+            return _style_dict(row) if row else None
+
+    def list_writing_styles(self) -> List[Dict[str, Any]]:
+        with Session(self.engine) as s:
+            rows = s.scalars(
+                select(WritingStyleRow).order_by(WritingStyleRow.updated_at.desc())
+            )
+            return [_style_dict(r) for r in rows]
+
+    def delete_writing_style(self, style_id: str) -> bool:
+        with Session(self.engine) as s, s.begin():
+            res = s.execute(
+                delete(WritingStyleRow).where(WritingStyleRow.id == style_id)
+            )
+            return bool(getattr(res, "rowcount", 0))
+
+    # ----- template versions -----
+    def list_template_versions(self, t: str) -> List[Dict[str, Any]]:
+        with Session(self.engine) as s:
+            rows = s.execute(
+                select(TemplateVersionRow.version, TemplateVersionRow.created_at)
+                .where(TemplateVersionRow.template_type == t)
+                .order_by(TemplateVersionRow.version)
+            )
+            return [{"version": int(v), "created_at": str(c)} for v, c in rows]
+
+    def get_template_version(self, t: str, version: int) -> Optional[Dict[str, Any]]:
+        with Session(self.engine) as s:
+            row = s.get(TemplateVersionRow, int(version))
+            if row is None or row.template_type != t:
+                return None
+            data = json.loads(row.data or "{}")
+            if not isinstance(data, dict):
+                return None
+            return {
+                "version": int(row.version),
+                "created_at": str(row.created_at),
+                "data": data,
+            }
+
+    def last_template_data(self, t: str) -> Optional[Dict[str, Any]]:
+        with Session(self.engine) as s:
+            raw = s.scalar(
+                select(TemplateVersionRow.data)
+                .where(TemplateVersionRow.template_type == t)
+                .order_by(TemplateVersionRow.version.desc())
+                .limit(1)
+            )
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return data if isinstance(data, dict) else None
+
+    def append_template_version(self, t: str, tpl: Dict[str, Any]) -> int:
+        with Session(self.engine) as s, s.begin():
+            row = TemplateVersionRow(
+                template_type=t,
+                created_at=_now_iso(),
+                data=json.dumps(tpl, ensure_ascii=False),
+            )
+            s.add(row)
+            s.flush()
+            return int(row.version)
+
+    # ----- migration -----
+    def is_migrated(self) -> bool:
+        with Session(self.engine) as s:
+            return s.get(MetaRow, "migrated_from_json") is not None
+
+    def migrate_from_json(
+        self,
+        drafts: List[Dict[str, Any]],
+        drafts_next_id: int,
+        history: Dict[str, Any],
+        styles: Dict[str, Any],
+        versions: Dict[str, Any],
+    ) -> Dict[str, int]:
+        """JSON バックエンドの内容を一度だけ取り込む
+
+        Returns:
+            コレクション毎の取り込み件数
+        """
+        counts = {"drafts": 0, "generation_history": 0, "writing_styles": 0}
+        counts["template_versions"] = 0
+        with Session(self.engine) as s, s.begin():
+            if s.get(MetaRow, "migrated_from_json") is not None:
+                return counts
+            for d in drafts:
+                s.merge(
+                    DraftRow(
+                        id=int(d["id"]),
+                        title=str(d.get("title", "")),
+                        content=str(d.get("content", "")),
+                        created_at=str(d.get("created_at", _now_iso())),
+                        updated_at=str(d.get("updated_at", _now_iso())),
+                    )
+                )
+                counts["drafts"] += 1
+            for h in history.get("items", []):
+                try:
+                    s.merge(
+                        GenerationHistoryRow(
+                            id=int(h["id"]),
+                            title=str(h.get("title", "")),
+                            template_type=str(h.get("template_type", "")),
+                            widgets_used=json.dumps(
+                                list(h.get("widgets_used", [])), ensure_ascii=False
+                            ),
+                            properties=json.dumps(
+                                dict(h.get("properties", {})), ensure_ascii=False
+                            ),
+                            generated_content=str(h.get("generated_content", "")),
+                            reasoning=str(h.get("reasoning", "")),
+                            created_at=str(h.get("created_at", _now_iso())),
+                        )
+                    )
+                except (KeyError, TypeError, ValueError):
+                    continue
+                counts["generation_history"] += 1
+            for sid, st in dict(styles.get("items", {})).items():
+                if not isinstance(st, dict):
+                    continue
+                s.merge(
+                    WritingStyleRow(
+                        id=str(sid),
+                        name=str(st.get("name", "")),
+                        properties=json.dumps(
+                            dict(st.get("properties", {})), ensure_ascii=False
+                        ),
+                        source_text=str(st.get("source_text", "")),
+                        description=str(st.get("description", "")),
+                        created_at=str(st.get("created_at", _now_iso())),
+                        updated_at=str(st.get("updated_at", _now_iso())),
+                    )
+                )
+                counts["writing_styles"] += 1
+            for t, arr in dict(versions.get("items", {})).items():
+                if not isinstance(arr, list):
+                    continue
+                for it in arr:
+                    try:
+                        s.merge(
+                            TemplateVersionRow(
+                                version=int(it["version"]),
+                                template_type=str(t),
+                                created_at=str(it.get("created_at", _now_iso())),
+                                data=json.dumps(it.get("data", {}), ensure_ascii=False),
+                            )
+                        )
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    counts["template_versions"] += 1
+            s.flush()
+            # JSON 側で払い出し済みの ID を再利用しないよう採番を引き継ぐ
+            seqs = {
+                "drafts": drafts_next_id - 1,
+                "generation_history": int(history.get("next_id", 1)) - 1,
+                "template_versions": int(versions.get("next_id", 1)) - 1,
+            }
+            for name, seq in seqs.items():
+                cur = s.execute(
+                    text("SELECT seq FROM sqlite_sequence WHERE name = :n"),
+                    {"n": name},
+                ).scalar()
+                if cur is None:
+                    s.execute(
+                        text("INSERT INTO sqlite_sequence(name, seq) VALUES (:n, :s)"),
+                        {"n": name, "s": seq},
+                    )
+                elif int(cur) < seq:
+                    s.execute(
+                        text("UPDATE sqlite_sequence SET seq = :s WHERE name = :n"),
+                        {"n": name, "s": seq},
+                    )
+            s.add(MetaRow(key="migrated_from_json", value=_now_iso()))
+        _logger.info("sqlite storage migrated from json: %s", counts)
+        return counts
@@ -1,22 +1,123 @@
+import asyncio
+import atexit
+import copy
+import functools
+import heapq
 import json
 import os
 import re
-import subprocess
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from datetime import UTC, datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from app import settings_cache
+from app.blob_store import COMPRESS_MIN_BYTES, BlobStore
+from app.draft_log import DraftLog
+from app.draft_revisions import DraftRevisionLog
+from app.durable_write import (
+    WriteBehind,
+    atomic_file,
+    parse_durability,
+    write_json,
+)
+from app.file_lock import lock_path_for, stat_key
+from app.git_committer import STATUS_PENDING, GitCommitQueue
+from app.history_archive import HistoryArchive
+from app.posts_manifest import PostsManifest
+from app.rwlock import RWLock
+from app.search_index import SearchIndex, make_snippet
+from app.sqlite_storage import SQLiteStore
+from app.template_versions import TemplateVersionLog
 
 DATA_DIR = Path(os.getenv("BLOGWRITER_DATA_DIR", "./data")).resolve()
 SETTINGS_FILE = DATA_DIR / "settings.json"
 DRAFTS_FILE = DATA_DIR / "drafts.json"
+DRAFTS_LOG_FILE = DATA_DIR / "drafts.log"
 GENERATION_HISTORY_FILE = DATA_DIR / "generation_history.json"
 TEMPLATE_VERSIONS_FILE = DATA_DIR / "template_versions.json"
+TEMPLATE_VERSIONS_LOG_FILE = DATA_DIR / "template_versions.log"
+DRAFT_REVISIONS_LOG_FILE = DATA_DIR / "draft_revisions.log"
 WRITING_STYLES_FILE = DATA_DIR / "writing_styles.json"
 POSTS_DIR = DATA_DIR / "posts"
+POSTS_MANIFEST_FILE = DATA_DIR / "posts_manifest.json"
 EPUB_CACHE_DIR = DATA_DIR / "epub_cache"
-
-_lock = threading.Lock()
+HISTORY_ARCHIVE_DIR = DATA_DIR / "history_archive"
+SQLITE_FILE = DATA_DIR / "blogwriter.db"
+BLOBS_DIR = DATA_DIR / "blobs"
+# "json"（既定）または "sqlite"
+STORAGE_BACKEND = os.getenv("BLOGWRITER_STORAGE_BACKEND", "json").strip().lower()
+# JSON ファイルの耐久性モード（none / rename / fsync）
+DURABILITY = parse_durability(os.getenv("BLOGWRITER_DURABILITY"))
+# 0 より大きければ同じファイルへの更新をこのミリ秒だけまとめて書き出す
+WRITE_BEHIND_MS = int(os.getenv("BLOGWRITER_WRITE_BEHIND_MS", "0") or 0)
+
+# コレクション（ファイル）単位の読み取り/書き込みロック。
+# 複数取得する場合はこの並び順（settings → versions → history → styles → posts
+# → revisions）で取る。
+# 各ロックは `<file>.lock` の flock も取り、複数ワーカー間でも排他する。
+_settings_lock = RWLock("settings", lambda: lock_path_for(SETTINGS_FILE))
+_versions_lock = RWLock(
+    "template_versions", lambda: lock_path_for(TEMPLATE_VERSIONS_LOG_FILE)
+)
+_history_lock = RWLock(
+    "generation_history", lambda: lock_path_for(GENERATION_HISTORY_FILE)
+)
+_styles_lock = RWLock("writing_styles", lambda: lock_path_for(WRITING_STYLES_FILE))
+_posts_lock = RWLock("posts", lambda: lock_path_for(POSTS_MANIFEST_FILE))
+_revisions_lock = RWLock(
+    "draft_revisions", lambda: lock_path_for(DRAFT_REVISIONS_LOG_FILE)
+)
+_LOCKS = (
+    _settings_lock,
+    _versions_lock,
+    _history_lock,
+    _styles_lock,
+    _posts_lock,
+    _revisions_lock,
+)
+# drafts.log は DraftLog 自身がロック（プロセス間含む）を持つため、
+# 遅延生成のみ保護する（template_versions.log の遅延生成にも使う）
+_drafts_init_lock = threading.Lock()
+_drafts: Optional[DraftLog] = None
+_versions: Optional[TemplateVersionLog] = None
+_revisions: Optional[DraftRevisionLog] = None
+_manifest: Optional[PostsManifest] = None
+_git_queue: Optional[GitCommitQueue] = None
+_search: Optional[SearchIndex] = None
+# 検索インデックスに反映済みのデータソースの状態（kind -> 変更検知キー）
+_search_sources: Dict[str, Any] = {}
+_search_lock = threading.Lock()
+SEARCH_KINDS = ("draft", "post", "history")
+_sqlite: Optional[SQLiteStore] = None
+_blobs = BlobStore(BLOBS_DIR, COMPRESS_MIN_BYTES, DURABILITY)
+_writer: Optional[WriteBehind] = None
+
+# 起動時の孤立ブロブ回収で残す新しいブロブの猶予（秒）
+BLOB_GC_MIN_AGE = 3600.0
+
+# JSON バックエンドではホットファイルに最新のこの件数を残し、
+# あふれた分が HISTORY_ARCHIVE_BATCH 件たまるごとにアーカイブへ移す
+HISTORY_HOT_LIMIT = 200
+HISTORY_ARCHIVE_BATCH = 200
+_archive = HistoryArchive(HISTORY_ARCHIVE_DIR, DURABILITY)
+
+
+@contextmanager
+def _all_locks() -> Iterator[None]:
+    """全コレクションの書き込みロックを決められた順で取得する"""
+    with ExitStack() as stack:
+        for lock in _LOCKS:
+            stack.enter_context(lock.write())
+        yield
+
+
+def lock_stats() -> Dict[str, Dict[str, float]]:
+    """コレクションごとのロック取得回数と待ち時間（秒）"""
+    return {lock.name: lock.stats() for lock in _LOCKS}
 
 
 def _ensure_dir() -> None:
@@ -24,6 +125,10 @@ def _ensure_dir() -> None:
 
 
 def _read_json(path: Path, default: Any) -> Any:
+    if _writer is not None:
+        pending = _writer.pending(path)
+        if pending is not None:
+            return pending
     if not path.exists():
         return default
     try:
@@ -34,54 +139,192 @@ def _read_json(path: Path, default: Any) -> Any:
 
 
 def _atomic_write(path: Path, data: Any) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    tmp.replace(path)
+    # 書き込み後に data を変更する呼び出し元は無い前提で、そのまま預ける
+    if _writer is not None:
+        _writer.submit(path, data)
+        return
+    write_json(path, data, DURABILITY)
+
+
+def flush_writes(timeout: Optional[float] = None) -> bool:
+    """まとめ書き待ちの JSON を書き出す（write-behind 無効時は何もしない）"""
+    if _writer is None:
+        return True
+    return _writer.flush(timeout)
+
+
+# 終了時に書き出し待ちを残さない
+atexit.register(flush_writes, 10.0)
+
+
+def write_stats() -> Dict[str, Any]:
+    """耐久性モードと write-behind の書き込み統計"""
+    stats: Dict[str, Any] = {"durability": DURABILITY, "write_behind_ms": 0}
+    if _writer is not None:
+        stats["write_behind_ms"] = WRITE_BEHIND_MS
+        stats.update(_writer.stats())
+    return stats
+
+
+def _read_settings(default: Dict[str, Any]) -> Any:
+    """settings.json を読み取り専用で取得（キャッシュ共有のため変更禁止）"""
+    return settings_cache.read(SETTINGS_FILE, default)
+
+
+def _read_settings_for_update(default: Dict[str, Any]) -> Any:
+    return settings_cache.read_for_update(SETTINGS_FILE, default)
+
+
+def _write_settings(data: Dict[str, Any]) -> None:
+    # キャッシュがファイルの stat で鮮度を見るため、まとめ書きせず即時に書く
+    write_json(SETTINGS_FILE, data, DURABILITY)
+    settings_cache.store(SETTINGS_FILE, data)
+
+
+def decrypt_setting(value: str, secret: Optional[str]) -> str:
+    """settings.json 由来の暗号化値を復号する（スナップショット単位でメモ化）"""
+    return settings_cache.decrypt(SETTINGS_FILE, value, secret)
 
 
 def init_storage() -> None:
     # 環境変数の変更を反映してパスを再解決
     global DATA_DIR, SETTINGS_FILE, DRAFTS_FILE, GENERATION_HISTORY_FILE
     global WRITING_STYLES_FILE, POSTS_DIR, EPUB_CACHE_DIR, TEMPLATE_VERSIONS_FILE
+    global TEMPLATE_VERSIONS_LOG_FILE, _versions, POSTS_MANIFEST_FILE, _manifest
+    global _search, DRAFT_REVISIONS_LOG_FILE, _revisions
+    global HISTORY_ARCHIVE_DIR, _archive
+    global DRAFTS_LOG_FILE, _drafts, SQLITE_FILE, STORAGE_BACKEND, _sqlite
+    global BLOBS_DIR, _blobs, DURABILITY, WRITE_BEHIND_MS, _writer
     DATA_DIR = Path(os.getenv("BLOGWRITER_DATA_DIR", "./data")).resolve()
     SETTINGS_FILE = DATA_DIR / "settings.json"
     DRAFTS_FILE = DATA_DIR / "drafts.json"
+    DRAFTS_LOG_FILE = DATA_DIR / "drafts.log"
     GENERATION_HISTORY_FILE = DATA_DIR / "generation_history.json"
     WRITING_STYLES_FILE = DATA_DIR / "writing_styles.json"
     TEMPLATE_VERSIONS_FILE = DATA_DIR / "template_versions.json"
+    TEMPLATE_VERSIONS_LOG_FILE = DATA_DIR / "template_versions.log"
+    DRAFT_REVISIONS_LOG_FILE = DATA_DIR / "draft_revisions.log"
     POSTS_DIR = DATA_DIR / "posts"
+    POSTS_MANIFEST_FILE = DATA_DIR / "posts_manifest.json"
     EPUB_CACHE_DIR = DATA_DIR / "epub_cache"
+    HISTORY_ARCHIVE_DIR = DATA_DIR / "history_archive"
+    DURABILITY = parse_durability(os.getenv("BLOGWRITER_DURABILITY"))
+    _archive = HistoryArchive(HISTORY_ARCHIVE_DIR, DURABILITY)
+    SQLITE_FILE = DATA_DIR / "blogwriter.db"
+    BLOBS_DIR = DATA_DIR / "blobs"
+    _blobs = BlobStore(BLOBS_DIR, COMPRESS_MIN_BYTES, DURABILITY)
+    STORAGE_BACKEND = os.getenv("BLOGWRITER_STORAGE_BACKEND", "json").strip().lower()
+    # 旧ディレクトリ宛ての書き出し待ちを済ませてから切り替える
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+    WRITE_BEHIND_MS = int(os.getenv("BLOGWRITER_WRITE_BEHIND_MS", "0") or 0)
+    if WRITE_BEHIND_MS > 0:
+        _writer = WriteBehind(WRITE_BEHIND_MS / 1000, DURABILITY)
 
     _ensure_dir()
-    with _lock:
+    with _all_locks():
         if not SETTINGS_FILE.exists():
-            _atomic_write(
-                SETTINGS_FILE,
+            _write_settings(
                 {
                     "provider": "lmstudio",
                     "model": "openai/gpt-oss-20b",
                     "api_key": "",
                     "max_prompt_len": 32768,
-                },
+                }
             )
-        if not DRAFTS_FILE.exists():
-            _atomic_write(DRAFTS_FILE, {"next_id": 1, "items": []})
         if not GENERATION_HISTORY_FILE.exists():
             _atomic_write(GENERATION_HISTORY_FILE, {"next_id": 1, "items": []})
+        else:
+            _externalize_history_locked()
+            if STORAGE_BACKEND != "sqlite":
+                _gc_history_blobs_locked()
         if not WRITING_STYLES_FILE.exists():
             _atomic_write(WRITING_STYLES_FILE, {"items": {}})
-        if not TEMPLATE_VERSIONS_FILE.exists():
-            _atomic_write(TEMPLATE_VERSIONS_FILE, {"next_id": 1, "items": {}})
+        if _versions is not None:
+            _versions.close()
+        # template_versions.json は初回のみ template_versions.log へ取り込む
+        _versions = TemplateVersionLog(
+            TEMPLATE_VERSIONS_LOG_FILE,
+            legacy_path=TEMPLATE_VERSIONS_FILE,
+            durability=DURABILITY,
+        )
+        if _drafts is not None:
+            _drafts.close()
+        # drafts.json は初回のみ drafts.log へ取り込む
+        _drafts = DraftLog(
+            DRAFTS_LOG_FILE, legacy_path=DRAFTS_FILE, durability=DURABILITY
+        )
+        if _revisions is not None:
+            _revisions.close()
+            _revisions = None
+        if _sqlite is not None:
+            _sqlite.close()
+            _sqlite = None
+        if STORAGE_BACKEND == "sqlite":
+            _sqlite = SQLiteStore(SQLITE_FILE)
+            if not _sqlite.is_migrated():
+                _migrate_json_to_sqlite_locked(_sqlite)
     POSTS_DIR.mkdir(parents=True, exist_ok=True)
     EPUB_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _manifest = None
+    with _search_lock:
+        _search = None
+        _search_sources.clear()
+    # 前回プロセスでコミットされずに残った記事を再投入する
+    _replay_pending_commits()
+
+
+def _migrate_json_to_sqlite_locked(store: SQLiteStore) -> Dict[str, int]:
+    """JSON ファイル群の内容を SQLite へ一度だけ取り込む"""
+    assert _drafts is not None
+    return store.migrate_from_json(
+        drafts=_drafts.list(),
+        drafts_next_id=_drafts.next_id,
+        history=_read_history_hydrated_locked(),
+        styles=_read_json(WRITING_STYLES_FILE, {"items": {}}),
+        versions=_version_log().export(),
+    )
+
+
+def _draft_log() -> DraftLog:
+    global _drafts
+    with _drafts_init_lock:
+        if _drafts is None:
+            _ensure_dir()
+            _drafts = DraftLog(
+                DRAFTS_LOG_FILE, legacy_path=DRAFTS_FILE, durability=DURABILITY
+            )
+        return _drafts
+
+
+def _revision_log() -> DraftRevisionLog:
+    global _revisions
+    with _drafts_init_lock:
+        if _revisions is None:
+            _ensure_dir()
+            _revisions = DraftRevisionLog(
+                DRAFT_REVISIONS_LOG_FILE, durability=DURABILITY
+            )
+        return _revisions
+
+
+def _version_log() -> TemplateVersionLog:
+    global _versions
+    with _drafts_init_lock:
+        if _versions is None:
+            _ensure_dir()
+            _versions = TemplateVersionLog(
+                TEMPLATE_VERSIONS_LOG_FILE,
+                legacy_path=TEMPLATE_VERSIONS_FILE,
+                durability=DURABILITY,
+            )
+        return _versions
 
 
 def get_ai_settings() -> Dict[str, Any]:
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.read():
+        data = _read_settings(
             {
                 "provider": "lmstudio",
                 "model": "openai/gpt-oss-20b",
@@ -90,6 +333,10 @@ def get_ai_settings() -> Dict[str, Any]:
             },
         )
         assert isinstance(data, dict)
+    return _ai_settings_from(data)
+
+
+def _ai_settings_from(data: Dict[str, Any]) -> Dict[str, Any]:
     maxlen = data.get("max_prompt_len", 32768)
     try:
         maxlen_i = int(maxlen)
@@ -107,9 +354,8 @@ def get_ai_settings() -> Dict[str, Any]:
 def save_ai_settings(
     provider: str, model: str, api_key: str, *, max_prompt_len: Optional[int] = None
 ) -> None:
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.write():
+        data = _read_settings_for_update(
             {
                 "provider": "lmstudio",
                 "model": "openai/gpt-oss-20b",
@@ -129,7 +375,7 @@ def save_ai_settings(
             except Exception:
                 m = 32768
             data["max_prompt_len"] = m
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
 
 
 def _now_iso() -> str:
@@ -137,97 +383,137 @@ def _now_iso() -> str:
 
 
 def list_drafts() -> List[Dict[str, Any]]:
-    with _lock:
-        data = _read_json(DRAFTS_FILE, {"next_id": 1, "items": []})
-        items = data.get("items", [])
-        assert isinstance(items, list)
-        return sorted(
-            [
-                {
-                    "id": int(it["id"]),
-                    "title": str(it.get("title", "")),
-                    "content": str(it.get("content", "")),
-                    "created_at": str(it.get("created_at", _now_iso())),
-                    "updated_at": str(it.get("updated_at", _now_iso())),
-                }
-                for it in items
-            ],
-            key=lambda d: (d["updated_at"], d["id"]),
-            reverse=True,
-        )
+    if _sqlite is not None:
+        return _sqlite.list_drafts()
+    return _draft_log().list()
+
+
+# 一覧 API の件数・プレビュー文字数の上限
+SUMMARY_MAX_LIMIT = 200
+PREVIEW_MAX_CHARS = 200
+
+
+def parse_cursor(after: Optional[str]) -> Optional[Tuple[str, int]]:
+    """`<timestamp>,<id>` 形式のカーソルを分解する
+
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    if not after:
+        return None
+    ts, sep, raw_id = after.rpartition(",")
+    if not sep or not ts:
+        raise ValueError("invalid cursor")
+    return ts, int(raw_id)
+
+
+def _page(items: List[Dict[str, Any]], limit: int, ts_key: str) -> Dict[str, Any]:
+    next_cursor = None
+    if len(items) == limit and items:
+        last = items[-1]
+        next_cursor = f"{last[ts_key]},{last['id']}"
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def list_draft_summaries(
+    after: Optional[str] = None, limit: int = 50, preview_chars: int = 120
+) -> Dict[str, Any]:
+    """下書きの要約（本文なし）を updated_at 降順でページングして返す
+
+    戻り値: {items: [{id, title, created_at, updated_at, content_length,
+    preview}], next_cursor: str | None}
+    """
+    cursor = parse_cursor(after)
+    limit = max(1, min(SUMMARY_MAX_LIMIT, int(limit)))
+    preview_chars = max(0, min(PREVIEW_MAX_CHARS, int(preview_chars)))
+    if _sqlite is not None:
+        items = _sqlite.list_draft_summaries(cursor, limit, preview_chars)
+    else:
+        items = _draft_log().list_summaries(cursor, limit, preview_chars)
+    return _page(items, limit, "updated_at")
+
+
+def _record_revision(row: Dict[str, Any]) -> None:
+    _revision_log().record(row["id"], row["title"], row["content"], row["updated_at"])
 
 
 def create_draft(title: str, content: str) -> Dict[str, Any]:
-    with _lock:
-        data = _read_json(DRAFTS_FILE, {"next_id": 1, "items": []})
-        next_id = int(data.get("next_id", 1))
-        now = _now_iso()
-        row = {
-            "id": next_id,
-            "title": title or "無題",
-            "content": content,
-            "created_at": now,
-            "updated_at": now,
-        }
-        items = list(data.get("items", []))
-        items.append(row)
-        _atomic_write(DRAFTS_FILE, {"next_id": next_id + 1, "items": items})
-        return row
+    before = _search_source_key("draft")
+    with _revisions_lock.write():
+        if _sqlite is not None:
+            row = _sqlite.create_draft(title, content)
+        else:
+            row = _draft_log().create(title, content)
+        _record_revision(row)
+    _search_put("draft", before, row["id"], row["title"], row["content"])
+    return row
 
 
 def get_draft(draft_id: int) -> Optional[Dict[str, Any]]:
-    with _lock:
-        data = _read_json(DRAFTS_FILE, {"next_id": 1, "items": []})
-        for it in data.get("items", []):
-            if int(it.get("id")) == draft_id:
-                return {
-                    "id": int(it["id"]),
-                    "title": str(it.get("title", "")),
-                    "content": str(it.get("content", "")),
-                    "created_at": str(it.get("created_at", _now_iso())),
-                    "updated_at": str(it.get("updated_at", _now_iso())),
-                }
-        return None
+    if _sqlite is not None:
+        return _sqlite.get_draft(draft_id)
+    return _draft_log().get(draft_id)
 
 
 def update_draft(
     draft_id: int, title: Optional[str], content: Optional[str]
 ) -> Optional[Dict[str, Any]]:
-    with _lock:
-        data = _read_json(DRAFTS_FILE, {"next_id": 1, "items": []})
-        changed = False
-        for it in data.get("items", []):
-            if int(it.get("id")) == draft_id:
-                if title is not None and title.strip():
-                    it["title"] = title.strip()
-                    changed = True
-                if content is not None:
-                    it["content"] = content
-                    changed = True
-                if changed:
-                    it["updated_at"] = _now_iso()
-                row = {
-                    "id": int(it["id"]),
-                    "title": str(it.get("title", "")),
-                    "content": str(it.get("content", "")),
-                    "created_at": str(it.get("created_at", _now_iso())),
-                    "updated_at": str(it.get("updated_at", _now_iso())),
-                }
-                _atomic_write(DRAFTS_FILE, data)
-                return row
-        return None
+    before = _search_source_key("draft")
+    with _revisions_lock.write():
+        if not _revision_log().has(draft_id):
+            # 履歴導入前の下書きは更新前の内容を最初のリビジョンにする
+            current = get_draft(draft_id)
+            if current is not None:
+                _record_revision(current)
+        if _sqlite is not None:
+            row = _sqlite.update_draft(draft_id, title, content)
+        else:
+            row = _draft_log().update(draft_id, title, content)
+        if row is not None:
+            _record_revision(row)
+    if row is not None:
+        _search_put("draft", before, draft_id, row["title"], row["content"])
+    return row
 
 
 def delete_draft(draft_id: int) -> bool:
-    with _lock:
-        data = _read_json(DRAFTS_FILE, {"next_id": 1, "items": []})
-        items = list(data.get("items", []))
-        new_items = [it for it in items if int(it.get("id")) != draft_id]
-        if len(new_items) == len(items):
-            return False
-        data["items"] = new_items
-        _atomic_write(DRAFTS_FILE, data)
-        return True
+    before = _search_source_key("draft")
+    with _revisions_lock.write():
+        if _sqlite is not None:
+            ok = _sqlite.delete_draft(draft_id)
+        else:
+            ok = _draft_log().delete(draft_id)
+        if ok:
+            _revision_log().drop(draft_id)
+    if ok:
+        _search_drop("draft", before, [draft_id])
+    return ok
+
+
+def list_draft_revisions(draft_id: int) -> Optional[List[Dict[str, Any]]]:
+    """下書きのリビジョン一覧（古い順。下書きが無ければ None）"""
+    with _revisions_lock.write():
+        current = get_draft(draft_id)
+        if current is None:
+            return None
+        log = _revision_log()
+        if not log.has(draft_id):
+            _record_revision(current)
+        return log.list_revisions(draft_id)
+
+
+def get_draft_revision(draft_id: int, revision: int) -> Optional[Dict[str, Any]]:
+    """指定リビジョンの {revision, created_at, title, content} を復元する"""
+    with _revisions_lock.read():
+        return _revision_log().get(draft_id, revision)
+
+
+def restore_draft_revision(draft_id: int, revision: int) -> Optional[Dict[str, Any]]:
+    """指定リビジョンの内容で下書きを更新する（新しいリビジョンとして記録）"""
+    snap = get_draft_revision(draft_id, revision)
+    if snap is None:
+        return None
+    return update_draft(draft_id, snap["title"], snap["content"])
 
 
 # ===== Markdown Posts =====
@@ -252,6 +538,46 @@ def _slugify(s: str) -> str:
     return s or "untitled"
 
 
+def _posts_manifest() -> PostsManifest:
+    global _manifest
+    with _drafts_init_lock:
+        if _manifest is None or _manifest.posts_dir != POSTS_DIR:
+            _manifest = PostsManifest(
+                POSTS_DIR,
+                POSTS_MANIFEST_FILE,
+                lambda text: _guess_title_and_body(text)[0],
+                DURABILITY,
+            )
+        return _manifest
+
+
+def _git_commit_queue() -> GitCommitQueue:
+    global _git_queue
+    with _drafts_init_lock:
+        if _git_queue is None:
+            _git_queue = GitCommitQueue(_on_git_status)
+        return _git_queue
+
+
+def _on_git_status(filenames: List[str], status: str, commit: Optional[str]) -> None:
+    with _posts_lock.write():
+        _posts_manifest().set_git_status(filenames, status, commit)
+
+
+def _replay_pending_commits() -> None:
+    with _posts_lock.write():
+        pending = _posts_manifest().pending_git()
+    for filename, title in pending:
+        _git_commit_queue().submit(POSTS_DIR / filename, title)
+
+
+def _posts_dir_mtime() -> Optional[int]:
+    try:
+        return POSTS_DIR.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
 def save_markdown_post(content: str, git_commit: bool = False) -> Dict[str, Any]:
     POSTS_DIR.mkdir(parents=True, exist_ok=True)
     title, body = _guess_title_and_body(content)
@@ -259,39 +585,39 @@ def save_markdown_post(content: str, git_commit: bool = False) -> Dict[str, Any]
     base = _slugify(title or "untitled")
     filename = f"{ts}-{base}.md"
     path = POSTS_DIR / filename
-    with path.open("w", encoding="utf-8") as f:
-        f.write(body)
-        if not body.endswith("\n"):
-            f.write("\n")
+    with _posts_lock.write():
+        search_before = _search_source_key("post")
+        before = _posts_dir_mtime()
+        text = body if body.endswith("\n") else body + "\n"
+        with atomic_file(path, DURABILITY) as f:
+            f.write(text.encode("utf-8"))
+        manifest = _posts_manifest()
+        manifest.record(filename, before)
+        if git_commit:
+            manifest.set_git_status([filename], STATUS_PENDING)
+        _search_put("post", search_before, filename, title or path.stem, body)
+    info: Dict[str, Any] = {"path": str(path), "title": title, "filename": filename}
     if git_commit:
-        # best-effort; git が無い/未初期化でも無視
-        subprocess.run(["git", "add", str(path)], check=False)
-        msg = f"Add post: {title or 'untitled'}"
-        subprocess.run(["git", "commit", "-m", msg], check=False)
-    return {"path": str(path), "title": title, "filename": filename}
+        # コミットはバックグラウンドでまとめて行う（git が無くても保存は成功）
+        _git_commit_queue().submit(path, title or "untitled")
+        info["git_status"] = STATUS_PENDING
+    return info
+
+
+def get_markdown_post_git_status(filename: str) -> Optional[Dict[str, Any]]:
+    """記事の git コミット状態 {filename, git_status, git_commit} を返す"""
+    if "/" in filename or ".." in filename:
+        return None
+    with _posts_lock.write():
+        return _posts_manifest().git_status(filename)
 
 
 def list_markdown_posts(limit: int = 50) -> List[Dict[str, Any]]:
+    """記事一覧を mtime の新しい順に返す（マニフェスト経由でファイルは読まない）"""
     POSTS_DIR.mkdir(parents=True, exist_ok=True)
-    files = [p for p in POSTS_DIR.glob("*.md") if p.is_file()]
-    files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    result: List[Dict[str, Any]] = []
-    for p in files[: max(1, limit)]:
-        try:
-            text = p.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            text = ""
-        title, _ = _guess_title_and_body(text)
-        st = p.stat()
-        result.append(
-            {
-                "filename": p.name,
-                "title": title or p.stem,
-                "mtime": int(st.st_mtime),
-                "size": int(st.st_size),
-            }
-        )
-    return result
+    # 照合でマニフェストを書き換えることがあるため書き込みロックを取る
+    with _posts_lock.write():
+        return _posts_manifest().list(max(1, limit))
 
 
 def read_markdown_post(filename: str) -> Optional[str]:
@@ -312,20 +638,24 @@ def delete_markdown_post(filename: str) -> bool:
     if "/" in filename or ".." in filename:
         return False
     path = POSTS_DIR / filename
-    try:
-        if path.exists() and path.is_file():
+    with _posts_lock.write():
+        try:
+            if not (path.exists() and path.is_file()):
+                return False
+            search_before = _search_source_key("post")
+            before = _posts_dir_mtime()
             path.unlink()
-            return True
-        return False
-    except OSError:
-        return False
+        except OSError:
+            return False
+        _posts_manifest().remove(filename, before)
+        _search_drop("post", search_before, [filename])
+        return True
 
 
 # ===== Prompt Templates (persist into settings.json) =====
 def list_prompt_templates() -> List[Dict[str, str]]:
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.read():
+        data = _read_settings(
             {"provider": "gemini", "model": "gemini-2.5-flash", "api_key": ""},
         )
         items = list(data.get("prompt_templates", []))
@@ -343,9 +673,8 @@ def save_prompt_template(name: str, content: str) -> Dict[str, str]:
     name = name.strip()
     if not name:
         raise ValueError("template name is required")
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.write():
+        data = _read_settings_for_update(
             {"provider": "gemini", "model": "gemini-2.5-flash", "api_key": ""},
         )
         items = list(data.get("prompt_templates", []))
@@ -357,7 +686,7 @@ def save_prompt_template(name: str, content: str) -> Dict[str, str]:
         else:
             items.insert(0, row)
         data["prompt_templates"] = items
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
         return row
 
 
@@ -365,9 +694,8 @@ def delete_prompt_template(name: str) -> bool:
     name = name.strip()
     if not name:
         return False
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.write():
+        data = _read_settings_for_update(
             {"provider": "gemini", "model": "gemini-2.5-flash", "api_key": ""},
         )
         items = list(data.get("prompt_templates", []))
@@ -375,7 +703,7 @@ def delete_prompt_template(name: str) -> bool:
         if len(new_items) == len(items):
             return False
         data["prompt_templates"] = new_items
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
         return True
 
 
@@ -383,9 +711,8 @@ def get_prompt_template(name: str) -> Optional[Dict[str, str]]:
     name = name.strip()
     if not name:
         return None
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.read():
+        data = _read_settings(
             {"provider": "gemini", "model": "gemini-2.5-flash", "api_key": ""},
         )
         items = list(data.get("prompt_templates", []))
@@ -400,9 +727,8 @@ def cleanup_prompt_templates() -> int:
 
     Returns the number of removed entries.
     """
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.write():
+        data = _read_settings_for_update(
             {"provider": "gemini", "model": "gemini-2.5-flash", "api_key": ""},
         )
         items = list(data.get("prompt_templates", []))
@@ -421,7 +747,7 @@ def cleanup_prompt_templates() -> int:
             new_items.append({"name": n, "content": str(it.get("content", ""))})
         if removed:
             data["prompt_templates"] = new_items
-            _atomic_write(SETTINGS_FILE, data)
+            _write_settings(data)
         return removed
 
 
@@ -517,8 +843,7 @@ def _default_article_templates() -> Dict[str, Any]:
 
 
 def _read_article_templates() -> Dict[str, Any]:
-    data = _read_json(
-        SETTINGS_FILE,
+    data = _read_settings(
         {"provider": "gemini", "model": "gemini-2.5-flash", "api_key": ""},
     )
     items = data.get("article_templates")
@@ -531,56 +856,26 @@ def _read_article_templates() -> Dict[str, Any]:
         if not isinstance(v, dict):
             continue
         if k in _BUILTIN_ARTICLE_TYPES:
-            merged[k] = v
+            merged[k] = copy.deepcopy(v)
     # カスタムテンプレート（任意ID）はそのまま追加
     for k, v in items.items():
         if not isinstance(v, dict):
             continue
         if k not in _BUILTIN_ARTICLE_TYPES:
-            merged[k] = v
+            merged[k] = copy.deepcopy(v)
     return merged
 
 
 # ===== Article Template Versions (history snapshots) =====
-def _read_template_versions() -> Dict[str, Any]:
-    raw = _read_json(TEMPLATE_VERSIONS_FILE, {"next_id": 1, "items": {}})
-    data: Dict[str, Any]
-    if isinstance(raw, dict):
-        # dict をコピーして以降は Dict[str, Any] として扱う
-        data = dict(raw)
-    else:
-        data = {"next_id": 1, "items": {}}
-    if not isinstance(data.get("items"), dict):
-        data["items"] = {}
-    if not isinstance(data.get("next_id"), int):
-        data["next_id"] = 1
-    return data
-
-
 def list_template_versions(t: str) -> List[Dict[str, Any]]:
     """テンプレート t のバージョン一覧を取得
 
     戻り値: [{version:int, created_at:str} ...] 昇順
     """
-    with _lock:
-        data = _read_template_versions()
-        items = data.get("items", {})
-        arr = items.get(t, [])
-        if not isinstance(arr, list):
-            return []
-        result: List[Dict[str, Any]] = []
-        for it in arr:
-            try:
-                result.append(
-                    {
-                        "version": int(it.get("version", 0)),
-                        "created_at": str(it.get("created_at", _now_iso())),
-                    }
-                )
-            except Exception:
-                continue
-        result.sort(key=lambda x: x["version"])  # 昇順
-        return result
+    if _sqlite is not None:
+        return _sqlite.list_template_versions(t)
+    with _versions_lock.read():
+        return _version_log().list_versions(t)
 
 
 def get_template_version_snapshot(t: str, version: int) -> Optional[Dict[str, Any]]:
@@ -589,26 +884,10 @@ def get_template_version_snapshot(t: str, version: int) -> Optional[Dict[str, An
     戻り値: {version, created_at, data: {...template...}}
     見つからなければ None
     """
-    with _lock:
-        data = _read_template_versions()
-        arr = data.get("items", {}).get(t, [])
-        if not isinstance(arr, list):
-            return None
-        for it in arr:
-            try:
-                if int(it.get("version")) == int(version):
-                    # data は dict を保証
-                    d = it.get("data")
-                    if not isinstance(d, dict):
-                        return None
-                    return {
-                        "version": int(it.get("version", 0)),
-                        "created_at": str(it.get("created_at", _now_iso())),
-                        "data": d,
-                    }
-            except Exception:
-                continue
-        return None
+    if _sqlite is not None:
+        return _sqlite.get_template_version(t, version)
+    with _versions_lock.read():
+        return _version_log().get(t, version)
 
 
 def _template_canonical(obj: Dict[str, Any]) -> Dict[str, Any]:
@@ -654,20 +933,14 @@ def _snapshot_needed(prev: Optional[Dict[str, Any]], cur: Dict[str, Any]) -> boo
 
 
 def _append_template_snapshot_locked(t: str, tpl: Dict[str, Any]) -> None:
-    data = _read_template_versions()
-    items = data.get("items", {})
-    arr = list(items.get(t, []))
-    last = arr[-1] if arr else None
-    prev_data = last.get("data") if isinstance(last, dict) else None
-    if not _snapshot_needed(prev_data if isinstance(prev_data, dict) else None, tpl):
+    if _sqlite is not None:
+        if _snapshot_needed(_sqlite.last_template_data(t), tpl):
+            _sqlite.append_template_version(t, tpl)
+        return
+    log = _version_log()
+    if not _snapshot_needed(log.latest(t), tpl):
         return
-    version = int(data.get("next_id", 1))
-    now = _now_iso()
-    arr.append({"version": version, "created_at": now, "data": tpl})
-    data["next_id"] = version + 1
-    items[t] = arr
-    data["items"] = items
-    _atomic_write(TEMPLATE_VERSIONS_FILE, data)
+    log.append(t, tpl, _now_iso())
 
 
 def diff_template_versions(
@@ -677,12 +950,19 @@ def diff_template_versions(
 
     戻り値: {changed_keys: List[str], diff: Dict[str, {from:Any, to:Any}]}
     """
-    a = get_template_version_snapshot(t, from_version)
-    b = get_template_version_snapshot(t, to_version)
-    if not a or not b:
-        return {"changed_keys": [], "diff": {}}
-    data_a = a.get("data")
-    data_b = b.get("data")
+    if _sqlite is not None:
+        a = _sqlite.get_template_version(t, from_version)
+        b = _sqlite.get_template_version(t, to_version)
+        if not a or not b:
+            return {"changed_keys": [], "diff": {}}
+        data_a, data_b = a.get("data"), b.get("data")
+    else:
+        # 差分チェーンを 1 回たどって両方を復元する
+        with _versions_lock.read():
+            found = _version_log().pair(t, from_version, to_version)
+        if found is None:
+            return {"changed_keys": [], "diff": {}}
+        data_a, data_b = found
     if not isinstance(data_a, dict) or not isinstance(data_b, dict):
         return {"changed_keys": [], "diff": {}}
     ca = _template_canonical(data_a)
@@ -698,7 +978,7 @@ def diff_template_versions(
 
 
 def list_article_templates() -> List[Dict[str, Any]]:
-    with _lock:
+    with _settings_lock.read():
         merged = _read_article_templates()
         rows: List[Dict[str, Any]] = []
         for k, row in merged.items():
@@ -727,7 +1007,7 @@ def list_article_templates() -> List[Dict[str, Any]]:
 
 
 def get_article_template(t: str) -> Optional[Dict[str, Any]]:
-    with _lock:
+    with _settings_lock.read():
         merged = _read_article_templates()
         row = merged.get(t)
         if not isinstance(row, dict):
@@ -812,9 +1092,8 @@ def save_article_template(t: str, payload: Dict[str, Any]) -> Optional[Dict[str,
             if sw in _ALLOWED_WIDGETS and sw not in widgets:
                 widgets.append(sw)
 
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.write():
+        data = _read_settings_for_update(
             {"provider": "gemini", "model": "gemini-2.5-flash", "api_key": ""},
         )
         items = data.get("article_templates")
@@ -833,16 +1112,16 @@ def save_article_template(t: str, payload: Dict[str, Any]) -> Optional[Dict[str,
             row["style_id"] = style_id
         items[t] = row
         data["article_templates"] = items
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
         # バージョン履歴にスナップショットを保存（重複は抑制）
-        _append_template_snapshot_locked(t, row)
+        with _versions_lock.write():
+            _append_template_snapshot_locked(t, row)
         return row
 
 
 def delete_article_template(t: str) -> bool:
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.write():
+        data = _read_settings_for_update(
             {"provider": "gemini", "model": "gemini-2.5-flash", "api_key": ""},
         )
         items = data.get("article_templates")
@@ -853,7 +1132,7 @@ def delete_article_template(t: str) -> bool:
         items = dict(items)
         items.pop(t, None)
         data["article_templates"] = items
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
         return True
 
 
@@ -873,9 +1152,8 @@ def duplicate_article_template(
         return None
 
     # 既存一覧を取得して新IDの重複を回避
-    with _lock:
-        data = _read_json(
-            SETTINGS_FILE,
+    with _settings_lock.read():
+        data = _read_settings(
             {"provider": "gemini", "model": "gemini-2.5-flash", "api_key": ""},
         )
         items = data.get("article_templates")
@@ -940,6 +1218,118 @@ def get_available_widgets() -> List[Dict[str, str]]:
 
 
 # ===== Generation History =====
+# generation_history.json には本文を持たず、ブロブのハッシュと
+# 一覧用の長さ・プレビューだけを保存する。
+
+
+def _history_meta(
+    item: Dict[str, Any], generated_content: str, reasoning: str
+) -> Dict[str, Any]:
+    """本文をブロブへ移し、メタデータのみの履歴項目を返す"""
+    meta = {
+        k: v for k, v in item.items() if k not in ("generated_content", "reasoning")
+    }
+    meta["content_hash"] = _blobs.put(generated_content)
+    meta["reasoning_hash"] = _blobs.put(reasoning) if reasoning else None
+    meta["content_length"] = len(generated_content)
+    meta["preview"] = generated_content[:PREVIEW_MAX_CHARS]
+    return meta
+
+
+def _history_text(item: Dict[str, Any], inline_key: str, hash_key: str) -> str:
+    if inline_key in item:
+        # ブロブ化前の旧形式
+        return str(item.get(inline_key, ""))
+    digest = item.get(hash_key)
+    if not digest:
+        return ""
+    return _blobs.get(str(digest)) or ""
+
+
+def _history_hashes(items: List[Dict[str, Any]]) -> Set[str]:
+    live: Set[str] = set()
+    for item in items:
+        for key in ("content_hash", "reasoning_hash"):
+            if item.get(key):
+                live.add(str(item[key]))
+    return live
+
+
+def _release_history_blobs_locked(
+    dropped: List[Dict[str, Any]], remaining: List[Dict[str, Any]]
+) -> None:
+    """残りの履歴から参照されなくなったブロブを削除する"""
+    live = _history_hashes(remaining)
+    for digest in _history_hashes(dropped) - live:
+        _blobs.delete(digest)
+
+
+def _gc_history_blobs_locked() -> None:
+    """履歴から参照されていないブロブを消す
+
+    put と履歴の保存の間やブロブの解放中に落ちると孤立したブロブが残るため、
+    起動時に回収する。他のワーカーが保存途中のブロブを消さないよう、
+    BLOB_GC_MIN_AGE より新しいものは残す。
+    """
+    data = _read_json(GENERATION_HISTORY_FILE, {"next_id": 1, "items": []})
+    _blobs.gc(_history_hashes(data.get("items", [])), BLOB_GC_MIN_AGE)
+
+
+def _externalize_history_locked() -> None:
+    """旧形式（本文インライン）の履歴をブロブへ移行する"""
+    data = _read_json(GENERATION_HISTORY_FILE, {"next_id": 1, "items": []})
+    items = list(data.get("items", []))
+    if not any("generated_content" in it for it in items):
+        return
+    data["items"] = [
+        (
+            _history_meta(
+                it,
+                str(it.get("generated_content", "")),
+                str(it.get("reasoning", "")),
+            )
+            if "generated_content" in it
+            else it
+        )
+        for it in items
+    ]
+    _atomic_write(GENERATION_HISTORY_FILE, data)
+
+
+def _hydrate_history(item: Dict[str, Any]) -> Dict[str, Any]:
+    """ブロブから本文を埋め戻した履歴項目"""
+    full = {
+        k: v
+        for k, v in item.items()
+        if k not in ("content_hash", "reasoning_hash", "content_length", "preview")
+    }
+    full["generated_content"] = _history_text(item, "generated_content", "content_hash")
+    full["reasoning"] = _history_text(item, "reasoning", "reasoning_hash")
+    return full
+
+
+def _read_history_hydrated_locked() -> Dict[str, Any]:
+    """アーカイブ分を含め本文を埋め戻した履歴データ（SQLite への移行・全文検索用）"""
+    data = _read_json(GENERATION_HISTORY_FILE, {"next_id": 1, "items": []})
+    items = [_hydrate_history(it) for it in data.get("items", [])]
+    hot = {int(it["id"]) for it in items}
+    archived = [it for it in _archive.export() if int(it["id"]) not in hot]
+    return {"next_id": data.get("next_id", 1), "items": archived + items}
+
+
+def _history_detail(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": int(item["id"]),
+        "title": str(item.get("title", "")),
+        "template_type": str(item.get("template_type", "")),
+        "widgets_used": list(item.get("widgets_used", [])),
+        "properties": dict(item.get("properties", {})),
+        "generated_content": _history_text(item, "generated_content", "content_hash"),
+        "reasoning": _history_text(item, "reasoning", "reasoning_hash"),
+        "created_at": str(item.get("created_at", _now_iso())),
+    }
+
+
 def save_generation_history(
     title: str,
     template_type: str,
@@ -949,7 +1339,15 @@ def save_generation_history(
     reasoning: str = "",
 ) -> Dict[str, Any]:
     """生成履歴を保存する"""
-    with _lock:
+    if _sqlite is not None:
+        before = _search_source_key("history")
+        saved = _sqlite.save_generation_history(
+            title, template_type, widgets_used, properties, generated_content, reasoning
+        )
+        _search_put("history", before, saved["id"], title, generated_content)
+        return saved
+    with _history_lock.write():
+        before = _search_source_key("history")
         data = _read_json(GENERATION_HISTORY_FILE, {"next_id": 1, "items": []})
         next_id = int(data.get("next_id", 1))
         now = _now_iso()
@@ -966,86 +1364,278 @@ def save_generation_history(
         }
 
         items = list(data.get("items", []))
-        items.append(history_item)
+        items.append(_history_meta(history_item, generated_content, reasoning))
 
-        # 最新100件まで保持
-        if len(items) > 100:
-            items = items[-100:]
+        # 古い分はまとめて圧縮アーカイブへ移し、ホットファイルを小さく保つ
+        dropped: List[Dict[str, Any]] = []
+        if len(items) > HISTORY_HOT_LIMIT + HISTORY_ARCHIVE_BATCH:
+            dropped = items[:-HISTORY_HOT_LIMIT]
+            items = items[-HISTORY_HOT_LIMIT:]
+            _archive.append([_hydrate_history(it) for it in dropped])
+            _release_history_blobs_locked(dropped, items)
 
         _atomic_write(GENERATION_HISTORY_FILE, {"next_id": next_id + 1, "items": items})
+        # アーカイブへ移した履歴も全文検索の対象に残す
+        _search_put("history", before, next_id, title, generated_content)
         return history_item
 
 
 def list_generation_history(limit: int = 20) -> List[Dict[str, Any]]:
     """生成履歴一覧を取得する"""
-    with _lock:
+    if _sqlite is not None:
+        return _sqlite.list_generation_history(limit)
+    with _history_lock.read():
         data = _read_json(GENERATION_HISTORY_FILE, {"next_id": 1, "items": []})
         items = data.get("items", [])
         assert isinstance(items, list)
 
-        result: List[Dict[str, Any]] = []
-        for item in items:
-            result.append(
+        result = [_history_list_row(item) for item in items]
+        result.sort(key=lambda d: str(d["created_at"]), reverse=True)
+        if len(result) < limit:
+            # 足りない分はアーカイブの要約で補う（セグメントは展開しない）
+            archived = _archive.page(None, limit - len(result))
+            result.extend(_history_list_row(it) for it in archived)
+        return result[:limit]
+
+
+def _history_list_row(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": int(item["id"]),
+        "title": str(item.get("title", "")),
+        "template_type": str(item.get("template_type", "")),
+        "widgets_used": list(item.get("widgets_used", [])),
+        "properties": dict(item.get("properties", {})),
+        "created_at": str(item.get("created_at", _now_iso())),
+        "content_length": _history_content_length(item),
+    }
+
+
+def _history_content_length(item: Dict[str, Any]) -> int:
+    if "content_length" in item:
+        return int(item["content_length"])
+    return len(str(item.get("generated_content", "")))
+
+
+def list_generation_history_summaries(
+    after: Optional[str] = None, limit: int = 20, preview_chars: int = 120
+) -> Dict[str, Any]:
+    """生成履歴の要約を created_at 降順でページングして返す
+
+    戻り値: {items: [{id, title, template_type, widgets_used, created_at,
+    content_length, preview}], next_cursor: str | None}
+    """
+    cursor = parse_cursor(after)
+    limit = max(1, min(SUMMARY_MAX_LIMIT, int(limit)))
+    preview_chars = max(0, min(PREVIEW_MAX_CHARS, int(preview_chars)))
+    if _sqlite is not None:
+        items = _sqlite.list_generation_history_summaries(cursor, limit, preview_chars)
+        return _page(items, limit, "created_at")
+    with _history_lock.read():
+        data = _read_json(GENERATION_HISTORY_FILE, {"next_id": 1, "items": []})
+        rows: List[Dict[str, Any]] = []
+        # アーカイブはカーソル位置から limit 件だけを取り出す
+        for item in [*_archive.page(cursor, limit), *data.get("items", [])]:
+            created_at = str(item.get("created_at", ""))
+            item_id = int(item["id"])
+            if cursor is not None and (created_at, item_id) >= cursor:
+                continue
+            preview = str(item.get("preview", item.get("generated_content", "")))
+            rows.append(
                 {
-                    "id": int(item["id"]),
+                    "id": item_id,
                     "title": str(item.get("title", "")),
                     "template_type": str(item.get("template_type", "")),
                     "widgets_used": list(item.get("widgets_used", [])),
-                    "properties": dict(item.get("properties", {})),
-                    "created_at": str(item.get("created_at", _now_iso())),
-                    "content_length": len(str(item.get("generated_content", ""))),
+                    "created_at": created_at,
+                    "content_length": _history_content_length(item),
+                    "preview": preview[:preview_chars],
                 }
             )
-
-        return sorted(result, key=lambda d: str(d["created_at"]), reverse=True)[:limit]
+    items = heapq.nlargest(limit, rows, key=lambda d: (d["created_at"], d["id"]))
+    return _page(items, limit, "created_at")
 
 
 def get_generation_history(history_id: int) -> Optional[Dict[str, Any]]:
     """特定の生成履歴を取得する"""
-    with _lock:
+    if _sqlite is not None:
+        return _sqlite.get_generation_history(history_id)
+    with _history_lock.read():
         data = _read_json(GENERATION_HISTORY_FILE, {"next_id": 1, "items": []})
         for item in data.get("items", []):
             if int(item.get("id")) == history_id:
-                return {
-                    "id": int(item["id"]),
-                    "title": str(item.get("title", "")),
-                    "template_type": str(item.get("template_type", "")),
-                    "widgets_used": list(item.get("widgets_used", [])),
-                    "properties": dict(item.get("properties", {})),
-                    "generated_content": str(item.get("generated_content", "")),
-                    "reasoning": str(item.get("reasoning", "")),
-                    "created_at": str(item.get("created_at", _now_iso())),
-                }
-        return None
+                return _history_detail(item)
+        archived = _archive.get(history_id)
+        return _history_detail(archived) if archived is not None else None
 
 
 def delete_generation_history(history_id: int) -> bool:
     """生成履歴を削除する"""
-    with _lock:
+    if _sqlite is not None:
+        before = _search_source_key("history")
+        ok = _sqlite.delete_generation_history(history_id)
+        if ok:
+            _search_drop("history", before, [history_id])
+        return ok
+    with _history_lock.write():
+        before = _search_source_key("history")
         data = _read_json(GENERATION_HISTORY_FILE, {"next_id": 1, "items": []})
         items = list(data.get("items", []))
         new_items = [item for item in items if int(item.get("id")) != history_id]
         if len(new_items) == len(items):
-            return False
+            if not _archive.delete(history_id):
+                return False
+            _search_drop("history", before, [history_id])
+            return True
         data["items"] = new_items
         _atomic_write(GENERATION_HISTORY_FILE, data)
+        dropped = [item for item in items if int(item.get("id")) == history_id]
+        _release_history_blobs_locked(dropped, new_items)
+        _search_drop("history", before, [history_id])
         return True
 
 
+# ===== Full-text Search =====
+# インデックスは初回検索時に構築し、以降は書き込み関数から差分更新する。
+# 他プロセスによる変更はデータソースの変更検知キーの不一致で検出し、
+# その種類だけ作り直す。
+
+
+def _search_source_key(kind: str) -> Any:
+    """データソースの変更検知キー（インデックス未構築なら None）"""
+    if _search is None:
+        return None
+    if kind == "post":
+        # マニフェストと同じくディレクトリ mtime で外部の追加・削除を検知する
+        return _posts_dir_mtime()
+    if _sqlite is not None:
+        return _sqlite.change_marker(kind)
+    if kind == "draft":
+        return stat_key(DRAFTS_LOG_FILE)
+    return (stat_key(GENERATION_HISTORY_FILE), stat_key(_archive.index_path))
+
+
+def _mark_search_source(kind: str, before: Any) -> None:
+    # 自分の書き込み直前の状態から追従できていた場合だけ最新とみなす
+    with _search_lock:
+        if kind in _search_sources and _search_sources[kind] == before:
+            _search_sources[kind] = _search_source_key(kind)
+
+
+def _search_put(kind: str, before: Any, doc_id: Any, title: str, text: str) -> None:
+    idx = _search
+    if idx is None:
+        return
+    idx.add(f"{kind}:{doc_id}", title, text)
+    _mark_search_source(kind, before)
+
+
+def _search_drop(kind: str, before: Any, doc_ids: List[Any]) -> None:
+    idx = _search
+    if idx is None:
+        return
+    for doc_id in doc_ids:
+        idx.remove(f"{kind}:{doc_id}")
+    _mark_search_source(kind, before)
+
+
+def _search_documents_of(kind: str) -> List[Tuple[Any, str, str]]:
+    """kind の全文書を (id, title, text) で返す"""
+    if kind == "draft":
+        return [(d["id"], d["title"], d["content"]) for d in list_drafts()]
+    if kind == "history":
+        # どちらのバックエンドも保持している全履歴（JSON はアーカイブ分を含む）
+        if _sqlite is not None:
+            return list(_sqlite.generation_history_documents())
+        with _history_lock.read():
+            rows = _read_history_hydrated_locked()["items"]
+        return [
+            (r["id"], str(r.get("title", "")), str(r.get("generated_content", "")))
+            for r in rows
+        ]
+    docs: List[Tuple[Any, str, str]] = []
+    for row in list_markdown_posts(limit=1_000_000):
+        text = read_markdown_post(row["filename"])
+        if text is not None:
+            docs.append((row["filename"], row["title"], text))
+    return docs
+
+
+def _search_index() -> SearchIndex:
+    global _search
+    with _search_lock:
+        if _search is None:
+            _search = SearchIndex()
+        return _search
+
+
+def _refresh_search(kinds: Tuple[str, ...]) -> None:
+    idx = _search_index()
+    for kind in kinds:
+        current = _search_source_key(kind)
+        with _search_lock:
+            if kind in _search_sources and _search_sources[kind] == current:
+                continue
+        idx.remove_kind(kind)
+        for doc_id, title, text in _search_documents_of(kind):
+            idx.add(f"{kind}:{doc_id}", title, text)
+        with _search_lock:
+            _search_sources[kind] = current
+
+
+def search_documents(
+    query: str, kinds: Optional[List[str]] = None, limit: int = 20
+) -> Dict[str, Any]:
+    """下書き・記事・生成履歴を全文検索する
+
+    戻り値: {query, took_ms, items: [{kind, id, title, score, snippet,
+    highlights: [[start, end], ...]}]}（highlights は snippet 内の位置）
+    """
+    started = time.perf_counter()
+    targets = tuple(k for k in SEARCH_KINDS if not kinds or k in kinds)
+    limit = max(1, min(SUMMARY_MAX_LIMIT, int(limit)))
+    _refresh_search(targets)
+    idx = _search_index()
+    items: List[Dict[str, Any]] = []
+    for hit in idx.search(query, targets, limit):
+        kind, _, doc_id = hit.key.partition(":")
+        # 索引に登録した本文から抜粋する（他プロセスの変更は _refresh_search で反映済み）
+        doc = idx.document(hit.key)
+        if doc is None:
+            # 検索の直後に削除された文書
+            continue
+        title, text = doc
+        snippet, marks = make_snippet(text, query)
+        items.append(
+            {
+                "kind": kind,
+                "id": int(doc_id) if kind != "post" else doc_id,
+                "title": title,
+                "score": round(hit.score, 4),
+                "snippet": snippet,
+                "highlights": [list(m) for m in marks],
+            }
+        )
+    took_ms = (time.perf_counter() - started) * 1000
+    return {"query": query, "took_ms": round(took_ms, 2), "items": items}
+
+
 def get_notion_settings() -> Dict[str, Any]:
     """Notion MCP設定を取得する"""
-    with _lock:
-        data = _read_json(SETTINGS_FILE, {})
-        notion_config = data.get("notion", {})
-        return {
-            "command": str(notion_config.get("command", "npx")),
-            "args": list(
-                notion_config.get("args", ["@modelcontextprotocol/server-notion"])
-            ),
-            "env": dict(notion_config.get("env", {"NOTION_API_KEY": ""})),
-            "enabled": bool(notion_config.get("enabled", False)),
-            "default_parent_id": str(notion_config.get("default_parent_id", "")),
-        }
+    with _settings_lock.read():
+        return _notion_settings_from(_read_settings({}))
+
+
+def _notion_settings_from(data: Dict[str, Any]) -> Dict[str, Any]:
+    notion_config = data.get("notion", {})
+    return {
+        "command": str(notion_config.get("command", "npx")),
+        "args": list(
+            notion_config.get("args", ["@modelcontextprotocol/server-notion"])
+        ),
+        "env": dict(notion_config.get("env", {"NOTION_API_KEY": ""})),
+        "enabled": bool(notion_config.get("enabled", False)),
+        "default_parent_id": str(notion_config.get("default_parent_id", "")),
+    }
 
 
 def save_notion_settings(
@@ -1061,8 +1651,8 @@ def save_notion_settings(
     if env is None:
         env = {"NOTION_API_KEY": ""}
 
-    with _lock:
-        data = _read_json(SETTINGS_FILE, {})
+    with _settings_lock.write():
+        data = _read_settings_for_update({})
 
         notion_config = {
             "command": str(command),
@@ -1073,24 +1663,27 @@ def save_notion_settings(
         }
 
         data["notion"] = notion_config
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
 
 
 def get_mcp_settings() -> Dict[str, Any]:
     """MCP設定を取得する"""
-    with _lock:
-        data = _read_json(SETTINGS_FILE, {})
-        mcp_config = data.get("mcp", {})
-        return {
-            "servers": dict(mcp_config.get("servers", {})),
-            "enabled": bool(mcp_config.get("enabled", False)),
-        }
+    with _settings_lock.read():
+        return _mcp_settings_from(_read_settings({}))
+
+
+def _mcp_settings_from(data: Dict[str, Any]) -> Dict[str, Any]:
+    mcp_config = data.get("mcp", {})
+    return {
+        "servers": copy.deepcopy(dict(mcp_config.get("servers", {}))),
+        "enabled": bool(mcp_config.get("enabled", False)),
+    }
 
 
 def save_mcp_settings(servers: Dict[str, Any], enabled: bool = False) -> None:
     """MCP設定を保存する"""
-    with _lock:
-        data = _read_json(SETTINGS_FILE, {})
+    with _settings_lock.write():
+        data = _read_settings_for_update({})
 
         mcp_config = {
             "servers": dict(servers),
@@ -1098,7 +1691,7 @@ def save_mcp_settings(servers: Dict[str, Any], enabled: bool = False) -> None:
         }
 
         data["mcp"] = mcp_config
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
 
 
 def add_mcp_server(
@@ -1115,8 +1708,8 @@ def add_mcp_server(
     if env is None:
         env = {}
 
-    with _lock:
-        data = _read_json(SETTINGS_FILE, {})
+    with _settings_lock.write():
+        data = _read_settings_for_update({})
         mcp_config = data.get("mcp", {})
         servers = dict(mcp_config.get("servers", {}))
 
@@ -1134,13 +1727,13 @@ def add_mcp_server(
         }
 
         data["mcp"] = mcp_config
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
 
 
 def remove_mcp_server(server_id: str) -> bool:
     """MCP サーバーを削除する"""
-    with _lock:
-        data = _read_json(SETTINGS_FILE, {})
+    with _settings_lock.write():
+        data = _read_settings_for_update({})
         mcp_config = data.get("mcp", {})
         servers = dict(mcp_config.get("servers", {}))
 
@@ -1155,14 +1748,14 @@ def remove_mcp_server(server_id: str) -> bool:
         }
 
         data["mcp"] = mcp_config
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
         return True
 
 
 def get_epub_settings() -> Dict[str, Any]:
     """EPUB設定を取得する"""
-    with _lock:
-        data = _read_json(SETTINGS_FILE, {})
+    with _settings_lock.read():
+        data = _read_settings({})
         epub_config = data.get("epub", {})
         return {
             "epub_directory": str(epub_config.get("epub_directory", "")),
@@ -1175,6 +1768,8 @@ def get_epub_settings() -> Dict[str, Any]:
             "overlap_size": int(epub_config.get("overlap_size", 50)),
             "search_top_k": int(epub_config.get("search_top_k", 5)),
             "min_similarity_score": float(epub_config.get("min_similarity_score", 0.1)),
+            "ann_index": str(epub_config.get("ann_index", "none")),
+            "ann_nprobe": int(epub_config.get("ann_nprobe", 8)),
         }
 
 
@@ -1185,10 +1780,12 @@ def save_epub_settings(
     overlap_size: int = 50,
     search_top_k: int = 5,
     min_similarity_score: float = 0.1,
+    ann_index: str = "none",
+    ann_nprobe: int = 8,
 ) -> None:
     """EPUB設定を保存する"""
-    with _lock:
-        data = _read_json(SETTINGS_FILE, {})
+    with _settings_lock.write():
+        data = _read_settings_for_update({})
 
         epub_config = {
             "epub_directory": str(epub_directory),
@@ -1197,43 +1794,46 @@ def save_epub_settings(
             "overlap_size": max(0, min(500, int(overlap_size))),
             "search_top_k": max(1, min(20, int(search_top_k))),
             "min_similarity_score": max(0.0, min(1.0, float(min_similarity_score))),
+            "ann_index": ann_index if ann_index in ("none", "ivf") else "none",
+            "ann_nprobe": max(1, min(4096, int(ann_nprobe))),
         }
 
         data["epub"] = epub_config
-        _atomic_write(SETTINGS_FILE, data)
+        _write_settings(data)
 
 
 def save_writing_style(style_id: str, style_data: Any) -> Optional[Dict[str, Any]]:
     """文体テンプレートを保存する"""
-    with _lock:
-        data = _read_json(WRITING_STYLES_FILE, {"items": {}})
+    # バリデーション
+    if not isinstance(style_data, dict):
+        return None
 
-        # バリデーション
-        if not isinstance(style_data, dict):
+    # 必須フィールドのチェック
+    required_fields = ["name", "properties", "source_text", "description"]
+    for field in required_fields:
+        if field not in style_data:
             return None
 
-        # 必須フィールドのチェック
-        required_fields = ["name", "properties", "source_text", "description"]
-        for field in required_fields:
-            if field not in style_data:
-                return None
-
-        # タイムスタンプ付きで保存
-        now_str = datetime.now(UTC).isoformat()
-        style_item = {
-            "id": style_id,
-            "name": str(style_data["name"]),
-            "properties": (
-                dict(style_data["properties"])
-                if isinstance(style_data["properties"], dict)
-                else {}
-            ),
-            "source_text": str(style_data["source_text"]),
-            "description": str(style_data["description"]),
-            "created_at": style_data.get("created_at", now_str),
-            "updated_at": now_str,
-        }
+    # タイムスタンプ付きで保存
+    now_str = datetime.now(UTC).isoformat()
+    style_item = {
+        "id": style_id,
+        "name": str(style_data["name"]),
+        "properties": (
+            dict(style_data["properties"])
+            if isinstance(style_data["properties"], dict)
+            else {}
+        ),
+        "source_text": str(style_data["source_text"]),
+        "description": str(style_data["description"]),
+        "created_at": style_data.get("created_at", now_str),
+        "updated_at": now_str,
+    }
 
+    if _sqlite is not None:
+        return _sqlite.save_writing_style(style_item)
+    with _styles_lock.write():
+        data = _read_json(WRITING_STYLES_FILE, {"items": {}})
         data["items"][style_id] = style_item
         _atomic_write(WRITING_STYLES_FILE, data)
 
@@ -1242,7 +1842,9 @@ def save_writing_style(style_id: str, style_data: Any) -> Optional[Dict[str, Any
 
 def get_writing_style(style_id: str) -> Optional[Dict[str, Any]]:
     """文体テンプレートを取得する"""
-    with _lock:
+    if _sqlite is not None:
+        return _sqlite.get_writing_style(style_id)
+    with _styles_lock.read():
         data = _read_json(WRITING_STYLES_FILE, {"items": {}})
         it = data["items"].get(style_id)
         return it if isinstance(it, dict) else None
@@ -1250,7 +1852,9 @@ def get_writing_style(style_id: str) -> Optional[Dict[str, Any]]:
 
 def list_writing_styles() -> List[Dict[str, Any]]:
     """文体テンプレート一覧を取得する"""
-    with _lock:
+    if _sqlite is not None:
+        return _sqlite.list_writing_styles()
+    with _styles_lock.read():
         data = _read_json(WRITING_STYLES_FILE, {"items": {}})
         styles = list(data["items"].values())
         # 更新日時の降順でソート
@@ -1260,7 +1864,9 @@ def list_writing_styles() -> List[Dict[str, Any]]:
 
 def delete_writing_style(style_id: str) -> bool:
     """文体テンプレートを削除する"""
-    with _lock:
+    if _sqlite is not None:
+        return _sqlite.delete_writing_style(style_id)
+    with _styles_lock.write():
         data = _read_json(WRITING_STYLES_FILE, {"items": {}})
         if style_id not in data["items"]:
             return False
@@ -1268,3 +1874,101 @@ def delete_writing_style(style_id: str) -> bool:
         del data["items"][style_id]
         _atomic_write(WRITING_STYLES_FILE, data)
         return True
+
+
+# ===== Async facade =====
+# 非同期ハンドラからはこちらを await する。同期 API を専用の上限付き
+# スレッドプールで実行し、イベントループ上でファイル I/O・flock 待ち・
+# JSON パースを行わない。設定の読み取りは直近に検証済みのキャッシュが
+# あれば I/O なしで返す。
+
+# ストレージ I/O 用スレッド数
+STORAGE_IO_WORKERS = int(os.getenv("BLOGWRITER_STORAGE_IO_WORKERS", "8") or 8)
+# この秒数以内に stat 済みの設定スナップショットは再検証せずに使う
+SETTINGS_FRESH_SECONDS = 1.0
+_io_executor: Optional[ThreadPoolExecutor] = None
+_T = TypeVar("_T")
+_io_executor_lock = threading.Lock()
+
+
+def _storage_executor() -> ThreadPoolExecutor:
+    global _io_executor
+    with _io_executor_lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(
+                max_workers=max(1, STORAGE_IO_WORKERS),
+                thread_name_prefix="storage-io",
+            )
+        return _io_executor
+
+
+async def run_storage_io(fn: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+    """同期のストレージ関数をストレージ用スレッドプールで実行する"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _storage_executor(), functools.partial(fn, *args, **kwargs)
+    )
+
+
+def _fresh_settings() -> Optional[Dict[str, Any]]:
+    snap = settings_cache.peek(SETTINGS_FILE, SETTINGS_FRESH_SECONDS)
+    return snap.data if snap is not None else None
+
+
+async def aget_ai_settings() -> Dict[str, Any]:
+    data = _fresh_settings()
+    if data is not None:
+        return _ai_settings_from(data)
+    return await run_storage_io(get_ai_settings)
+
+
+async def adecrypt_setting(value: str, secret: Optional[str]) -> str:
+    hit = settings_cache.cached_decrypt(SETTINGS_FILE, value, secret)
+    if hit is not None:
+        return hit
+    return await run_storage_io(decrypt_setting, value, secret)
+
+
+async def aget_notion_settings() -> Dict[str, Any]:
+    data = _fresh_settings()
+    if data is not None:
+        return _notion_settings_from(data)
+    return await run_storage_io(get_notion_settings)
+
+
+async def asave_notion_settings(
+    command: str = "npx",
+    args: Optional[List[str]] = None,
+    env: Optional[Dict[str, str]] = None,
+    enabled: bool = False,
+    default_parent_id: str = "",
+) -> None:
+    await run_storage_io(
+        save_notion_settings, command, args, env, enabled, default_parent_id
+    )
+
+
+async def aget_mcp_settings() -> Dict[str, Any]:
+    data = _fresh_settings()
+    if data is not None:
+        return _mcp_settings_from(data)
+    return await run_storage_io(get_mcp_settings)
+
+
+async def asave_mcp_settings(servers: Dict[str, Any], enabled: bool = False) -> None:
+    await run_storage_io(save_mcp_settings, servers, enabled)
+
+
+async def aadd_mcp_server(
+    server_id: str,
+    name: str,
+    command: str,
+    args: Optional[List[str]] = None,
+    env: Optional[Dict[str, str]] = None,
+    enabled: bool = False,
+) -> None:
+    await run_storage_io(add_mcp_server, server_id, name, command, args, env, enabled)
+
+
+async def aremove_mcp_server(server_id: str) -> bool:
+    return await run_storage_io(remove_mcp_server, server_id)
@@ -0,0 +1,312 @@
+"""記事テンプレートのバージョン履歴（キーフレーム + 差分）
+
+1 行 1 レコードの JSON を追記するログに保存する。各テンプレート type の
+バージョンは一定間隔ごとに全体（キーフレーム）を、それ以外は直前の
+バージョンからのトップレベルキー単位の差分だけを書く。
+
+    {"t": type, "v": 3, "at": "...", "key": {...}}              # キーフレーム
+    {"t": type, "v": 4, "at": "...", "set": {...}, "del": [...]}  # 差分
+
+メモリ上には type ごとのバージョン索引（ファイル位置）と最新の内容を保持し、
+保存は差分 1 行の追記だけで済む。ロックは呼び出し側（app.storage）が取る。
+"""
+
+import bisect
+import copy
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app import durable_write
+
+_logger = logging.getLogger(__name__)
+
+# この件数ごとにキーフレームを書く
+KEYFRAME_INTERVAL = 16
+
+
+@dataclass(frozen=True, slots=True)
+class _VersionRef:
+    version: int
+    created_at: str
+    offset: int
+    length: int
+    keyframe: bool
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    return (line + "\n").encode("utf-8")
+
+
+def _delta(prev: Dict[str, Any], cur: Dict[str, Any]) -> Dict[str, Any]:
+    changed = {k: v for k, v in cur.items() if k not in prev or prev[k] != v}
+    removed = sorted(k for k in prev if k not in cur)
+    return {"set": changed, "del": removed}
+
+
+def _apply(state: Dict[str, Any], rec: Dict[str, Any]) -> Dict[str, Any]:
+    if "key" in rec:
+        return dict(rec["key"])
+    out = dict(state)
+    for k in rec.get("del", []):
+        out.pop(k, None)
+    out.update(rec.get("set", {}))
+    return out
+
+
+class TemplateVersionLog:
+    """テンプレートのバージョン履歴ログ"""
+
+    def __init__(
+        self,
+        path: Path,
+        legacy_path: Optional[Path] = None,
+        keyframe_interval: int = KEYFRAME_INTERVAL,
+        durability: Optional[str] = None,
+    ):
+        """初期化
+
+        Args:
+            path: ログファイルのパス
+            legacy_path: 移行元の template_versions.json（ログが無い場合のみ取り込む）
+            keyframe_interval: キーフレームを書く間隔
+            durability: 耐久性モード（fsync なら追記ごとに fdatasync する）
+        """
+        self.path = path
+        self.legacy_path = legacy_path
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.durability = durability or durable_write.default_durability()
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._ino: Optional[int] = None
+        self._size = 0
+        self._next_id = 1
+        self._refs: Dict[str, List[_VersionRef]] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._open()
+
+    # ----- 内部処理 -----
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.path.exists():
+            self._import_legacy()
+        self._load()
+
+    def _load(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = durable_write.open_log(self.path, self.durability)
+        self._ino = os.fstat(self._fd).st_ino
+        self._size = 0
+        self._next_id = 1
+        self._refs = {}
+        self._latest = {}
+        self._replay()
+
+    def _import_legacy(self) -> None:
+        if self.legacy_path is None or not self.legacy_path.exists():
+            return
+        try:
+            with self.legacy_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict) or not isinstance(data.get("items"), dict):
+            return
+        with durable_write.atomic_file(self.path, self.durability) as f:
+            for t, arr in data["items"].items():
+                if not isinstance(arr, list):
+                    continue
+                prev: Optional[Dict[str, Any]] = None
+                rows = [it for it in arr if isinstance(it, dict)]
+                rows.sort(key=lambda it: int(it.get("version", 0)))
+                for n, it in enumerate(rows):
+                    d = it.get("data")
+                    if not isinstance(d, dict):
+                        continue
+                    rec = self._record(
+                        t,
+                        int(it.get("version", 0)),
+                        str(it.get("created_at", "")),
+                        prev,
+                        d,
+                        n,
+                    )
+                    f.write(_encode(rec))
+                    prev = d
+            next_id = int(data.get("next_id", 1))
+            f.write(_encode({"seq": next_id}))
+        _logger.info("template_versions.log imported from %s", self.legacy_path)
+
+    def _record(
+        self,
+        t: str,
+        version: int,
+        created_at: str,
+        prev: Optional[Dict[str, Any]],
+        cur: Dict[str, Any],
+        position: int,
+    ) -> Dict[str, Any]:
+        rec: Dict[str, Any] = {"t": t, "v": version, "at": created_at}
+        if prev is None or position % self.keyframe_interval == 0:
+            rec["key"] = cur
+        else:
+            rec.update(_delta(prev, cur))
+        return rec
+
+    def _replay(self) -> None:
+        assert self._fd is not None
+        size = os.fstat(self._fd).st_size
+        if size <= self._size:
+            return
+        buf = os.pread(self._fd, size - self._size, self._size)
+        pos = 0
+        while pos < len(buf):
+            nl = buf.find(b"\n", pos)
+            if nl < 0:
+                break
+            self._apply_line(buf[pos:nl], self._size + pos, nl + 1 - pos)
+            pos = nl + 1
+        self._size += pos
+
+    def _apply_line(self, line: bytes, offset: int, length: int) -> None:
+        try:
+            rec = json.loads(line)
+            if "seq" in rec:
+                self._next_id = max(self._next_id, int(rec["seq"]))
+                return
+            t = str(rec["t"])
+            version = int(rec["v"])
+        except (ValueError, KeyError, TypeError):
+            return
+        self._next_id = max(self._next_id, version + 1)
+        refs = self._refs.setdefault(t, [])
+        is_key = "key" in rec
+        if not is_key and t not in self._latest:
+            # 基準が無い差分は読み飛ばす
+            return
+        refs.append(
+            _VersionRef(version, str(rec.get("at", "")), offset, length, is_key)
+        )
+        self._latest[t] = _apply(self._latest.get(t, {}), rec)
+
+    def _sync(self) -> None:
+        """他プロセスの追記・差し替えに追従する"""
+        assert self._fd is not None
+        try:
+            ino = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return
+        if ino != self._ino:
+            self._load()
+        else:
+            self._replay()
+
+    def _read(self, ref: _VersionRef) -> Dict[str, Any]:
+        assert self._fd is not None
+        rec = json.loads(os.pread(self._fd, ref.length, ref.offset))
+        assert isinstance(rec, dict)
+        return rec
+
+    def _position(self, t: str, version: int) -> Optional[int]:
+        refs = self._refs.get(t, [])
+        i = bisect.bisect_left([r.version for r in refs], version)
+        if i < len(refs) and refs[i].version == version:
+            return i
+        return None
+
+    def _walk(self, t: str, start: int, stop: int) -> Iterator[Dict[str, Any]]:
+        """start 番目を復元してから stop 番目までの内容を順に返す"""
+        refs = self._refs[t]
+        base = start
+        while not refs[base].keyframe:
+            base -= 1
+        state: Dict[str, Any] = {}
+        for i in range(base, stop + 1):
+            state = _apply(state, self._read(refs[i]))
+            if i >= start:
+                yield state
+
+    # ----- 公開 API -----
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def list_versions(self, t: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._sync()
+            return [
+                {"version": r.version, "created_at": r.created_at}
+                for r in self._refs.get(t, [])
+            ]
+
+    def latest(self, t: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._sync()
+            data = self._latest.get(t)
+            return copy.deepcopy(data) if data is not None else None
+
+    def get(self, t: str, version: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._sync()
+            i = self._position(t, int(version))
+            if i is None:
+                return None
+            *_, data = self._walk(t, i, i)
+            ref = self._refs[t][i]
+        return {"version": ref.version, "created_at": ref.created_at, "data": data}
+
+    def pair(
+        self, t: str, from_version: int, to_version: int
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """2 つのバージョンの内容を 1 回のチェーン走査で復元する"""
+        with self._lock:
+            self._sync()
+            i = self._position(t, int(from_version))
+            j = self._position(t, int(to_version))
+            if i is None or j is None:
+                return None
+            lo, hi = min(i, j), max(i, j)
+            states = self._walk(t, lo, hi)
+            first = next(states)
+            last = first
+            for last in states:
+                pass
+        return (first, last) if i <= j else (last, first)
+
+    def append(self, t: str, data: Dict[str, Any], created_at: str) -> int:
+        """新しいバージョンを追記して番号を返す"""
+        with self._lock:
+            self._sync()
+            assert self._fd is not None
+            version = self._next_id
+            prev = self._latest.get(t)
+            rec = self._record(
+                t, version, created_at, prev, data, len(self._refs.get(t, []))
+            )
+            payload = _encode(rec)
+            durable_write.append_bytes(self._fd, payload, self.durability)
+            self._apply_line(payload[:-1], self._size, len(payload))
+            self._size += len(payload)
+            return version
+
+    def export(self) -> Dict[str, Any]:
+        """旧 template_versions.json と同じ形で全バージョンを返す"""
+        with self._lock:
+            self._sync()
+            items: Dict[str, List[Dict[str, Any]]] = {}
+            for t, refs in self._refs.items():
+                if not refs:
+                    continue
+                items[t] = [
+                    {"version": r.version, "created_at": r.created_at, "data": d}
+                    for r, d in zip(refs, self._walk(t, 0, len(refs) - 1))
+                ]
+            return {"next_id": self._next_id, "items": items}
@@ -0,0 +1,287 @@
+"""埋め込みインデックスのファイル形式（mmap で開ける行列 + 行単位のメタデータ）
+
+1 冊分のインデックスは次のファイルからなる。
+
+    <path>              ヘッダ JSON（format, version, model_name, dtype, count, dim）
+    <path>.vectors.npy  正規化済み埋め込み行列（既定 float16）
+    <path>.meta.jsonl   1 行 1 チャンクの {"t": テキスト, "m": メタデータ}
+                        （m["text"] が t と同じなら省いて "d": 1 を付ける）
+    <path>.offsets.npy  meta.jsonl の各行の開始位置（int64, count + 1 個）
+    <path>.<名前>.npy   付属の配列（IVF のクラスタ中心など。ヘッダの "extras"）
+                        チャンク本文の sha256 は常に "chunk_sha256" として書く
+
+行列と位置表は `np.load(mmap_mode="r")` で開くため、読み込みはヘッダの
+パースだけで済み、複数ワーカーは OS のページキャッシュを共有する。
+テキストとメタデータは参照された行だけをファイルから読む。
+各ファイルは一時ファイルから rename で置き換え、ヘッダを最後に書く
+（他プロセスが開いている古い行列は inode が残るため壊れない）。
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.durable_write import atomic_file
+
+_logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "blogwriter.embeddings"
+FORMAT_VERSION = 1
+DEFAULT_DTYPE = "float16"
+DTYPES = ("float16", "float32")
+
+_SUFFIXES = (".vectors.npy", ".meta.jsonl", ".offsets.npy")
+# チャンク本文のハッシュ（再インデックスで埋め込みを使い回す判定に使う）
+DIGEST_EXTRA = "chunk_sha256"
+DIGEST_BYTES = 16
+
+
+def _sibling(path: Path, suffix: str) -> Path:
+    return path.with_name(path.name + suffix)
+
+
+def _extra_path(path: Path, name: str) -> Path:
+    return _sibling(path, f".{name}.npy")
+
+
+def _read_header(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(header, dict)
+        or header.get("format") != FORMAT_NAME
+        or header.get("version") != FORMAT_VERSION
+    ):
+        return None
+    return header
+
+
+def index_files(path: Path) -> List[Path]:
+    """インデックスを構成する全ファイル（ヘッダを含む）"""
+    header = _read_header(path) or {}
+    extras = [_extra_path(path, str(name)) for name in header.get("extras", [])]
+    return [path] + [_sibling(path, s) for s in _SUFFIXES] + extras
+
+
+def is_index_header(path: Path) -> bool:
+    """path がこの形式のヘッダか（旧形式の pickle と見分ける）"""
+    try:
+        with path.open("rb") as f:
+            return f.read(1) == b"{"
+    except OSError:
+        return False
+
+
+def chunk_digests(texts: Sequence[str]) -> np.ndarray:
+    """各チャンク本文の sha256 の先頭 DIGEST_BYTES バイト（(件数, DIGEST_BYTES) の uint8）"""
+    out = np.zeros((len(texts), DIGEST_BYTES), dtype=np.uint8)
+    for i, text in enumerate(texts):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()[:DIGEST_BYTES]
+        out[i] = np.frombuffer(digest, dtype=np.uint8)
+    return out
+
+
+def digest_rows(digests: Any) -> Dict[bytes, int]:
+    """chunk_digests の結果を ハッシュ -> 行番号 の辞書にする"""
+    raw = np.ascontiguousarray(digests, dtype=np.uint8).tobytes()
+    return {
+        raw[i : i + DIGEST_BYTES]: i // DIGEST_BYTES
+        for i in range(0, len(raw), DIGEST_BYTES)
+    }
+
+
+def _replace_with(path: Path, payload: bytes) -> None:
+    with atomic_file(path) as f:
+        f.write(payload)
+
+
+def _save_npy(path: Path, array: np.ndarray) -> None:
+    with atomic_file(path) as f:
+        np.save(f, array)
+
+
+def write_index(
+    path: Path,
+    embeddings: Optional[Any],
+    texts: Sequence[str],
+    metadata: Sequence[Dict[str, str]],
+    model_name: str,
+    dtype: str = DEFAULT_DTYPE,
+    extras: Optional[Dict[str, np.ndarray]] = None,
+) -> None:
+    """インデックスを書き出す（embeddings が None なら空のインデックス）
+
+    extras の配列は `<path>.<名前>.npy` に書き、read_index で mmap して返す。
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"unsupported dtype: {dtype}")
+    matrix = (
+        np.asarray(embeddings, dtype=dtype)
+        if embeddings is not None
+        else np.zeros((0, 0), dtype=dtype)
+    )
+    if matrix.ndim != 2 or matrix.shape[0] != len(texts):
+        raise ValueError("埋め込み行列とテキストの件数が一致しません")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    lines: List[bytes] = []
+    pos = 0
+    for i, text in enumerate(texts):
+        meta = dict(metadata[i]) if i < len(metadata) else {}
+        rec: Dict[str, Any] = {"t": text, "m": meta}
+        # RAG のメタデータは本文を "text" に重複して持つため省く
+        if meta.get("text") == text:
+            del meta["text"]
+            rec["d"] = 1
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        encoded = line.encode("utf-8")
+        lines.append(encoded)
+        pos += len(encoded)
+        offsets[i + 1] = pos
+
+    _save_npy(_sibling(path, ".vectors.npy"), np.ascontiguousarray(matrix))
+    _replace_with(_sibling(path, ".meta.jsonl"), b"".join(lines))
+    _save_npy(_sibling(path, ".offsets.npy"), offsets)
+    arrays = dict(extras or {})
+    if len(texts):
+        arrays[DIGEST_EXTRA] = chunk_digests(texts)
+    # 前回のインデックスにだけあった付属配列は消す
+    previous = _read_header(path) or {}
+    for name in set(previous.get("extras", [])) - set(arrays):
+        _extra_path(path, str(name)).unlink(missing_ok=True)
+    for name, array in arrays.items():
+        _save_npy(_extra_path(path, name), np.ascontiguousarray(array))
+    header: Dict[str, Any] = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "model_name": model_name,
+        "dtype": dtype,
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+    }
+    if arrays:
+        header["extras"] = sorted(arrays)
+    _replace_with(path, json.dumps(header, ensure_ascii=False).encode("utf-8"))
+
+
+def remove_index(path: Path) -> None:
+    for p in index_files(path):
+        p.unlink(missing_ok=True)
+
+
+class _Rows:
+    """meta.jsonl の行を必要になった分だけ読む
+
+    位置表と同じ版の本文を読むため、開いた時点のファイルを fd で保持する。
+    """
+
+    def __init__(self, meta_path: Path, offsets: np.ndarray):
+        self._fd: Optional[int] = os.open(meta_path, os.O_RDONLY)
+        self._offsets = offsets
+
+    def close(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+
+    def __del__(self) -> None:
+        # os.open が失敗した場合は _fd が無い
+        if hasattr(self, "_fd"):
+            self.close()
+
+    def __len__(self) -> int:
+        return max(0, len(self._offsets) - 1)
+
+    def row(self, i: int) -> Tuple[str, Dict[str, str]]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if self._fd is None:
+            raise ValueError("閉じたインデックスは読めません")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        rec = json.loads(os.pread(self._fd, end - start, start))
+        text = str(rec.get("t", ""))
+        meta = {str(k): str(v) for k, v in dict(rec.get("m") or {}).items()}
+        if rec.get("d"):
+            meta["text"] = text
+        return text, meta
+
+
+class RowView(Sequence[Any]):
+    """_Rows のテキスト列またはメタデータ列の読み取り専用ビュー"""
+
+    def __init__(self, rows: _Rows, column: int):
+        self._rows = rows
+        self._column = column
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, i: Any) -> Any:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._rows.row(int(i))[self._column]
+
+
+class StoredIndex:
+    """read_index で開いたインデックス"""
+
+    def __init__(
+        self,
+        header: Dict[str, Any],
+        embeddings: np.ndarray,
+        rows: _Rows,
+        extras: Optional[Dict[str, np.ndarray]] = None,
+    ) -> None:
+        self.header = header
+        self._rows = rows
+        self.model_name = str(header.get("model_name", ""))
+        self.embeddings = embeddings
+        self.texts = RowView(rows, 0)
+        self.metadata = RowView(rows, 1)
+        self.extras: Dict[str, np.ndarray] = extras or {}
+
+    def close(self) -> None:
+        """meta.jsonl の fd を閉じる（行列と付属配列はそのまま使える）"""
+        self._rows.close()
+
+    def __enter__(self) -> "StoredIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def read_index(path: Path) -> Optional[StoredIndex]:
+    """ヘッダを検証して行列と位置表を mmap で開く（形式が違えば None）"""
+    header = _read_header(path)
+    if header is None:
+        return None
+    count = int(header.get("count", 0))
+    # 0 件の行列は mmap できないため通常の読み込みにする
+    mode: Optional[Literal["r"]] = "r" if count else None
+    embeddings = np.load(_sibling(path, ".vectors.npy"), mmap_mode=mode)
+    offsets = np.load(_sibling(path, ".offsets.npy"), mmap_mode=mode)
+    if embeddings.shape[0] != count or len(offsets) != count + 1:
+        _logger.error(f"埋め込みインデックスの件数が一致しません: {path}")
+        return None
+    extras: Dict[str, np.ndarray] = {}
+    for name in header.get("extras", []):
+        try:
+            extras[str(name)] = np.load(_extra_path(path, str(name)), mmap_mode=mode)
+        except (OSError, ValueError):
+            # 付属配列が読めなくても行列だけで検索できる
+            _logger.warning(f"付属配列を読み込めません: {path} ({name})")
+    return StoredIndex(
+        header, embeddings, _Rows(_sibling(path, ".meta.jsonl"), offsets), extras
+    )
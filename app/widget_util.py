@@ -10,7 +10,7 @@ from app.ai_utils import extract_text
 from app.mcp_util import GenericMCPClient, format_mcp_tool_result
 from app.notion_util import NotionMCPClient, format_notion_page_for_context
 from app.security import is_url_allowed
-from app.storage import get_mcp_settings, get_notion_settings
+from app.storage import aget_mcp_settings, aget_notion_settings
 
 logger = logging.getLogger(__name__)
 
@@ -113,7 +113,7 @@ async def process_mcp_widget(widget_data: Dict[str, Any]) -> Optional[str]:
         Formatted context string or None if failed
     """
     try:
-        mcp_settings = get_mcp_settings()
+        mcp_settings = await aget_mcp_settings()
 
         if not mcp_settings.get("enabled", False):
             logger.warning("MCP integration is disabled")
@@ -162,7 +162,7 @@ async def process_notion_widget(widget_data: Dict[str, Any]) -> Optional[str]:
         Formatted context string or None if failed
     """
     try:
-        notion_settings = get_notion_settings()
+        notion_settings = await aget_notion_settings()
 
         if not notion_settings.get("enabled", False):
             logger.warning("Notion integration is disabled")
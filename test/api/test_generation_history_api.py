@@ -176,3 +176,38 @@ def test_generation_history_with_limit_param():
     data = response.json()
     histories = data["history"]
     assert len(histories) == 2
+
+
+def test_generation_history_summaries_api():
+    """要約一覧 API のカーソルページングのテスト"""
+    app = create_app()
+    client = TestClient(app)
+
+    for i in range(3):
+        payload = {
+            "title": f"要約テスト{i}",
+            "template_type": "summary_test",
+            "widgets_used": [],
+            "properties": {},
+            "generated_content": "要約テストコンテンツ" * 20,
+        }
+        client.post("/api/generation-history", json=payload)
+
+    response = client.get("/api/generation-history/summaries?limit=2&preview=5")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["items"]) == 2
+    assert data["items"][0]["preview"] == "要約テスト"
+    assert "generated_content" not in data["items"][0]
+    assert data["next_cursor"]
+
+    response = client.get(
+        "/api/generation-history/summaries",
+        params={"after": data["next_cursor"], "limit": 2},
+    )
+    assert response.status_code == 200
+    ids = {it["id"] for it in data["items"]}
+    assert not ids & {it["id"] for it in response.json()["items"]}
+
+    response = client.get("/api/generation-history/summaries?after=broken")
+    assert response.status_code == 400
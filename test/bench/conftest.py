@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+# ベンチマークは時間がかかるため明示的に有効化した場合のみ実行する
+#   BLOGWRITER_BENCH=1 pytest test/bench
+#   BLOGWRITER_BENCH_SCALES=10000,100000  下書き件数（カンマ区切り）
+#   BLOGWRITER_BENCH_OUTPUT=bench_results.json  結果の出力先
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.getenv("BLOGWRITER_BENCH"):
+        return
+    skip = pytest.mark.skip(reason="set BLOGWRITER_BENCH=1 to run benchmarks")
+    for item in items:
+        if "test/bench" in str(item.fspath).replace(os.sep, "/"):
+            item.add_marker(skip)
@@ -0,0 +1,129 @@
+"""ベンチマーク用の合成データディレクトリ
+
+ストレージ API を件数分呼ぶと生成だけで時間がかかるため、各ファイルの
+旧形式（drafts.json / template_versions.json / インライン本文の
+generation_history.json）を直接書き、`init_storage` の取り込み処理で
+現行形式へ変換させる。SQLite バックエンドも同じ JSON から移行される。
+"""
+
+import json
+import random
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+_WORDS = (
+    "ブログ 記事 下書き テンプレート 生成 履歴 検索 性能 計測 "
+    "storage python fastapi markdown latency throughput"
+).split()
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    drafts: int
+    history: int
+    template_types: int
+    versions_per_template: int
+    posts: int
+    # 本文の平均文字数
+    body_chars: int = 2000
+    seed: int = 42
+
+
+def _text(rng: random.Random, chars: int) -> str:
+    out: List[str] = []
+    size = 0
+    while size < chars:
+        line = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(4, 12)))
+        out.append(line)
+        size += len(line) + 1
+    return "\n".join(out)
+
+
+def _ts(base: datetime, i: int) -> str:
+    return (base + timedelta(seconds=i)).isoformat()
+
+
+def _write(path: Path, data: Any) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def build_corpus(root: Path, spec: CorpusSpec) -> Dict[str, Any]:
+    """root に合成データを書き、生成した件数などを返す"""
+    rng = random.Random(spec.seed)
+    root.mkdir(parents=True, exist_ok=True)
+    base = datetime(2026, 1, 1, tzinfo=UTC)
+
+    drafts = [
+        {
+            "id": i,
+            "title": f"下書き {i}",
+            "content": _text(rng, rng.randint(spec.body_chars // 2, spec.body_chars)),
+            "created_at": _ts(base, i),
+            "updated_at": _ts(base, i),
+        }
+        for i in range(1, spec.drafts + 1)
+    ]
+    _write(root / "drafts.json", {"next_id": spec.drafts + 1, "items": drafts})
+
+    history = [
+        {
+            "id": i,
+            "title": f"生成 {i}",
+            "template_type": "bench",
+            "widgets_used": ["properties"],
+            "properties": {"theme": rng.choice(_WORDS)},
+            "generated_content": _text(rng, spec.body_chars),
+            "reasoning": "",
+            "created_at": _ts(base, i * 60),
+        }
+        for i in range(1, spec.history + 1)
+    ]
+    _write(
+        root / "generation_history.json",
+        {"next_id": spec.history + 1, "items": history},
+    )
+
+    versions: Dict[str, List[Dict[str, Any]]] = {}
+    next_version = 1
+    for t in range(spec.template_types):
+        rows = []
+        fields = [{"key": f"f{k}", "label": f"項目{k}"} for k in range(10)]
+        for _ in range(spec.versions_per_template):
+            fields = list(fields)
+            k = rng.randrange(len(fields))
+            fields[k] = {"key": f"f{k}", "label": f"項目{k}-{next_version}"}
+            rows.append(
+                {
+                    "version": next_version,
+                    "created_at": _ts(base, next_version),
+                    "data": {
+                        "name": f"テンプレート{t}",
+                        "fields": fields,
+                        "prompt_template": _text(rng, 300),
+                    },
+                }
+            )
+            next_version += 1
+        versions[f"bench{t}"] = rows
+    _write(
+        root / "template_versions.json",
+        {"next_id": next_version, "items": versions},
+    )
+
+    posts = root / "posts"
+    posts.mkdir(exist_ok=True)
+    for i in range(spec.posts):
+        body = f"# 記事 {i}\n\n" + _text(rng, spec.body_chars)
+        (posts / f"20260101-{i:06d}-post.md").write_text(body, encoding="utf-8")
+
+    return {
+        "drafts": spec.drafts,
+        "history": spec.history,
+        "template_types": spec.template_types,
+        "versions_per_template": spec.versions_per_template,
+        "posts": spec.posts,
+        "body_chars": spec.body_chars,
+    }
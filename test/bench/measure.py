@@ -0,0 +1,76 @@
+"""レイテンシ計測と結果 JSON の書き出し"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def measure(fn: Callable[[int], Any], iterations: int, warmup: int = 3) -> Dict:
+    """fn(i) を繰り返し呼び、ミリ秒単位の p50/p99 とスループットを返す"""
+    for i in range(warmup):
+        fn(i)
+    samples: List[float] = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - started
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(_percentile(samples, 0.50), 4),
+        "p99_ms": round(_percentile(samples, 0.99), 4),
+        "max_ms": round(samples[-1], 4),
+        "mean_ms": round(sum(samples) / len(samples), 4),
+        "ops_per_sec": round(iterations / total, 2) if total > 0 else 0.0,
+    }
+
+
+def _git_revision() -> str:
+    try:
+        res = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return ""
+    return res.stdout.strip()
+
+
+def output_path() -> Path:
+    return Path(os.getenv("BLOGWRITER_BENCH_OUTPUT", "bench_results.json"))
+
+
+def record_result(key: str, result: Dict[str, Any]) -> None:
+    """結果を出力 JSON の runs[key] に追記・上書きする"""
+    path = output_path()
+    data: Dict[str, Any] = {}
+    if path.exists():
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            data = {}
+    data["meta"] = {
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "updated_at": datetime.now(UTC).isoformat(),
+    }
+    data.setdefault("runs", {})[key] = result
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -0,0 +1,75 @@
+"""EPUB 取り込みの計測: 解析ワーカー数ごとのチャンク/秒
+
+BLOGWRITER_BENCH=1 のときのみ実行する。書籍数は
+BLOGWRITER_BENCH_INGEST_BOOKS（既定 16）、ワーカー数は
+BLOGWRITER_BENCH_INGEST_WORKERS（既定 1,4）で変える。埋め込みは
+モデルを読み込まずに固定の行列で代用し、解析とバッチ化の時間を測る。
+"""
+
+import os
+from functools import partial
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from ebooklib import epub
+
+from app.epub_ingest import IngestPipeline, parse_book
+
+from .measure import record_result
+
+PARAGRAPHS = 400
+DIM = 384
+
+
+def _write_epub(path: Path, title: str) -> None:
+    book = epub.EpubBook()
+    book.set_identifier(title)
+    book.set_title(title)
+    book.set_language("ja")
+    chapters = []
+    for c in range(8):
+        chapter = epub.EpubHtml(title=f"章{c}", file_name=f"c{c}.xhtml", lang="ja")
+        body = "".join(
+            f"<p>{title}の第{c}章、{i}段落目の本文です。" + "文章" * 40 + "。</p>"
+            for i in range(PARAGRAPHS // 8)
+        )
+        chapter.content = f"<html><body>{body}</body></html>"
+        book.add_item(chapter)
+        chapters.append(chapter)
+    book.toc = tuple(chapters)
+    book.spine = chapters
+    book.add_item(epub.EpubNcx())
+    epub.write_epub(str(path), book)
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    return np.ones((len(texts), DIM), dtype=np.float32)
+
+
+def test_epub_ingest_throughput(tmp_path: Path):
+    books = int(os.getenv("BLOGWRITER_BENCH_INGEST_BOOKS", "16"))
+    workers = [
+        int(x)
+        for x in os.getenv("BLOGWRITER_BENCH_INGEST_WORKERS", "1,4").split(",")
+        if x.strip()
+    ]
+    paths = []
+    for n in range(books):
+        paths.append(tmp_path / f"book{n}.epub")
+        _write_epub(paths[-1], f"本{n}")
+
+    results = {}
+    for count in workers:
+        stats = IngestPipeline(_encode, workers=count, batch_size=256).run(
+            paths,
+            partial(parse_book, chunk_size=500, overlap=50),
+            lambda book: (None, list(range(len(book.chunks)))),
+            lambda book, matrix, embedded: None,
+        )
+        assert stats.books == books
+        results[f"workers_{count}"] = stats.as_dict()
+    record_result(
+        "epub-ingest",
+        {"books": books, "cpu_count": os.cpu_count(), **results},
+    )
@@ -0,0 +1,97 @@
+"""app.storage のスケーリング計測（BLOGWRITER_BENCH=1 のときのみ実行）"""
+
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from app import storage
+
+from .corpus import CorpusSpec, build_corpus
+from .measure import measure, record_result
+
+
+def _scales() -> List[int]:
+    raw = os.getenv("BLOGWRITER_BENCH_SCALES", "10000")
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+def _spec(scale: int) -> CorpusSpec:
+    return CorpusSpec(
+        drafts=scale,
+        history=max(1000, scale // 10),
+        template_types=5,
+        versions_per_template=200,
+        posts=max(500, scale // 20),
+    )
+
+
+@pytest.fixture
+def bench_storage(tmp_path: Path, monkeypatch, request):
+    backend, scale = request.param
+    spec = _spec(scale)
+    corpus = build_corpus(tmp_path / "data", spec)
+    monkeypatch.setenv("BLOGWRITER_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("BLOGWRITER_STORAGE_BACKEND", backend)
+    started = time.perf_counter()
+    storage.init_storage()
+    init_s = time.perf_counter() - started
+    yield backend, scale, spec, {**corpus, "init_seconds": round(init_s, 3)}
+    monkeypatch.delenv("BLOGWRITER_STORAGE_BACKEND")
+    monkeypatch.delenv("BLOGWRITER_DATA_DIR")
+    storage.init_storage()
+
+
+@pytest.mark.parametrize(
+    "bench_storage",
+    [(b, s) for b in ("json", "sqlite") for s in _scales()],
+    indirect=True,
+    ids=lambda p: f"{p[0]}-{p[1]}",
+)
+def test_storage_scaling(bench_storage):
+    backend, scale, spec, corpus = bench_storage
+    rng = random.Random(0)
+    ids = [rng.randint(1, spec.drafts) for _ in range(5000)]
+    types = [f"bench{t}" for t in range(spec.template_types)]
+    per_type = {
+        t: [v["version"] for v in storage.list_template_versions(t)] for t in types
+    }
+    assert all(len(v) == spec.versions_per_template for v in per_type.values())
+
+    def get_draft(i: int) -> None:
+        assert storage.get_draft(ids[i % len(ids)]) is not None
+
+    def update_draft(i: int) -> None:
+        draft_id = ids[i % len(ids)]
+        assert storage.update_draft(draft_id, None, f"更新 {i}\n本文") is not None
+
+    def list_drafts(_: int) -> None:
+        assert len(storage.list_drafts()) == spec.drafts
+
+    def list_posts(_: int) -> None:
+        assert len(storage.list_markdown_posts(limit=50)) == 50
+
+    def list_history(_: int) -> None:
+        assert len(storage.list_generation_history(limit=20)) == 20
+
+    def diff_versions(i: int) -> None:
+        t = types[i % len(types)]
+        a, b = sorted(rng.sample(per_type[t], 2))
+        assert storage.diff_template_versions(t, a, b)["changed_keys"]
+
+    heavy = max(3, 200_000 // max(1, spec.drafts))
+    results: Dict[str, Any] = {
+        "get_draft": measure(get_draft, 2000),
+        "update_draft": measure(update_draft, 300),
+        "list_drafts": measure(list_drafts, heavy, warmup=1),
+        "list_markdown_posts": measure(list_posts, 200),
+        "list_generation_history": measure(list_history, 200),
+        "diff_template_versions": measure(diff_versions, 300),
+    }
+    record_result(
+        f"{backend}-{scale}",
+        {"backend": backend, "scale": scale, "corpus": corpus, "ops": results},
+    )
@@ -0,0 +1,92 @@
+"""EPUB 検索の計測: sklearn brute NearestNeighbors・DenseIndex・int8 の QuantizedIndex の比較
+
+BLOGWRITER_BENCH=1 のときのみ実行する。チャンク数は
+BLOGWRITER_BENCH_VECTOR_SCALES（既定 10000,100000。1000000 も指定可）で変える。
+"""
+
+import os
+from typing import List
+
+import numpy as np
+import pytest
+from sklearn.neighbors import NearestNeighbors
+
+from app.dense_index import DenseIndex
+from app.quantized_index import QuantizedIndex, quantize_int8
+
+from .measure import measure, record_result
+
+DIM = 384  # all-MiniLM-L6-v2 の次元
+TOP_K = 5
+QUERIES = 64
+
+
+def _scales() -> List[int]:
+    raw = os.getenv("BLOGWRITER_BENCH_VECTOR_SCALES", "10000,100000")
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+def _normalized(rng: np.random.Generator, n: int) -> np.ndarray:
+    out = np.empty((n, DIM), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        block = rng.standard_normal((min(100_000, n - start), DIM), dtype=np.float32)
+        out[start : start + len(block)] = block / np.linalg.norm(
+            block, axis=1, keepdims=True
+        )
+    return out
+
+
+@pytest.mark.parametrize("chunks", _scales(), ids=lambda n: f"chunks-{n}")
+def test_vector_search_latency(chunks: int):
+    rng = np.random.default_rng(0)
+    matrix = _normalized(rng, chunks)
+    queries = _normalized(rng, QUERIES)
+    iterations = max(5, min(200, 2_000_000 // chunks))
+
+    nn = NearestNeighbors(n_neighbors=TOP_K, metric="cosine", algorithm="brute")
+    nn.fit(matrix)
+    dense = DenseIndex(matrix)
+    half_matrix = matrix.astype(np.float16)
+    half = DenseIndex(half_matrix)
+    quantized = QuantizedIndex(half_matrix, *quantize_int8(half_matrix))
+
+    results = {
+        "sklearn_brute": measure(
+            lambda i: nn.kneighbors(queries[i % QUERIES : i % QUERIES + 1], TOP_K),
+            iterations,
+        ),
+        "dense": measure(
+            lambda i: dense.search(queries[i % QUERIES], TOP_K), iterations
+        ),
+        "dense_float16": measure(
+            lambda i: half.search(queries[i % QUERIES], TOP_K), iterations
+        ),
+        "int8_rerank": measure(
+            lambda i: quantized.search(queries[i % QUERIES], TOP_K), iterations
+        ),
+        # 64 クエリを 1 回の行列積で検索した場合の 1 回あたり
+        "dense_batch64": measure(
+            lambda i: dense.search_batch(queries, TOP_K), max(3, iterations // 8)
+        ),
+    }
+    # 厳密検索どうしなので上位の結果は一致する
+    _, expected = nn.kneighbors(queries, TOP_K)
+    _, got = dense.search_batch(queries, TOP_K)
+    assert (np.sort(expected, axis=1) == np.sort(got, axis=1)).mean() > 0.99
+
+    _, approx = quantized.search_batch(queries, TOP_K)
+    recall = np.mean([len(np.intersect1d(a, g)) / TOP_K for a, g in zip(approx, got)])
+
+    speedup = results["sklearn_brute"]["p50_ms"] / max(results["dense"]["p50_ms"], 1e-9)
+    record_result(
+        f"vector-search-{chunks}",
+        {
+            "chunks": chunks,
+            "dim": DIM,
+            "speedup_p50": round(speedup, 2),
+            "int8_recall": round(float(recall), 4),
+            # 走査する配列の大きさ（float32 の行列に対する比）
+            "int8_scan_ratio": round(quantized.nbytes / matrix.nbytes, 3),
+            **results,
+        },
+    )
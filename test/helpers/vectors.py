@@ -0,0 +1,30 @@
+"""埋め込みインデックスのテスト用ヘルパー関数"""
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app import vector_store
+
+
+def write_book_index(
+    cache_dir: Path,
+    name: str,
+    vectors: Any,
+    model: str = "m",
+    dtype: str = vector_store.DEFAULT_DTYPE,
+) -> Path:
+    """行ごとのテキストが `<書籍名>-<行番号>` の書籍インデックスを書く"""
+    path = cache_dir / f"{name}.index"
+    texts = [f"{name}-{i}" for i in range(len(vectors))]
+    vector_store.write_index(
+        path, np.array(vectors), texts, [{"text": t} for t in texts], model, dtype
+    )
+    return path
+
+
+def normalized_rows(rng: np.random.Generator, n: int, dim: int = 16) -> np.ndarray:
+    """L2 正規化した乱数の行列（float32）"""
+    x = rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
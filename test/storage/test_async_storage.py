@@ -0,0 +1,40 @@
+import asyncio
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+from app import storage
+from app.storage import (
+    aadd_mcp_server,
+    adecrypt_setting,
+    aget_mcp_settings,
+    get_mcp_settings,
+    run_storage_io,
+    save_mcp_settings,
+)
+
+
+def test_run_storage_io_uses_dedicated_pool(temp_data_dir: Path):
+    name = asyncio.run(run_storage_io(lambda: threading.current_thread().name))
+    assert name.startswith("storage-io")
+
+
+def test_fresh_settings_are_served_without_io(temp_data_dir: Path):
+    save_mcp_settings({}, enabled=True)
+    with patch("app.storage.run_storage_io") as mock_run:
+        settings = asyncio.run(aget_mcp_settings())
+    mock_run.assert_not_called()
+    assert settings == get_mcp_settings()
+
+
+def test_stale_settings_fall_back_to_executor(temp_data_dir: Path):
+    save_mcp_settings({}, enabled=False)
+    with patch.object(storage, "SETTINGS_FRESH_SECONDS", 0.0):
+        asyncio.run(aadd_mcp_server("s1", "Server", "npx", ["-y"], enabled=True))
+        settings = asyncio.run(aget_mcp_settings())
+    assert settings["servers"]["s1"]["name"] == "Server"
+
+
+def test_adecrypt_setting_passes_plain_values(temp_data_dir: Path):
+    assert asyncio.run(adecrypt_setting("plain", None)) == "plain"
+    assert asyncio.run(adecrypt_setting("", "secret")) == ""
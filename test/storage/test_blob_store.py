@@ -0,0 +1,90 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import app.storage as storage
+from app.blob_store import BlobStore, blob_hash
+from app.storage import (
+    delete_generation_history,
+    get_generation_history,
+    init_storage,
+    list_generation_history_summaries,
+    save_generation_history,
+)
+
+
+def test_put_is_content_addressed_and_deduplicated(tmp_path: Path):
+    store = BlobStore(tmp_path, compress_min_bytes=16)
+    small = store.put("短い")
+    big = store.put("長い本文" * 100)
+    assert store.put("長い本文" * 100) == big == blob_hash("長い本文" * 100)
+    assert store.get(small) == "短い"
+    assert store.get(big) == "長い本文" * 100
+    assert (tmp_path / big[:2] / f"{big}.z").exists()
+    assert len(list(store.hashes())) == 2
+
+    assert store.gc([big]) == 1
+    assert store.get(small) is None
+
+
+def test_history_bodies_live_in_blobs(temp_data_dir: Path):
+    body = "生成本文" * 500
+    a = save_generation_history("a", "t", [], {}, body, "理由")
+    b = save_generation_history("b", "t", [], {}, body)
+
+    raw = json.loads((temp_data_dir / "generation_history.json").read_text("utf-8"))
+    assert all("generated_content" not in it for it in raw["items"])
+    assert raw["items"][0]["content_hash"] == raw["items"][1]["content_hash"]
+    assert get_generation_history(a["id"])["reasoning"] == "理由"  # type: ignore
+
+    summary = list_generation_history_summaries(limit=1)["items"][0]
+    assert summary["content_length"] == len(body)
+
+    # 共有されているブロブは参照が残る限り消さない
+    delete_generation_history(a["id"])
+    assert get_generation_history(b["id"])["generated_content"] == body  # type: ignore
+    delete_generation_history(b["id"])
+    assert list(storage._blobs.hashes()) == []
+
+
+def test_orphan_blobs_are_collected_on_init(temp_data_dir: Path):
+    kept = save_generation_history("a", "t", [], {}, "残る本文")
+    # put の後、履歴を保存する前に落ちた場合の孤立ブロブ
+    orphan = storage._blobs.put("孤立した本文")
+    fresh = storage._blobs.put("保存途中の本文")
+    old = time.time() - storage.BLOB_GC_MIN_AGE - 10
+    for digest in (orphan, blob_hash("残る本文")):
+        path = storage._blobs._existing(digest)
+        assert path is not None
+        os.utime(path, (old, old))
+
+    init_storage()
+    assert storage._blobs.get(orphan) is None
+    assert storage._blobs.get(fresh) == "保存途中の本文"
+    assert get_generation_history(kept["id"])["generated_content"] == "残る本文"  # type: ignore
+
+
+def test_inline_history_is_migrated_on_init(temp_data_dir: Path):
+    path = temp_data_dir / "generation_history.json"
+    legacy = {
+        "next_id": 2,
+        "items": [
+            {
+                "id": 1,
+                "title": "old",
+                "template_type": "t",
+                "widgets_used": [],
+                "properties": {},
+                "generated_content": "旧本文",
+                "reasoning": "",
+                "created_at": "2024-01-01T00:00:00+00:00",
+            }
+        ],
+    }
+    path.write_text(json.dumps(legacy), encoding="utf-8")
+    init_storage()
+
+    raw = json.loads(path.read_text("utf-8"))
+    assert "generated_content" not in raw["items"][0]
+    assert get_generation_history(1)["generated_content"] == "旧本文"  # type: ignore
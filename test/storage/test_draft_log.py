@@ -0,0 +1,152 @@
+import json
+from pathlib import Path
+
+from app.draft_log import DraftLog
+from app.storage import (
+    create_draft,
+    delete_draft,
+    get_draft,
+    list_draft_summaries,
+    list_drafts,
+    update_draft,
+)
+
+
+def test_drafts_crud_via_storage(temp_data_dir: Path):
+    a = create_draft("A", "本文A")
+    b = create_draft("B", "本文B")
+    assert b["id"] == a["id"] + 1
+
+    got = get_draft(a["id"])
+    assert got is not None
+    assert got["content"] == "本文A"
+
+    updated = update_draft(a["id"], "A2", "本文A2")
+    assert updated is not None
+    assert updated["title"] == "A2"
+    assert [d["id"] for d in list_drafts()][0] == a["id"]
+
+    assert delete_draft(b["id"]) is True
+    assert delete_draft(b["id"]) is False
+    assert get_draft(b["id"]) is None
+    assert update_draft(b["id"], "x", "y") is None
+
+
+def test_reopen_replays_log_and_keeps_next_id(tmp_path: Path):
+    log = DraftLog(tmp_path / "drafts.log")
+    first = log.create("t1", "c1")
+    second = log.create("t2", "c2")
+    log.update(first["id"], None, "c1-updated")
+    log.delete(second["id"])
+    log.close()
+
+    reopened = DraftLog(tmp_path / "drafts.log")
+    assert reopened.get(first["id"])["content"] == "c1-updated"  # type: ignore
+    assert reopened.get(second["id"]) is None
+    assert reopened.create("t3", "c3")["id"] == second["id"] + 1
+    reopened.close()
+
+
+def test_legacy_drafts_json_is_imported(tmp_path: Path):
+    legacy = tmp_path / "drafts.json"
+    legacy.write_text(
+        json.dumps(
+            {
+                "next_id": 8,
+                "items": [
+                    {
+                        "id": 3,
+                        "title": "旧",
+                        "content": "旧本文",
+                        "created_at": "2024-01-01T00:00:00+00:00",
+                        "updated_at": "2024-01-02T00:00:00+00:00",
+                    }
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+    log = DraftLog(tmp_path / "drafts.log", legacy_path=legacy)
+    assert log.get(3)["content"] == "旧本文"  # type: ignore
+    assert log.create("新", "新本文")["id"] == 8
+    log.close()
+
+
+def test_compaction_drops_dead_records(tmp_path: Path):
+    log = DraftLog(tmp_path / "drafts.log", compact_min_bytes=1 << 30)
+    keep = log.create("keep", "x" * 100)
+    gone = log.create("gone", "y" * 100)
+    for i in range(20):
+        log.update(keep["id"], None, f"v{i}" * 50)
+    log.delete(gone["id"])
+    before = log.stats()
+
+    log.compact()
+
+    after = log.stats()
+    assert after["size"] < before["size"]
+    assert after["count"] == 1
+    assert log.get(keep["id"])["content"] == "v19" * 50  # type: ignore
+    assert log.create("next", "z")["id"] == gone["id"] + 1
+    log.close()
+
+    reopened = DraftLog(tmp_path / "drafts.log")
+    assert reopened.get(keep["id"])["content"] == "v19" * 50  # type: ignore
+    reopened.close()
+
+
+def test_compaction_aborts_when_another_instance_replaced_the_log(
+    tmp_path: Path, monkeypatch
+):
+    a = DraftLog(tmp_path / "drafts.log", compact_min_bytes=1 << 30)
+    b = DraftLog(tmp_path / "drafts.log", compact_min_bytes=1 << 30)
+    rows = [a.create(f"t{i}", "x" * 50) for i in range(5)]
+    for i in range(5):
+        a.update(rows[0]["id"], None, f"v{i}" * 30)
+
+    locked = a._locked
+
+    def interleave(exclusive: bool):
+        # a のコピー中に b が追記して先に詰め直す（a は fd を開き直す）
+        monkeypatch.setattr(a, "_locked", locked)
+        b.update(rows[1]["id"], None, "b の更新")
+        b.compact()
+        return locked(exclusive)
+
+    monkeypatch.setattr(a, "_locked", interleave)
+    a.compact()
+
+    assert list(tmp_path.glob("drafts.log.compact*")) == []
+    reopened = DraftLog(tmp_path / "drafts.log")
+    for log in (a, reopened):
+        assert log.get(rows[0]["id"])["content"] == "v4" * 30  # type: ignore
+        assert log.get(rows[1]["id"])["content"] == "b の更新"  # type: ignore
+        assert len(log.list()) == 5
+    for log in (a, b, reopened):
+        log.close()
+
+
+def test_background_compaction_is_triggered(tmp_path: Path):
+    log = DraftLog(tmp_path / "drafts.log", compact_ratio=0.5, compact_min_bytes=0)
+    row = log.create("t", "c")
+    for i in range(10):
+        log.update(row["id"], None, f"content-{i}")
+    log.wait_compaction()
+    assert log.stats()["dead_bytes"] < log.stats()["size"]
+    assert log.get(row["id"])["content"] == "content-9"  # type: ignore
+    log.close()
+
+
+def test_draft_summaries_are_paginated_by_cursor(temp_data_dir: Path):
+    ids = [create_draft(f"T{i}", "本文" * 100)["id"] for i in range(5)]
+
+    first = list_draft_summaries(limit=2, preview_chars=4)
+    assert [r["id"] for r in first["items"]] == ids[::-1][:2]
+    assert first["items"][0]["preview"] == "本文本文"
+    assert first["items"][0]["content_length"] == 200
+    assert "content" not in first["items"][0]
+
+    second = list_draft_summaries(after=first["next_cursor"], limit=2)
+    third = list_draft_summaries(after=second["next_cursor"], limit=2)
+    assert [r["id"] for r in second["items"] + third["items"]] == ids[::-1][2:]
+    assert third["next_cursor"] is None
@@ -0,0 +1,123 @@
+import json
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import storage
+from app.draft_revisions import DraftRevisionLog, apply_ops, diff_ops
+from app.main import create_app
+from app.storage import (
+    create_draft,
+    delete_draft,
+    get_draft_revision,
+    list_draft_revisions,
+    restore_draft_revision,
+    update_draft,
+)
+
+
+def test_diff_ops_roundtrip():
+    old = "一行目\n二行目\n三行目\n"
+    new = "一行目\n変更した二行目\n三行目\n四行目"
+    ops = diff_ops(old, new)
+    assert apply_ops(old, ops) == new
+    assert ops[0] == 1  # 先頭 1 行はそのまま
+    assert apply_ops("", diff_ops("", "abc")) == "abc"
+
+
+def test_checkpoints_and_reconstruction(tmp_path: Path):
+    log = DraftRevisionLog(tmp_path / "rev.log", checkpoint_interval=3)
+    lines = []
+    for i in range(7):
+        lines.append(f"line {i}\n")
+        log.record(1, "t", "".join(lines), f"2026-01-0{i + 1}")
+    assert log.record(1, "t", "".join(lines), "x") == 7  # 変化なしは追記しない
+
+    revs = log.list_revisions(1)
+    assert [r["revision"] for r in revs] == list(range(1, 8))
+    assert [r["checkpoint"] for r in revs] == [i % 3 == 0 for i in range(7)]
+    for n in range(1, 8):
+        got = log.get(1, n)
+        assert got is not None
+        assert got["content"] == "".join(f"line {i}\n" for i in range(n))
+
+    # 差分レコードは全文を持たない
+    recs = [json.loads(x) for x in (tmp_path / "rev.log").read_text().splitlines()]
+    assert "full" not in recs[1] and recs[1]["ops"] == [1, "line 1\n"]
+
+    # 開き直しても同じ内容を復元できる
+    log.close()
+    reopened = DraftRevisionLog(tmp_path / "rev.log", checkpoint_interval=3)
+    assert reopened.get(1, 5)["content"] == "".join(f"line {i}\n" for i in range(5))
+    reopened.drop(1)
+    assert reopened.list_revisions(1) == []
+    reopened.close()
+
+
+def test_drop_compacts_deleted_drafts_out_of_the_log(tmp_path: Path):
+    path = tmp_path / "rev.log"
+    log = DraftRevisionLog(path, checkpoint_interval=3, compact_min_bytes=0)
+    for i in range(5):
+        log.record(1, "keep", f"残す {i}\n", "at")
+        log.record(2, "gone", f"秘密の本文 {i}\n", "at")
+    log.drop(2)
+
+    assert "秘密の本文" not in path.read_text(encoding="utf-8")
+    assert log.stats()["dead_bytes"] == 0
+    assert log.get(1, 5)["content"] == "残す 4\n"  # type: ignore
+    assert log.record(1, "keep", "残す 5\n", "at") == 6
+    log.close()
+
+    reopened = DraftRevisionLog(path, checkpoint_interval=3)
+    assert [r["revision"] for r in reopened.list_revisions(1)] == list(range(1, 7))
+    assert reopened.list_revisions(2) == []
+    reopened.close()
+
+
+def test_record_uses_cached_latest_content(tmp_path: Path, monkeypatch):
+    log = DraftRevisionLog(tmp_path / "rev.log", checkpoint_interval=10)
+    log.record(1, "t", "a\n", "at")
+
+    def replay(*args):
+        raise AssertionError("最新の内容を差分から復元しない")
+
+    monkeypatch.setattr(log, "_content", replay)
+    for i in range(8):
+        log.record(1, "t", "a\n" + "b\n" * (i + 1), "at")
+    monkeypatch.undo()
+    assert log.get(1, 9)["content"] == "a\n" + "b\n" * 8  # type: ignore
+    log.close()
+
+
+def test_revisions_via_storage(temp_data_dir: Path):
+    d = create_draft("A", "初版\n")
+    update_draft(d["id"], None, "初版\n追記\n")
+    update_draft(d["id"], "A2", None)
+    revs = list_draft_revisions(d["id"])
+    assert [r["title"] for r in revs] == ["A", "A", "A2"]
+    assert get_draft_revision(d["id"], 1)["content"] == "初版\n"
+
+    restored = restore_draft_revision(d["id"], 1)
+    assert restored["content"] == "初版\n" and restored["title"] == "A"
+    assert len(list_draft_revisions(d["id"])) == 4
+
+    assert delete_draft(d["id"]) is True
+    assert list_draft_revisions(d["id"]) is None
+    assert get_draft_revision(d["id"], 1) is None
+    assert storage.DRAFT_REVISIONS_LOG_FILE.exists()
+
+
+def test_revision_endpoints(temp_data_dir: Path):
+    client = TestClient(create_app())
+    d = client.post("/api/drafts", json={"title": "T", "content": "a\n"}).json()
+    client.put(f"/api/drafts/{d['id']}", json={"content": "a\nb\n"})
+
+    res = client.get(f"/api/drafts/{d['id']}/revisions")
+    assert res.status_code == 200
+    assert [r["revision"] for r in res.json()["revisions"]] == [1, 2]
+    res = client.get(f"/api/drafts/{d['id']}/revisions/1")
+    assert res.json()["content"] == "a\n"
+    assert client.get(f"/api/drafts/{d['id']}/revisions/9").status_code == 404
+    assert client.get("/api/drafts/999/revisions").status_code == 404
+    res = client.post(f"/api/drafts/{d['id']}/revisions/1/restore")
+    assert res.json()["content"] == "a\n"
@@ -0,0 +1,152 @@
+import json
+import threading
+
+import pytest
+
+from app import durable_write, storage
+from app.durable_write import (
+    DURABILITY_FSYNC,
+    DURABILITY_NONE,
+    WriteBehind,
+    atomic_file,
+    parse_durability,
+    write_json,
+)
+
+
+def test_parse_durability_falls_back_to_rename():
+    assert parse_durability("FSYNC") == "fsync"
+    assert parse_durability(None) == "rename"
+    assert parse_durability("bogus") == "rename"
+
+
+@pytest.mark.parametrize("mode", [DURABILITY_NONE, "rename", DURABILITY_FSYNC])
+def test_write_json_modes(tmp_path, mode):
+    path = tmp_path / "sub" / "data.json"
+    write_json(path, {"a": "日本語"}, mode)
+    assert json.loads(path.read_text(encoding="utf-8")) == {"a": "日本語"}
+    assert [p.name for p in path.parent.iterdir()] == ["data.json"]
+
+
+def test_write_json_none_mode_does_not_truncate_in_place(tmp_path):
+    path = tmp_path / "data.json"
+    write_json(path, {"v": 1}, DURABILITY_NONE)
+    ino = path.stat().st_ino
+    with pytest.raises(TypeError):
+        write_json(path, {"v": object()}, DURABILITY_NONE)
+    write_json(path, {"v": 2}, DURABILITY_NONE)
+    # none でも一時ファイルから rename する
+    assert path.stat().st_ino != ino
+    assert json.loads(path.read_text(encoding="utf-8")) == {"v": 2}
+
+
+def test_atomic_file_keeps_old_content_on_error(tmp_path):
+    path = tmp_path / "seg.bin"
+    with atomic_file(path, DURABILITY_FSYNC) as f:
+        f.write(b"old")
+    with pytest.raises(RuntimeError):
+        with atomic_file(path) as f:
+            f.write(b"partial")
+            raise RuntimeError("boom")
+    assert path.read_bytes() == b"old"
+    assert [p.name for p in tmp_path.iterdir()] == ["seg.bin"]
+
+
+def test_write_behind_coalesces_updates(tmp_path):
+    path = tmp_path / "data.json"
+    writer = WriteBehind(delay=60, durability=DURABILITY_FSYNC)
+    for i in range(20):
+        writer.submit(path, {"n": i})
+    # 書き出し前でも最新の内容が読める
+    assert writer.pending(path) == {"n": 19}
+    assert not path.exists()
+    assert writer.flush(timeout=5)
+    assert json.loads(path.read_text(encoding="utf-8")) == {"n": 19}
+    stats = writer.stats()
+    assert stats["submits"] == 20
+    assert stats["writes"] == 1
+    assert writer.pending(path) is None
+    writer.close()
+
+
+def test_concurrent_flush_waits_for_the_other_writer(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    writer = WriteBehind(delay=60)
+    # 書き出しスレッドの無い状態（close 後や atexit）で 2 か所から flush する
+    writer._pending[path] = (0.0, {"x": 1})
+    started, release = threading.Event(), threading.Event()
+    write_bytes = durable_write._write_bytes
+
+    def slow_write(*args):
+        started.set()
+        release.wait(5)
+        write_bytes(*args)
+
+    monkeypatch.setattr(durable_write, "_write_bytes", slow_write)
+    results = []
+    first = threading.Thread(target=lambda: results.append(writer.flush(5)))
+    first.start()
+    assert started.wait(5)
+    second = threading.Thread(target=lambda: results.append(writer.flush(5)))
+    second.start()
+    second.join(0.2)
+    # 先に呼んだ flush の書き出しが終わるまで返らない
+    assert second.is_alive() and results == []
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert results == [True, True]
+    assert json.loads(path.read_text(encoding="utf-8")) == {"x": 1}
+
+
+def test_write_behind_close_writes_remaining(tmp_path):
+    path = tmp_path / "data.json"
+    writer = WriteBehind(delay=60)
+    writer.submit(path, {"x": 1})
+    writer.close()
+    assert json.loads(path.read_text(encoding="utf-8")) == {"x": 1}
+    with pytest.raises(RuntimeError):
+        writer.submit(path, {"x": 2})
+
+
+def test_storage_write_behind_mode(temp_data_dir, monkeypatch):
+    monkeypatch.setenv("BLOGWRITER_WRITE_BEHIND_MS", "60000")
+    monkeypatch.setenv("BLOGWRITER_DURABILITY", "fsync")
+    storage.init_storage()
+    try:
+
+        def save(n: int) -> None:
+            storage.save_generation_history(f"t{n}", "x", [], {}, f"本文{n}")
+
+        threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        # 書き出し前でも同じプロセスからは全件見える
+        assert len(storage.list_generation_history(limit=100)) == 8
+        assert storage.flush_writes(timeout=5)
+        data = json.loads(storage.GENERATION_HISTORY_FILE.read_text("utf-8"))
+        assert len(data["items"]) == 8
+        stats = storage.write_stats()
+        assert stats["durability"] == "fsync"
+        assert stats["writes"] < stats["submits"]
+    finally:
+        monkeypatch.delenv("BLOGWRITER_WRITE_BEHIND_MS")
+        storage.init_storage()
+
+
+def test_fsync_mode_syncs_log_appends(temp_data_dir, monkeypatch):
+    monkeypatch.setenv("BLOGWRITER_DURABILITY", "fsync")
+    storage.init_storage()
+    synced = []
+    monkeypatch.setattr(durable_write, "sync_fd", synced.append)
+    try:
+        draft = storage.create_draft("t", "本文")
+        storage.update_draft(draft["id"], None, "本文2")
+        # drafts.log と draft_revisions.log の追記が返る前に同期される
+        assert len(synced) >= 2
+        assert storage.get_draft(draft["id"])["content"] == "本文2"  # type: ignore
+    finally:
+        monkeypatch.delenv("BLOGWRITER_DURABILITY")
+        storage.init_storage()
@@ -0,0 +1,84 @@
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pytest
+
+import app.storage as storage
+from app.git_committer import GitCommitQueue
+from app.storage import (
+    get_markdown_post_git_status,
+    init_storage,
+    list_markdown_posts,
+    save_markdown_post,
+)
+
+
+def _git_init(path: Path) -> None:
+    for args in (
+        ["init", "-q"],
+        ["config", "user.email", "test@example.com"],
+        ["config", "user.name", "test"],
+    ):
+        subprocess.run(["git", *args], cwd=path, check=True)
+
+
+def _log(path: Path) -> List[str]:
+    out = subprocess.run(
+        ["git", "log", "--format=%s"], cwd=path, capture_output=True, text=True
+    )
+    return out.stdout.splitlines()
+
+
+@pytest.fixture
+def git_queue(temp_data_dir: Path, monkeypatch):
+    _git_init(temp_data_dir)
+    queue = GitCommitQueue(storage._on_git_status, window=0.05, cwd=temp_data_dir)
+    monkeypatch.setattr(storage, "_git_queue", queue)
+    yield queue
+    queue.close()
+
+
+def test_saves_within_window_are_coalesced(tmp_path: Path):
+    _git_init(tmp_path)
+    calls: List[Tuple[List[str], str, Optional[str]]] = []
+    queue = GitCommitQueue(lambda *a: calls.append(a), window=0.2, cwd=tmp_path)
+    for i in range(3):
+        p = tmp_path / f"{i}.md"
+        p.write_text(f"# {i}\n", encoding="utf-8")
+        queue.submit(p, str(i))
+    assert queue.flush(timeout=10)
+    queue.close()
+
+    assert len(calls) == 1
+    assert sorted(calls[0][0]) == ["0.md", "1.md", "2.md"]
+    assert calls[0][1] == "committed"
+    assert _log(tmp_path) == ["Add 3 posts"]
+
+
+def test_post_status_moves_from_pending_to_committed(git_queue, temp_data_dir):
+    info = save_markdown_post("# hello\n本文\n", git_commit=True)
+    assert info["git_status"] == "pending"
+    assert git_queue.flush(timeout=10)
+
+    status = get_markdown_post_git_status(info["filename"])
+    assert status is not None
+    assert status["git_status"] == "committed"
+    assert len(status["git_commit"]) == 40
+    assert list_markdown_posts()[0]["git_status"] == "committed"
+    assert _log(temp_data_dir) == ["Add post: hello"]
+
+
+def test_pending_posts_are_replayed_on_restart(git_queue, monkeypatch, temp_data_dir):
+    class _Dropped:
+        def submit(self, path: Path, title: str) -> None:
+            pass  # プロセスが落ちてコミットされなかった状態を再現
+
+    monkeypatch.setattr(storage, "_git_queue", _Dropped())
+    info = save_markdown_post("# later\n", git_commit=True)
+
+    monkeypatch.setattr(storage, "_git_queue", git_queue)
+    init_storage()
+    assert git_queue.flush(timeout=10)
+    status = get_markdown_post_git_status(info["filename"])
+    assert status is not None and status["git_status"] == "committed"
@@ -0,0 +1,114 @@
+import gzip
+import json
+from pathlib import Path
+
+from app import storage
+from app.history_archive import HistoryArchive
+from app.storage import (
+    delete_generation_history,
+    get_generation_history,
+    list_generation_history,
+    list_generation_history_summaries,
+    save_generation_history,
+)
+
+
+def _item(i: int, month: str) -> dict:
+    return {
+        "id": i,
+        "title": f"t{i}",
+        "template_type": "x",
+        "widgets_used": [],
+        "properties": {},
+        "generated_content": f"本文{i}",
+        "reasoning": "",
+        "created_at": f"{month}-01T00:00:{i:02d}+00:00",
+    }
+
+
+def test_archive_partitions_by_month_and_reads_one_segment(tmp_path: Path):
+    archive = HistoryArchive(tmp_path / "archive")
+    items = [_item(1, "2026-01"), _item(2, "2026-01"), _item(3, "2026-02")]
+    assert archive.append(items) == 3
+    assert archive.append(items[:1]) == 0  # 二重に書かない
+
+    names = sorted(p.name for p in (tmp_path / "archive").glob("*.jsonl.gz"))
+    assert names == ["2026-01-00000001.jsonl.gz", "2026-02-00000003.jsonl.gz"]
+    with gzip.open(tmp_path / "archive" / names[0], "rt", encoding="utf-8") as f:
+        assert [json.loads(x)["id"] for x in f] == [1, 2]
+
+    assert [s["id"] for s in archive.summaries()] == [1, 2, 3]
+    assert archive.summaries()[0]["preview"] == "本文1"
+    # 別セグメントを壊しても ID 指定の取得には影響しない
+    (tmp_path / "archive" / names[0]).write_bytes(b"broken")
+    assert archive.get(3)["generated_content"] == "本文3"
+
+    assert archive.delete(3) is True
+    assert not (tmp_path / "archive" / names[1]).exists()
+    # 読めないセグメントは残りの履歴を失わないよう書き直さない
+    assert archive.delete(2) is True
+    assert (tmp_path / "archive" / names[0]).read_bytes() == b"broken"
+    assert archive.get(3) is None
+    assert HistoryArchive(tmp_path / "archive").stats() == {
+        "segments": 1,
+        "items": 1,
+    }
+
+
+def test_page_starts_at_the_cursor(tmp_path: Path):
+    archive = HistoryArchive(tmp_path / "archive")
+    archive.append([_item(i, "2026-01") for i in range(1, 8)])
+
+    first = archive.page(None, 3)
+    assert [s["id"] for s in first] == [7, 6, 5]
+    cursor = (first[-1]["created_at"], first[-1]["id"])
+    assert [s["id"] for s in archive.page(cursor, 3)] == [4, 3, 2]
+    assert [s["id"] for s in archive.page(("2026-01-01T00:00:02+00:00", 2), 3)] == [1]
+    assert archive.page(("0", 0), 3) == []
+
+
+def test_delete_rewrites_segment_without_the_item(tmp_path: Path):
+    archive = HistoryArchive(tmp_path / "archive")
+    archive.append([_item(i, "2026-01") for i in range(1, 4)])
+    segment = tmp_path / "archive" / "2026-01-00000001.jsonl.gz"
+
+    assert archive.delete(1) is True
+    with gzip.open(segment, "rt", encoding="utf-8") as f:
+        assert [json.loads(x)["id"] for x in f] == [2, 3]
+    assert archive.get(2)["generated_content"] == "本文2"  # type: ignore
+    assert archive.get(1) is None
+
+
+def test_old_history_rolls_into_archive(temp_data_dir: Path, monkeypatch):
+    monkeypatch.setattr(storage, "HISTORY_HOT_LIMIT", 3)
+    monkeypatch.setattr(storage, "HISTORY_ARCHIVE_BATCH", 2)
+    saved = [
+        save_generation_history(f"t{i}", "x", [], {}, f"本文{i}") for i in range(6)
+    ]
+
+    hot = json.loads(storage.GENERATION_HISTORY_FILE.read_text("utf-8"))["items"]
+    assert [it["id"] for it in hot] == [s["id"] for s in saved[3:]]
+    assert list(storage.HISTORY_ARCHIVE_DIR.glob("*.jsonl.gz"))
+
+    first = saved[0]["id"]
+    got = get_generation_history(first)
+    assert got is not None and got["generated_content"] == "本文0"
+    assert [h["id"] for h in list_generation_history(limit=10)] == [
+        s["id"] for s in reversed(saved)
+    ]
+    page = list_generation_history_summaries(limit=10)
+    assert len(page["items"]) == 6
+
+    # アーカイブ済みの履歴も全文検索できる
+    hits = storage.search_documents("本文0", kinds=["history"])["items"]
+    assert [h["id"] for h in hits][:1] == [first]
+
+    assert delete_generation_history(first) is True
+    assert get_generation_history(first) is None
+    assert len(list_generation_history(limit=10)) == 5
+    hits = storage.search_documents("本文0", kinds=["history"])["items"]
+    assert first not in [h["id"] for h in hits]
+    # 削除した本文はセグメントにも残らない
+    for seg in storage.HISTORY_ARCHIVE_DIR.glob("*.jsonl.gz"):
+        with gzip.open(seg, "rt", encoding="utf-8") as f:
+            assert "本文0" not in f.read()
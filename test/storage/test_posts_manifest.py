@@ -0,0 +1,50 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+from app.posts_manifest import PostsManifest
+from app.storage import delete_markdown_post, list_markdown_posts, save_markdown_post
+
+
+def test_listing_uses_manifest_without_reading_files(temp_data_dir: Path):
+    a = save_markdown_post("# 記事A\n本文\n")
+    b = save_markdown_post("# 記事B\n本文\n")
+    with patch.object(PostsManifest, "_scan") as scan:
+        rows = list_markdown_posts(limit=10)
+    scan.assert_not_called()
+    assert {r["filename"] for r in rows} == {a["filename"], b["filename"]}
+    assert {r["title"] for r in rows} == {"記事A", "記事B"}
+    assert all(len(r["sha256"]) == 64 for r in rows)
+
+    delete_markdown_post(a["filename"])
+    assert [r["filename"] for r in list_markdown_posts()] == [b["filename"]]
+    assert (temp_data_dir / "posts_manifest.json").exists()
+
+
+def test_external_changes_are_reconciled(temp_data_dir: Path):
+    posts = temp_data_dir / "posts"
+    kept = save_markdown_post("# keep\n")["filename"]
+    gone = save_markdown_post("# gone\n")["filename"]
+
+    (posts / "external.md").write_text("# 外部\n", encoding="utf-8")
+    os.remove(posts / gone)
+    rows = {r["filename"]: r for r in list_markdown_posts()}
+    assert set(rows) == {kept, "external.md"}
+    assert rows["external.md"]["title"] == "外部"
+
+    # ディレクトリ mtime が変わらない上書き編集も、表示対象は stat で検知する
+    (posts / kept).write_text("# 書き換え後\n本文\n", encoding="utf-8")
+    st = (posts / kept).stat()
+    os.utime(posts / kept, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    rows = {r["filename"]: r for r in list_markdown_posts()}
+    assert rows[kept]["title"] == "書き換え後"
+
+
+def test_limit_returns_newest_first(temp_data_dir: Path):
+    posts = temp_data_dir / "posts"
+    for i in range(5):
+        p = posts / f"p{i}.md"
+        p.write_text(f"# {i}\n", encoding="utf-8")
+        os.utime(p, ns=(0, (1_700_000_000 + i) * 10**9))
+    rows = list_markdown_posts(limit=2)
+    assert [r["filename"] for r in rows] == ["p4.md", "p3.md"]
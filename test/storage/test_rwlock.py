@@ -0,0 +1,65 @@
+import threading
+import time
+from pathlib import Path
+
+import app.storage as storage
+from app.rwlock import RWLock
+from app.storage import get_ai_settings, lock_stats
+
+
+def test_readers_run_concurrently():
+    lock = RWLock("t")
+    inside = threading.Barrier(2, timeout=2)
+
+    def reader():
+        with lock.read():
+            inside.wait()  # 2 つの読み取りが同時に入れなければタイムアウト
+
+    threads = [threading.Thread(target=reader) for _ in range(2)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert lock.stats()["reads"] == 2
+
+
+def test_writer_excludes_readers_and_records_wait():
+    lock = RWLock("t")
+    order = []
+    lock.acquire_write()
+
+    def reader():
+        with lock.read():
+            order.append("read")
+
+    th = threading.Thread(target=reader)
+    th.start()
+    time.sleep(0.05)
+    order.append("write-done")
+    lock.release_write()
+    th.join()
+
+    assert order == ["write-done", "read"]
+    stats = lock.stats()
+    assert stats["max_read_wait"] >= 0.04
+    assert stats["writes"] == 1
+
+
+def test_settings_read_is_not_blocked_by_history_write(temp_data_dir: Path):
+    storage._history_lock.acquire_write()
+    try:
+        done = threading.Event()
+        th = threading.Thread(target=lambda: (get_ai_settings(), done.set()))
+        th.start()
+        assert done.wait(timeout=2)
+        th.join()
+    finally:
+        storage._history_lock.release_write()
+    assert set(lock_stats()) == {
+        "settings",
+        "template_versions",
+        "generation_history",
+        "writing_styles",
+        "posts",
+        "draft_revisions",
+    }
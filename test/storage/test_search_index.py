@@ -0,0 +1,110 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from app import storage
+from app.main import create_app
+from app.search_index import SNIPPET_MAX_MARKS, SearchIndex, make_snippet, tokenize
+
+
+def test_tokenize_japanese_bigrams_and_words():
+    assert tokenize("東京都 Python3") == ["東京", "京都", "python3"]
+    # 全角英数字は NFKC で半角に寄せる
+    assert tokenize("ＡＰＩ") == ["api"]
+    assert tokenize("本") == ["本"]
+
+
+def test_search_requires_all_terms_and_ranks_by_bm25():
+    idx = SearchIndex()
+    idx.add("draft:1", "京都旅行", "京都の寺を巡る旅行記")
+    idx.add("draft:2", "東京散歩", "東京の下町を歩く")
+    idx.add("post:a.md", "旅行メモ", "京都へ行く前の旅行準備")
+
+    keys = [h.key for h in idx.search("京都 旅行")]
+    assert keys[0] == "draft:1"
+    assert set(keys) == {"draft:1", "post:a.md"}
+    assert [h.key for h in idx.search("京都", kinds=["post"])] == ["post:a.md"]
+    assert idx.search("大阪") == []
+
+    idx.remove("draft:1")
+    assert [h.key for h in idx.search("京都 旅行")] == ["post:a.md"]
+    idx.remove_kind("post")
+    assert len(idx) == 1
+
+
+def test_make_snippet_highlights_match():
+    text = "前置き" * 50 + "ここに検索語があります"
+    snippet, marks = make_snippet(text, "検索語", width=40)
+    assert snippet.startswith("…")
+    assert [snippet[a:b] for a, b in marks] == ["検索語"]
+
+
+def test_make_snippet_on_long_text_maps_normalized_matches():
+    # 一致箇所が正規化の塊の境界をまたいでも元の位置で強調する
+    text = "あ" * 1020 + "ＡＰＩ設計" + "い" * 5000
+    snippet, marks = make_snippet(text, "api 設計", width=30)
+    assert [snippet[a:b] for a, b in marks] == ["ＡＰＩ", "設計"]
+
+    dense = "検索" * 500
+    snippet, marks = make_snippet(dense, "検索", width=2000)
+    assert len(marks) == SNIPPET_MAX_MARKS
+    assert all(b <= c for (_, b), (c, _) in zip(marks, marks[1:]))
+
+    assert make_snippet("一致しない本文", "検索", width=4) == ("一致しな…", [])
+
+
+def test_search_documents_tracks_writes(temp_data_dir):
+    d = storage.create_draft("下書き", "全文検索のテスト")
+    storage.save_generation_history("履歴", "t", [], {}, "検索される生成結果")
+    storage.save_markdown_post("# 記事\n\n検索できる記事本文")
+
+    res = storage.search_documents("検索")
+    assert {i["kind"] for i in res["items"]} == {"draft", "post", "history"}
+
+    # 構築後の更新・削除は差分で反映される
+    storage.update_draft(d["id"], "下書き", "内容を変更")
+    res = storage.search_documents("検索", kinds=["draft"])
+    assert res["items"] == []
+    res = storage.search_documents("変更")
+    assert [(i["kind"], i["id"]) for i in res["items"]] == [("draft", d["id"])]
+    assert res["items"][0]["snippet"] == "内容を変更"
+    assert res["items"][0]["highlights"] == [[3, 5]]
+
+
+def test_search_documents_does_not_reload_hits(temp_data_dir, monkeypatch):
+    storage.create_draft("下書き", "再読み込みしない本文")
+    storage.save_generation_history("履歴", "t", [], {}, "再読み込みしない履歴")
+    storage.save_markdown_post("# 記事\n\n再読み込みしない記事")
+    storage.search_documents("再読み込み")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("検索結果ごとに文書を読み直した")
+
+    monkeypatch.setattr(storage, "get_draft", fail)
+    monkeypatch.setattr(storage, "get_generation_history", fail)
+    monkeypatch.setattr(storage, "read_markdown_post", fail)
+    items = storage.search_documents("再読み込み")["items"]
+    assert {i["kind"] for i in items} == {"draft", "post", "history"}
+    assert all(i["highlights"] for i in items)
+
+
+def test_search_documents_detects_external_post(temp_data_dir):
+    assert storage.search_documents("外部")["items"] == []
+    posts = temp_data_dir / "posts"
+    (posts / "external.md").write_text("外部で追加された記事\n", encoding="utf-8")
+    # ディレクトリ mtime の変化で再構築される
+    st = posts.stat()
+    os.utime(posts, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    items = storage.search_documents("外部")["items"]
+    assert [i["id"] for i in items] == ["external.md"]
+
+
+def test_search_api_validates_kinds(temp_data_dir):
+    client = TestClient(create_app())
+    storage.create_draft("API", "検索APIの確認")
+    res = client.get("/api/search", params={"q": "確認", "kinds": "draft"})
+    assert res.status_code == 200
+    assert res.json()["items"][0]["kind"] == "draft"
+    assert (
+        client.get("/api/search", params={"q": "x", "kinds": "bad"}).status_code == 400
+    )
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+from app import settings_cache
+from app.security import encrypt_text
+from app.storage import (
+    decrypt_setting,
+    get_epub_settings,
+    get_mcp_settings,
+    save_epub_settings,
+    save_mcp_settings,
+)
+
+
+def test_reads_are_served_from_snapshot(temp_data_dir: Path):
+    get_epub_settings()
+    with patch("app.settings_cache.json.load") as mock_load:
+        get_epub_settings()
+        get_mcp_settings()
+    mock_load.assert_not_called()
+
+
+def test_save_writes_through_to_cache(temp_data_dir: Path):
+    save_epub_settings(epub_directory="/books", chunk_size=800)
+    with patch("app.settings_cache.json.load") as mock_load:
+        settings = get_epub_settings()
+    mock_load.assert_not_called()
+    assert settings["epub_directory"] == "/books"
+    assert settings["chunk_size"] == 800
+
+
+def test_external_change_is_detected(temp_data_dir: Path):
+    save_mcp_settings({}, enabled=False)
+    path = temp_data_dir / "settings.json"
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["mcp"] = {"servers": {"x": {"name": "X"}}, "enabled": True}
+    tmp = path.with_suffix(".ext")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    tmp.replace(path)
+
+    settings = get_mcp_settings()
+    assert settings["enabled"] is True
+    assert "x" in settings["servers"]
+
+
+def test_returned_settings_do_not_alias_cache(temp_data_dir: Path):
+    save_mcp_settings({"a": {"name": "A"}}, enabled=True)
+    first = get_mcp_settings()
+    first["servers"]["a"]["name"] = "mutated"
+    assert get_mcp_settings()["servers"]["a"]["name"] == "A"
+
+
+def test_decrypt_is_memoized_per_snapshot(temp_data_dir: Path):
+    token = encrypt_text("secret-key", "app-secret")
+    with patch(
+        "app.settings_cache.decrypt_text", wraps=settings_cache.decrypt_text
+    ) as spy:
+        assert decrypt_setting(token, "app-secret") == "secret-key"
+        assert decrypt_setting(token, "app-secret") == "secret-key"
+        assert spy.call_count == 1
+
+        save_epub_settings(epub_directory="/changed")
+        assert decrypt_setting(token, "app-secret") == "secret-key"
+        assert spy.call_count == 2
+
+
+def test_plain_values_are_returned_as_is(temp_data_dir: Path):
+    assert decrypt_setting("plain", "app-secret") == "plain"
+    assert decrypt_setting("", None) == ""
@@ -0,0 +1,162 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+import app.storage as storage
+from app.storage import (
+    create_draft,
+    delete_draft,
+    delete_generation_history,
+    delete_writing_style,
+    diff_template_versions,
+    get_draft,
+    get_generation_history,
+    get_writing_style,
+    init_storage,
+    list_draft_summaries,
+    list_drafts,
+    list_generation_history,
+    list_generation_history_summaries,
+    list_template_versions,
+    list_writing_styles,
+    save_article_template,
+    save_generation_history,
+    save_writing_style,
+    update_draft,
+)
+
+
+@pytest.fixture
+def sqlite_data_dir(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setenv("BLOGWRITER_DATA_DIR", tmpdir)
+        monkeypatch.setenv("BLOGWRITER_STORAGE_BACKEND", "sqlite")
+        init_storage()
+        yield Path(tmpdir)
+        monkeypatch.delenv("BLOGWRITER_STORAGE_BACKEND")
+        init_storage()
+
+
+def _style(name: str) -> dict:
+    return {
+        "name": name,
+        "properties": {"tone": "casual"},
+        "source_text": "src",
+        "description": "desc",
+    }
+
+
+def test_sqlite_backend_uses_wal(sqlite_data_dir: Path):
+    assert storage._sqlite is not None
+    assert storage._sqlite.journal_mode() == "wal"
+    assert (sqlite_data_dir / "blogwriter.db").exists()
+
+
+def test_drafts_crud_on_sqlite(sqlite_data_dir: Path):
+    a = create_draft("A", "本文A")
+    b = create_draft("B", "本文B")
+    update_draft(a["id"], None, "本文A2")
+
+    rows = list_drafts()
+    assert [r["id"] for r in rows] == [a["id"], b["id"]]
+    assert get_draft(a["id"])["content"] == "本文A2"  # type: ignore
+
+    assert delete_draft(b["id"]) is True
+    assert delete_draft(b["id"]) is False
+    assert create_draft("C", "")["id"] == b["id"] + 1
+
+
+def test_history_and_styles_on_sqlite(sqlite_data_dir: Path):
+    h = save_generation_history("t", "note", ["kindle"], {"k": "v"}, "本文", "理由")
+    listed = list_generation_history(10)
+    assert listed[0]["id"] == h["id"]
+    assert listed[0]["content_length"] == len("本文")
+    assert get_generation_history(h["id"])["reasoning"] == "理由"  # type: ignore
+    assert delete_generation_history(h["id"]) is True
+    assert get_generation_history(h["id"]) is None
+
+    save_writing_style("s1", _style("one"))
+    save_writing_style("s2", _style("two"))
+    assert [s["id"] for s in list_writing_styles()] == ["s2", "s1"]
+    assert get_writing_style("s1")["properties"] == {"tone": "casual"}  # type: ignore
+    assert delete_writing_style("s1") is True
+    assert get_writing_style("s1") is None
+
+
+def test_template_versions_on_sqlite(sqlite_data_dir: Path):
+    payload = {
+        "name": "URL",
+        "fields": [{"key": "goal", "label": "目的", "input_type": "text"}],
+        "prompt_template": "v1",
+        "widgets": [],
+    }
+    save_article_template("url", payload)
+    save_article_template("url", payload)
+    save_article_template("url", {**payload, "prompt_template": "v2"})
+    versions = list_template_versions("url")
+    assert len(versions) == 2
+    d = diff_template_versions("url", versions[0]["version"], versions[1]["version"])
+    assert d["changed_keys"] == ["prompt_template"]
+
+
+def test_summaries_on_sqlite(sqlite_data_dir: Path):
+    ids = [create_draft(f"T{i}", f"本文{i}")["id"] for i in range(3)]
+    page = list_draft_summaries(limit=2, preview_chars=2)
+    assert [r["id"] for r in page["items"]] == ids[::-1][:2]
+    assert page["items"][0]["preview"] == "本文"
+    rest = list_draft_summaries(after=page["next_cursor"], limit=2)
+    assert [r["id"] for r in rest["items"]] == [ids[0]]
+
+    h = save_generation_history("t", "note", ["kindle"], {}, "生成本文")
+    items = list_generation_history_summaries(limit=5)["items"]
+    assert items[0]["id"] == h["id"]
+    assert items[0]["content_length"] == 4
+    assert items[0]["widgets_used"] == ["kindle"]
+
+
+def test_history_search_on_sqlite_uses_one_query(sqlite_data_dir: Path):
+    ids = [
+        save_generation_history(f"t{i}", "note", [], {}, f"検索本文{i}")["id"]
+        for i in range(5)
+    ]
+
+    def per_row(history_id: int):
+        raise AssertionError("索引の構築で 1 件ずつ読まない")
+
+    store = storage._sqlite
+    assert store is not None
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(store, "get_generation_history", per_row)
+        storage._refresh_search(("history",))
+    hits = storage.search_documents("検索本文", kinds=["history"])["items"]
+    assert sorted(h["id"] for h in hits) == ids
+
+
+def test_json_data_is_migrated_once(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setenv("BLOGWRITER_DATA_DIR", tmpdir)
+        monkeypatch.delenv("BLOGWRITER_STORAGE_BACKEND", raising=False)
+        init_storage()
+        d1 = create_draft("json", "from json")
+        d2 = create_draft("deleted", "x")
+        delete_draft(d2["id"])
+        h = save_generation_history("t", "note", [], {}, "body")
+        save_writing_style("s", _style("style"))
+
+        monkeypatch.setenv("BLOGWRITER_STORAGE_BACKEND", "sqlite")
+        init_storage()
+        try:
+            assert get_draft(d1["id"])["content"] == "from json"  # type: ignore
+            assert get_generation_history(h["id"]) is not None
+            assert get_writing_style("s") is not None
+            # 採番は JSON 側から引き継がれ、削除済み ID は再利用しない
+            assert create_draft("new", "")["id"] == d2["id"] + 1
+
+            # 二度目の初期化では再取り込みしない
+            delete_draft(d1["id"])
+            init_storage()
+            assert get_draft(d1["id"]) is None
+        finally:
+            monkeypatch.delenv("BLOGWRITER_STORAGE_BACKEND")
+            init_storage()
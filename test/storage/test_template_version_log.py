@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+
+from app.storage import diff_template_versions, save_article_template
+from app.template_versions import TemplateVersionLog
+
+
+def _tpl(prompt: str, widgets=None) -> dict:
+    return {
+        "type": "url",
+        "name": "URL",
+        "description": "説明" * 50,
+        "fields": [{"key": "goal", "label": "目的", "input_type": "text"}],
+        "prompt_template": prompt,
+        "widgets": widgets or [],
+    }
+
+
+def test_saves_append_deltas_between_keyframes(tmp_path: Path):
+    log = TemplateVersionLog(tmp_path / "v.log", keyframe_interval=4)
+    for i in range(6):
+        log.append("url", _tpl(f"p{i}"), f"2024-01-0{i + 1}")
+
+    lines = [json.loads(x) for x in (tmp_path / "v.log").read_text().splitlines()]
+    assert ["key" in r for r in lines] == [True, False, False, False, True, False]
+    assert lines[1]["set"] == {"prompt_template": "p1"}
+
+    assert log.get("url", 3)["data"]["prompt_template"] == "p2"  # type: ignore
+    assert [v["version"] for v in log.list_versions("url")] == [1, 2, 3, 4, 5, 6]
+
+    reopened = TemplateVersionLog(tmp_path / "v.log", keyframe_interval=4)
+    assert reopened.latest("url") == _tpl("p5")
+    pair = reopened.pair("url", 6, 2)
+    assert pair is not None
+    assert pair[0]["prompt_template"] == "p5"
+    assert pair[1]["prompt_template"] == "p1"
+    assert reopened.append("url", _tpl("p6"), "2024-01-07") == 7
+
+
+def test_legacy_json_is_imported(tmp_path: Path):
+    legacy = tmp_path / "template_versions.json"
+    legacy.write_text(
+        json.dumps(
+            {
+                "next_id": 9,
+                "items": {
+                    "url": [
+                        {"version": 3, "created_at": "a", "data": _tpl("x")},
+                        {"version": 5, "created_at": "b", "data": _tpl("y")},
+                    ]
+                },
+            }
+        ),
+        encoding="utf-8",
+    )
+    log = TemplateVersionLog(tmp_path / "v.log", legacy_path=legacy)
+    assert log.get("url", 5)["data"]["prompt_template"] == "y"  # type: ignore
+    assert log.append("note", _tpl("n"), "c") == 9
+    assert log.export()["items"]["url"][0]["data"] == _tpl("x")
+
+
+def test_diff_across_keyframes_via_storage(temp_data_dir: Path):
+    payload = {k: v for k, v in _tpl("v0").items() if k != "type"}
+    for i in range(20):
+        save_article_template("url", {**payload, "prompt_template": f"v{i}"})
+    save_article_template("url", {**payload, "prompt_template": "v19", "mode": "plan"})
+
+    d = diff_template_versions("url", 1, 20)
+    assert d["changed_keys"] == ["prompt_template"]
+    assert d["diff"]["prompt_template"] == {"from": "v0", "to": "v19"}
+    assert (temp_data_dir / "template_versions.log").exists()
+    assert not (temp_data_dir / "template_versions.json").exists()
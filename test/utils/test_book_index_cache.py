@@ -0,0 +1,82 @@
+"""書籍インデックスの LRU キャッシュのテスト"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+from app.book_index_cache import BookIndexCache
+from app.rag_util import RAGManager
+
+from ..helpers.vectors import write_book_index
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _write_book(cache_dir: Path, name: str, vectors) -> Path:
+    return write_book_index(cache_dir, name, vectors, MODEL, dtype="float32")
+
+
+def test_repeated_search_is_served_from_cache(tmp_path: Path):
+    _write_book(tmp_path, "A", [[1.0, 0.0], [0.0, 1.0]])
+    rag = RAGManager(tmp_path)
+    with patch.object(rag.embedding_manager, "encode_texts", return_value=[[1, 0]]):
+        first = rag.search_in_book("A", "q", top_k=1)
+        with patch("app.vector_store.read_index") as mock_read:
+            second = rag.search_in_book("A", "q", top_k=1)
+    mock_read.assert_not_called()
+    assert first == second == [("A-0", {"text": "A-0"}, 1.0)]
+    stats = rag.index_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_reindexed_book_is_reloaded(tmp_path: Path):
+    path = _write_book(tmp_path, "A", [[1.0, 0.0]])
+    rag = RAGManager(tmp_path)
+    assert rag.load_book_index("A") is True
+    _write_book(tmp_path, "A", [[0.0, 1.0], [1.0, 0.0]])
+    os.utime(path, ns=(1, 1))
+    with patch.object(rag.embedding_manager, "encode_texts", return_value=[[0, 1]]):
+        results = rag.search_in_book("A", "q", top_k=1)
+    assert results[0][0] == "A-0"
+    assert rag.index_cache.stats()["misses"] == 2
+
+
+def test_eviction_by_bytes(tmp_path: Path):
+    # float32 × 2 次元 × 4 行 = 32 バイト / 冊
+    for name in ("A", "B", "C"):
+        _write_book(tmp_path, name, [[1.0, 0.0]] * 4)
+    rag = RAGManager(tmp_path, index_cache_bytes=70)
+    for name in ("A", "B", "A", "C"):
+        assert rag.load_book_index(name) is True
+    stats = rag.index_cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 64
+    assert stats["evictions"] == 1
+    # B が最も長く使われていないため追い出されている
+    assert rag.load_book_index("A") is True
+    assert rag.index_cache.stats()["hits"] == 2
+
+
+def test_concurrent_searches_on_different_books(tmp_path: Path):
+    _write_book(tmp_path, "A", [[1.0, 0.0]])
+    _write_book(tmp_path, "B", [[0.0, 1.0]])
+    rag = RAGManager(tmp_path)
+    with patch.object(rag.embedding_manager, "encode_texts", return_value=[[1, 1]]):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(
+                pool.map(
+                    lambda name: rag.search_in_book(name, "q", 1, 0.0),
+                    ["A", "B"] * 20,
+                )
+            )
+    for name, result in zip(["A", "B"] * 20, results):
+        assert result[0][0] == f"{name}-0"
+
+
+def test_oversized_entry_is_not_cached(tmp_path: Path):
+    path = _write_book(tmp_path, "A", [[1.0, 0.0]] * 4)
+    cache = BookIndexCache(max_bytes=8)
+    rag = RAGManager(tmp_path)
+    assert cache.get("A", path, rag._load_manager) is not None
+    assert cache.stats()["entries"] == 0
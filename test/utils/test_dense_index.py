@@ -0,0 +1,40 @@
+"""内積による top-k 検索のテスト"""
+
+import numpy as np
+
+from app.dense_index import DenseIndex, top_k_indices
+
+from ..helpers.vectors import normalized_rows
+
+
+def test_matches_exhaustive_sort_across_blocks():
+    rng = np.random.default_rng(0)
+    matrix = normalized_rows(rng, 1000)
+    queries = normalized_rows(rng, 7)
+    index = DenseIndex(matrix, block_rows=128)
+
+    scores, indices = index.search_batch(queries, 10)
+    expected = np.argsort(-(queries @ matrix.T), axis=1)[:, :10]
+    assert indices.shape == (7, 10)
+    np.testing.assert_array_equal(indices, expected)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+    single_scores, single_indices = index.search(queries[3], 10)
+    np.testing.assert_array_equal(single_indices, expected[3])
+    np.testing.assert_allclose(single_scores, scores[3], rtol=1e-5)
+
+
+def test_k_larger_than_rows_and_float16_matrix():
+    rng = np.random.default_rng(1)
+    matrix = normalized_rows(rng, 5).astype(np.float16)
+    index = DenseIndex(matrix)
+    scores, indices = index.search(matrix[2], 50)
+    assert len(indices) == 5
+    assert indices[0] == 2
+    assert abs(scores[0] - 1.0) < 1e-2
+
+
+def test_top_k_indices():
+    scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+    assert top_k_indices(scores, 2).tolist() == [1, 3]
+    assert top_k_indices(scores, 0).tolist() == []
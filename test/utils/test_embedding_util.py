@@ -1,9 +1,11 @@
 """Embedding機能の追加テスト"""
 
+import pickle
 import tempfile
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 
 from app.embedding_util import EmbeddingManager
@@ -116,3 +118,53 @@ def test_load_nonexistent_index():
     result = manager.load_index(Path("/nonexistent/path"))
 
     assert result is False
+
+
+def _built_manager(vectors, texts, metadata):
+    manager = EmbeddingManager("test-model")
+    with patch.object(manager, "encode_texts", return_value=np.array(vectors)):
+        manager.build_index(texts, metadata)
+    return manager
+
+
+def test_saved_index_is_memory_mapped(tmp_path: Path):
+    """保存形式は mmap できる float16 行列 + 行単位メタデータ"""
+    texts = ["りんご", "みかん", "ぶどう"]
+    metadata = [{"text": t, "book_title": "果物"} for t in texts[:2]] + [{"id": "3"}]
+    manager = _built_manager([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]], texts, metadata)
+    index_path = tmp_path / "果物.index"
+    manager.save_index(index_path)
+
+    loaded = EmbeddingManager("other-model")
+    assert loaded.load_index(index_path) is True
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert loaded.embeddings.dtype == np.float16
+    assert loaded.model_name == "test-model"
+    assert list(loaded.texts) == texts
+    assert list(loaded.metadata) == metadata
+
+    with patch.object(loaded, "encode_texts", return_value=np.array([[0.0, 1.0]])):
+        results = loaded.search("クエリ", top_k=2, min_score=0.0)
+    assert [r[0] for r in results] == ["みかん", "ぶどう"]
+    assert results[0][2] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_load_legacy_pickle_index(tmp_path: Path):
+    """旧形式（pickle）のインデックスも読み込める"""
+    manager = _built_manager([[1.0, 0.0], [0.0, 1.0]], ["a", "b"], None)
+    legacy = tmp_path / "old.index"
+    with open(legacy, "wb") as f:
+        pickle.dump(
+            {
+                "texts": manager.texts,
+                "metadata": manager.metadata,
+                "model_name": "test-model",
+                "embeddings": manager.embeddings,
+                "index": manager.index,
+            },
+            f,
+        )
+    loaded = EmbeddingManager("test-model")
+    assert loaded.load_index(legacy) is True
+    assert loaded.index is not None
+    assert list(loaded.texts) == ["a", "b"]
@@ -0,0 +1,95 @@
+"""EPUB 取り込みパイプラインのテスト"""
+
+import math
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from ebooklib import epub
+
+from app.epub_ingest import IngestPipeline, ParsedBook, parse_book
+
+
+def _write_epub(path: Path, title: str, paragraphs: List[str]) -> None:
+    book = epub.EpubBook()
+    book.set_identifier(title)
+    book.set_title(title)
+    book.set_language("ja")
+    chapter = epub.EpubHtml(title="章", file_name="c1.xhtml", lang="ja")
+    chapter.content = "<html><body>%s</body></html>" % "".join(
+        f"<p>{p}</p>" for p in paragraphs
+    )
+    book.add_item(chapter)
+    book.toc = (chapter,)
+    book.spine = [chapter]
+    book.add_item(epub.EpubNcx())
+    epub.write_epub(str(path), book)
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    return np.ones((len(texts), 4), dtype=np.float32) / 2
+
+
+def test_process_pool_parses_and_batches_across_books(tmp_path: Path):
+    paths = []
+    for n in range(3):
+        path = tmp_path / f"book{n}.epub"
+        _write_epub(path, f"本{n}", ["あ" * 90 + "。"] * (n + 2))
+        paths.append(path)
+    paths.append(tmp_path / "broken.epub")
+    (tmp_path / "broken.epub").write_bytes(b"not an epub")
+
+    batches: List[int] = []
+
+    def encode(texts: List[str]) -> np.ndarray:
+        batches.append(len(texts))
+        return _encode(texts)
+
+    saved: Dict[str, int] = {}
+    failed: List[Path] = []
+
+    def finish(book: ParsedBook, matrix: Optional[np.ndarray], embedded: int):
+        assert matrix is not None and matrix.shape == (len(book.chunks), 4)
+        saved[book.book_title] = embedded
+
+    stats = IngestPipeline(encode, workers=2, batch_size=4).run(
+        paths,
+        partial(parse_book, chunk_size=100, overlap=0),
+        lambda book: (None, list(range(len(book.chunks)))),
+        finish,
+        lambda path, _: failed.append(path),
+    )
+
+    assert sorted(saved) == ["本0", "本1", "本2"]
+    assert failed == [tmp_path / "broken.epub"]
+    assert stats.books == 3 and stats.failed == 1
+    assert stats.chunks == stats.encoded_chunks == sum(saved.values())
+    # 書籍の境目に関係なく batch_size ずつ埋め込む
+    assert stats.batches == math.ceil(stats.encoded_chunks / 4) == len(batches)
+    assert all(size == 4 for size in batches[:-1])
+    assert stats.chunks_per_sec > 0
+
+
+def test_reused_rows_skip_the_encoder_and_encoder_errors_fail_the_book():
+    books = {
+        Path(name): ParsedBook(Path(name), name, ["x", "y"], [{}, {}])
+        for name in ("a", "b")
+    }
+    reused = np.zeros((2, 4), dtype=np.float32)
+
+    def encode(texts: List[str]) -> np.ndarray:
+        raise RuntimeError("model unavailable")
+
+    finished: List[str] = []
+    failed: List[Path] = []
+    stats = IngestPipeline(encode, workers=0, batch_size=8).run(
+        list(books),
+        books.__getitem__,
+        lambda book: (reused, []) if book.book_title == "a" else (None, [0, 1]),
+        lambda book, matrix, embedded: finished.append(book.book_title),
+        lambda path, _: failed.append(path),
+    )
+    assert finished == ["a"]
+    assert failed == [Path("b")]
+    assert stats.encoded_chunks == 0 and stats.failed == 1
@@ -0,0 +1,75 @@
+"""EPUB の差分再インデックスのテスト"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+from unittest.mock import patch
+
+import numpy as np
+
+from app import vector_store
+from app.embedding_util import EmbeddingManager
+from app.rag_util import RAGManager
+
+
+def _fake_extract(epub_path: Path) -> Tuple[str, Dict[str, str]]:
+    # 1 行を 1 章とみなす
+    lines = epub_path.read_text(encoding="utf-8").splitlines()
+    return epub_path.stem, {f"章{i}": line for i, line in enumerate(lines)}
+
+
+def _fake_encode(self: EmbeddingManager, texts: List[str]) -> np.ndarray:
+    out = []
+    for text in texts:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+        v = np.random.default_rng(seed).standard_normal(8)
+        out.append(v / np.linalg.norm(v))
+    return np.array(out, dtype=np.float32)
+
+
+def test_reindex_skips_unchanged_and_embeds_changed_chunks(tmp_path: Path):
+    books = tmp_path / "books"
+    books.mkdir()
+    (books / "a.epub").write_text("一章\n二章\n", encoding="utf-8")
+    (books / "b.epub").write_text("三章\n四章\n五章\n", encoding="utf-8")
+    # 解析をモックするため同じプロセスで解析する
+    rag_manager = RAGManager(tmp_path / "cache", ingest_workers=1)
+
+    with (
+        patch("app.rag_util.extract_text_from_epub", side_effect=_fake_extract),
+        patch.object(
+            EmbeddingManager, "encode_texts", autospec=True, side_effect=_fake_encode
+        ) as encode,
+    ):
+        first = rag_manager.update_directory_index(books)
+        assert sorted(first.indexed) == ["a", "b"]
+        assert first.embedded_chunks == 5 and first.reused_chunks == 0
+
+        # 内容が同じなら mtime が変わっても読み直さない
+        encode.reset_mock()
+        os.utime(books / "a.epub", ns=(1, 1))
+        second = rag_manager.update_directory_index(books)
+        assert sorted(second.unchanged) == ["a", "b"] and second.indexed == []
+        encode.assert_not_called()
+
+        # 変わった章だけを埋め込み直す
+        (books / "b.epub").write_text("三章\n改訂した四章\n五章\n", encoding="utf-8")
+        third = rag_manager.update_directory_index(books)
+        assert third.indexed == ["b"] and third.unchanged == ["a"]
+        assert third.embedded_chunks == 1 and third.reused_chunks == 2
+        stored = vector_store.read_index(rag_manager.cache_dir / "b.index")
+        assert stored is not None
+        assert list(stored.texts) == ["三章", "改訂した四章", "五章"]
+        np.testing.assert_allclose(
+            stored.embeddings.astype(np.float32),
+            _fake_encode(EmbeddingManager(), list(stored.texts)),
+            atol=1e-3,
+        )
+
+        # ディレクトリから消えたファイルの書籍は削除する
+        (books / "a.epub").unlink()
+        fourth = rag_manager.update_directory_index(books)
+    assert fourth.removed == ["a"]
+    assert rag_manager.get_available_books() == ["b"]
+    assert list(rag_manager.manifest.files) == [str(books / "b.epub")]
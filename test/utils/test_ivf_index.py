@@ -0,0 +1,91 @@
+"""IVF による近似検索のテスト"""
+
+from pathlib import Path
+
+import numpy as np
+
+from app import vector_store
+from app.dense_index import DenseIndex
+from app.embedding_util import EmbeddingManager
+from app.ivf_index import MIN_TRAIN_ROWS, IVFIndex
+from app.library_index import LibraryIndex
+
+
+def _clustered(rng: np.random.Generator, n: int, dim: int = 16) -> np.ndarray:
+    centers = rng.standard_normal((32, dim)).astype(np.float32)
+    x = centers[rng.integers(0, 32, n)] + 0.3 * rng.standard_normal((n, dim))
+    x = x.astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_all_probes_match_exact_search():
+    rng = np.random.default_rng(0)
+    matrix = _clustered(rng, 2000)
+    index = IVFIndex.train(matrix, nlist=20, nprobe=4)
+    queries = matrix[:5]
+
+    _, exact = DenseIndex(matrix).search_batch(queries, 10)
+    _, found = index.search_batch(queries, 10, nprobe=index.nlist)
+    np.testing.assert_array_equal(found, exact)
+
+    # 調べるクラスタを減らすと走査する行も減る
+    assert len(index.candidates(queries[0], 1)) < len(matrix)
+    report = index.recall_report(queries, k=10, nprobes=(1, 20))
+    assert [r["nprobe"] for r in report] == [1, 20]
+    assert report[-1]["recall"] == 1.0
+    assert report[-1]["scanned_fraction"] == 1.0
+
+
+def test_manager_persists_ivf(tmp_path: Path):
+    rng = np.random.default_rng(1)
+    matrix = _clustered(rng, MIN_TRAIN_ROWS)
+    manager = EmbeddingManager("m", ann="ivf")
+    manager.texts = [f"t{i}" for i in range(len(matrix))]
+    manager.metadata = [{"text": t} for t in manager.texts]
+    manager.embeddings = matrix
+    manager.index = manager._make_index(matrix)
+    assert isinstance(manager.index, IVFIndex)
+    path = tmp_path / "book.index"
+    manager.save_index(path)
+
+    loaded = EmbeddingManager("m", ann="ivf", nprobe=3)
+    assert loaded.load_index(path)
+    assert isinstance(loaded.index, IVFIndex)
+    assert loaded.index.nprobe == 3
+    hits = loaded.search_by_vector(matrix[7], top_k=1, min_score=0.5)
+    assert hits[0][0] == "t7"
+
+    # 近似検索を無効にすると同じファイルを IVF なしで使う
+    exact = EmbeddingManager("m")
+    assert exact.load_index(path)
+    assert not isinstance(exact.index, IVFIndex)
+
+    vector_store.remove_index(path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_library_assigns_added_books_without_retraining(tmp_path: Path):
+    rng = np.random.default_rng(2)
+    library = LibraryIndex(tmp_path / "library", "m", ann="ivf", nprobe=4)
+    big = _clustered(rng, MIN_TRAIN_ROWS)
+    paths = {}
+    for name, vectors in (("A", big), ("B", _clustered(rng, 10))):
+        paths[name] = tmp_path / f"{name}.index"
+        texts = [f"{name}-{i}" for i in range(len(vectors))]
+        vector_store.write_index(
+            paths[name], vectors, texts, [{"text": t} for t in texts], "m"
+        )
+        library.sync(dict(paths))
+
+    state = library._state["ivf"]
+    assert state["rows"] == MIN_TRAIN_ROWS + 10
+    assert state["trained_rows"] == MIN_TRAIN_ROWS
+
+    hits = library.search(big[5], top_k=1, min_score=0.5)
+    assert hits["A"][0][0] == 5
+    only_b = library.search(big[5], top_k=3, min_score=-1.0, books=["B"])
+    assert set(only_b) <= {"B"}
+
+    report = library.recall_report(k=5, samples=20)
+    assert report is not None
+    assert report["rows"] == MIN_TRAIN_ROWS + 10
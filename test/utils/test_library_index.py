@@ -0,0 +1,105 @@
+"""全書籍の埋め込み行列のテスト"""
+
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from app import vector_store
+from app.library_index import LibraryIndex, QuantizedIndex
+
+from ..helpers.vectors import write_book_index
+
+
+def test_search_across_books_with_filter(tmp_path: Path):
+    library = LibraryIndex(tmp_path / "library", "m")
+    a = write_book_index(tmp_path, "A", [[1.0, 0.0], [0.0, 1.0]])
+    b = write_book_index(tmp_path, "B", [[0.8, 0.6]])
+    library.sync({"A": a, "B": b})
+
+    hits = library.search(np.array([1.0, 0.0]), top_k=1, min_score=0.5)
+    assert hits == {"A": [(0, 1.0)], "B": [(0, hits["B"][0][1])]}
+    assert abs(hits["B"][0][1] - 0.8) < 1e-3
+    assert library.row("B", 0) == ("B-0", {"text": "B-0"})
+
+    only_b = library.search(np.array([1.0, 0.0]), top_k=5, min_score=0.0, books=["B"])
+    assert list(only_b) == ["B"]
+
+
+def test_reindex_and_remove_are_incremental(tmp_path: Path):
+    library = LibraryIndex(tmp_path / "library", "m")
+    a = write_book_index(tmp_path, "A", [[1.0, 0.0]] * 3)
+    b = write_book_index(tmp_path, "B", [[0.0, 1.0]])
+    library.sync({"A": a, "B": b})
+    assert library.stats()["rows"] == 4
+
+    # 再インデックスは追記し、古い行は詰め直しで消える
+    write_book_index(tmp_path, "A", [[0.0, 1.0]])
+    library.sync({"A": a, "B": b})
+    assert library.stats() == {"books": 2, "rows": 2, "live_rows": 2, "dim": 2}
+
+    assert library.remove_book("B") is True
+    assert library.books() == ["A"]
+    assert library.search(np.array([0.0, 1.0]), top_k=5, min_score=0.5) == {
+        "A": [(0, 1.0)]
+    }
+
+    # 別プロセス（別インスタンス）からも同じ状態が見える
+    other = LibraryIndex(tmp_path / "library", "m")
+    assert other.books() == ["A"]
+
+
+def test_other_model_books_are_excluded(tmp_path: Path):
+    library = LibraryIndex(tmp_path / "library", "m")
+    path = write_book_index(tmp_path, "X", [[1.0, 0.0]], model="other")
+    assert library.add_book("X", path) is False
+    assert library.books() == []
+
+
+def _open_meta_files(root: Path) -> list:
+    # 他のテストが開いたままの書籍は数えない
+    names = []
+    for fd in Path("/proc/self/fd").iterdir():
+        try:
+            target = str(fd.readlink())
+        except OSError:
+            continue
+        if target.startswith(str(root)) and ".meta.jsonl" in target:
+            names.append(target)
+    return names
+
+
+def test_sync_does_not_keep_meta_files_open(tmp_path: Path):
+    library = LibraryIndex(tmp_path / "library", "m")
+    a = write_book_index(tmp_path, "A", [[1.0, 0.0], [0.0, 1.0]])
+    library.sync({"A": a})
+    write_book_index(tmp_path, "A", [[0.0, 1.0]])
+    library.sync({"A": a})
+    assert _open_meta_files(tmp_path) == []
+
+    stored = vector_store.read_index(a)
+    assert stored is not None
+    with stored:
+        assert list(stored.texts) == ["A-0"]
+        assert len(_open_meta_files(tmp_path)) == 1
+    assert _open_meta_files(tmp_path) == []
+    np.testing.assert_allclose(stored.embeddings, [[0.0, 1.0]], atol=1e-3)
+
+
+def test_all_books_are_searched_without_copying_codes(tmp_path: Path):
+    library = LibraryIndex(tmp_path / "library", "m")
+    a = write_book_index(tmp_path, "A", [[1.0, 0.0], [0.0, 1.0]])
+    b = write_book_index(tmp_path, "B", [[0.8, 0.6]])
+    library.sync({"A": a, "B": b})
+    query = np.array([1.0, 0.0])
+
+    with patch("app.library_index.QuantizedIndex", wraps=QuantizedIndex) as index:
+        unfiltered = library.search(query, top_k=1, min_score=0.0)
+        assert index.call_count == 1
+        # 全書籍を列挙しても絞り込みの複製は作らない
+        assert library.search(query, top_k=1, min_score=0.0, books=["A", "B"]) == (
+            unfiltered
+        )
+        assert index.call_count == 2
+        assert list(library.search(query, top_k=1, min_score=0.0, books=["B"])) == ["B"]
+        assert index.call_count == 4
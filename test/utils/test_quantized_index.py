@@ -0,0 +1,36 @@
+"""int8 に量子化した埋め込みによる検索のテスト"""
+
+import numpy as np
+
+from app.dense_index import DenseIndex
+from app.quantized_index import QuantizedIndex, quantize_int8
+
+from ..helpers.vectors import normalized_rows
+
+DIM = 32
+
+
+def test_quantize_roundtrip_error_is_small():
+    rng = np.random.default_rng(0)
+    matrix = normalized_rows(rng, 300, DIM)
+    codes, scales = quantize_int8(matrix)
+    assert codes.dtype == np.int8 and scales.shape == (300,)
+    restored = codes.astype(np.float32) * scales[:, None]
+    assert np.abs(restored - matrix).max() <= scales.max() / 2 + 1e-6
+
+    empty_codes, empty_scales = quantize_int8(np.zeros((0, 4), dtype=np.float32))
+    assert empty_codes.shape == (0, 4) and len(empty_scales) == 0
+
+
+def test_reranked_search_matches_exact_scores():
+    rng = np.random.default_rng(1)
+    matrix = normalized_rows(rng, 5000, DIM).astype(np.float16)
+    queries = normalized_rows(rng, 6, DIM)
+    index = QuantizedIndex(matrix, *quantize_int8(matrix), block_rows=1000)
+
+    exact_scores, exact = DenseIndex(matrix).search_batch(queries, 5)
+    scores, found = index.search_batch(queries, 5)
+    np.testing.assert_array_equal(found, exact)
+    # 並べ直しの後のスコアは元の行列での厳密な値
+    np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+    assert index.nbytes < matrix.nbytes
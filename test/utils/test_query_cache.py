@@ -0,0 +1,56 @@
+"""クエリ埋め込みキャッシュのテスト"""
+
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.query_cache import QueryEmbeddingCache, normalize_query
+from app.rag_util import RAGManager
+
+
+def test_normalized_queries_share_an_entry_per_model():
+    cache = QueryEmbeddingCache(max_entries=2)
+    calls = []
+
+    def encode(text: str):
+        calls.append(text)
+        return [[1.0, 0.0]]
+
+    first = cache.get("m", "  ＡＩ   の\n未来 ", encode)
+    assert cache.get("m", "AI の 未来", encode) is first
+    assert calls == ["AI の 未来"]
+    assert first.dtype == np.float32 and first.shape == (1, 2)
+    with pytest.raises(ValueError):
+        first[0, 0] = 0.0
+
+    # モデルが違えば別の埋め込み
+    cache.get("other", "AI の 未来", encode)
+    cache.get("m", "別のクエリ", encode)
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["hits"] == 1 and stats["misses"] == 3
+    assert stats["evictions"] == 1
+    assert stats["hit_rate"] == 0.25
+
+
+def test_normalize_query_keeps_case():
+    assert normalize_query(" Deep\tLearning ") == "Deep Learning"
+
+
+def test_repeated_search_encodes_query_once(tmp_path: Path):
+    rag_manager = RAGManager(tmp_path)
+    manager = rag_manager.embedding_manager
+    with patch.object(manager, "encode_texts", return_value=[[1.0, 0.0]]):
+        manager.build_index(["本文"], [{"book_title": "本", "text": "本文"}])
+    manager.save_index(tmp_path / "本.index")
+
+    with patch.object(
+        manager, "encode_texts", return_value=[[1.0, 0.0]]
+    ) as encode_texts:
+        first = rag_manager.search_all_books("クエリ")
+        assert rag_manager.search_all_books(" クエリ ") == first
+        assert rag_manager.search_in_book("本", "クエリ") == first["本"]
+    assert encode_texts.call_count == 1
+    assert rag_manager.query_cache.stats()["hits"] == 2
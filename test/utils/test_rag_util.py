@@ -3,6 +3,9 @@
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+import numpy as np
+
+from app.epub_ingest import ParsedBook
 from app.rag_util import RAGManager
 
 
@@ -126,3 +129,58 @@ def test_search_all_books_empty():
     results = rag_manager.search_all_books("テストクエリ")
 
     assert results == {}
+
+
+def test_saved_book_index_is_discovered(tmp_path: Path):
+    """保存した書籍インデックスを一覧・検索・削除できる"""
+    rag_manager = RAGManager(tmp_path)
+    manager = rag_manager.embedding_manager
+    with patch.object(manager, "encode_texts", return_value=[[1.0, 0.0]]):
+        manager.build_index(["本文"], [{"book_title": "本", "text": "本文"}])
+    manager.save_index(tmp_path / "本.index")
+
+    assert rag_manager.get_available_books() == ["本"]
+    with patch.object(manager, "encode_texts", return_value=[[1.0, 0.0]]):
+        results = rag_manager.search_all_books("クエリ")
+    assert results["本"][0][0] == "本文"
+
+    assert rag_manager.delete_book_index("本") is True
+    assert [p.name for p in tmp_path.iterdir() if p.name != "library"] == []
+    assert rag_manager.library.books() == []
+
+
+def test_search_does_not_resync_library(tmp_path: Path):
+    """全書籍検索ではキャッシュディレクトリとの突き合わせをしない"""
+    rag_manager = RAGManager(tmp_path)
+    with patch.object(rag_manager.library, "sync") as sync:
+        rag_manager.search_all_books("クエリ")
+        rag_manager.search_all_books("クエリ")
+    sync.assert_not_called()
+
+
+def test_library_is_synced_on_start(tmp_path: Path):
+    """起動前に保存された書籍は起動時に全書籍の行列へ入る"""
+    manager = RAGManager(tmp_path).embedding_manager
+    with patch.object(manager, "encode_texts", return_value=[[1.0, 0.0]]):
+        manager.build_index(["本文"], [{"book_title": "本", "text": "本文"}])
+    manager.save_index(tmp_path / "本.index")
+
+    assert RAGManager(tmp_path).library.books() == ["本"]
+
+
+def test_unfiltered_search_does_not_restrict_library(tmp_path: Path):
+    """書籍を指定しない全書籍検索は絞り込みなしで行列を検索する"""
+    rag_manager = RAGManager(tmp_path)
+    book = ParsedBook(tmp_path / "本.epub", "本", ["本文"], [{"text": "本文"}])
+    rag_manager._save_book(book, np.array([[1.0, 0.0]], dtype=np.float32), 1)
+    manager = rag_manager.embedding_manager
+    with (
+        patch.object(manager, "encode_texts", return_value=[[1.0, 0.0]]),
+        patch.object(
+            rag_manager.library, "search", wraps=rag_manager.library.search
+        ) as search,
+    ):
+        assert rag_manager.search_all_books("クエリ")["本"][0][0] == "本文"
+        assert search.call_args.args[3] is None
+        assert rag_manager.search_all_books("クエリ", books=["本"])["本"]
+        assert search.call_args.args[3] == ["本"]
@@ -7,12 +7,13 @@ type GenerationHistoryItem = {
 	title: string
 	template_type: string
 	widgets_used: string[]
-	properties: Record<string, string>
 	created_at: string
 	content_length: number
+	preview: string
 }
 
-type GenerationHistoryDetail = GenerationHistoryItem & {
+type GenerationHistoryDetail = Omit<GenerationHistoryItem, 'preview'> & {
+	properties: Record<string, string>
 	generated_content: string
 	reasoning: string
 }
@@ -27,6 +28,7 @@ export default function GenerationHistoryWidget({
 	onLoadHistory,
 }: GenerationHistoryWidgetProps) {
 	const [history, setHistory] = useState<GenerationHistoryItem[]>([])
+	const [nextCursor, setNextCursor] = useState<string | null>(null)
 	const [selectedHistory, setSelectedHistory] = useState<GenerationHistoryDetail | null>(null)
 	const [loading, setLoading] = useState(false)
 	const [showDetail, setShowDetail] = useState(false)
@@ -35,13 +37,20 @@ export default function GenerationHistoryWidget({
 		loadHistory()
 	}, [])
 
-	const loadHistory = async () => {
+	// 一覧は本文を含まない要約 API からカーソルで取得する
+	const loadHistory = async (after?: string) => {
 		try {
 			setLoading(true)
-			const response = await fetch(`${API_BASE}/api/generation-history`)
+			const params = new URLSearchParams({ limit: '20' })
+			if (after) params.set('after', after)
+			const response = await fetch(
+				`${API_BASE}/api/generation-history/summaries?${params.toString()}`
+			)
 			if (response.ok) {
 				const data = await response.json()
-				setHistory(data.history || [])
+				const items: GenerationHistoryItem[] = data.items || []
+				setHistory(prev => (after ? [...prev, ...items] : items))
+				setNextCursor(data.next_cursor || null)
 			}
 		} catch (error) {
 			console.error('Failed to load generation history:', error)
@@ -198,7 +207,7 @@ export default function GenerationHistoryWidget({
 			<div className="flex justify-between items-center">
 				<strong>生成履歴</strong>
 				<button
-					onClick={loadHistory}
+					onClick={() => loadHistory()}
 					disabled={loading}
 					className="text-sm text-blue-500"
 				>
@@ -244,6 +253,15 @@ export default function GenerationHistoryWidget({
 								</div>
 							</div>
 						))}
+						{nextCursor && (
+							<button
+								onClick={() => loadHistory(nextCursor)}
+								disabled={loading}
+								className="text-sm text-blue-500"
+							>
+								{loading ? '読み込み中...' : 'さらに読み込む'}
+							</button>
+						)}
 					</div>
 				)}
 			</div>
@@ -488,7 +488,8 @@ export default function Page() {
 		})
 		if (res.ok) {
 			const json = await res.json()
-			alert(`保存しました\n${json.filename}`)
+			const gitNote = json.git_status === 'pending' ? '\n（git コミットはバックグラウンドで実行されます）' : ''
+			alert(`保存しました\n${json.filename}${gitNote}`)
 		} else {
 			alert('保存に失敗しました')
 		}
@@ -26,6 +26,9 @@ export default function SettingsPage() {
 	const [epubDir, setEpubDir] = useState('')
 	const [epubDirInput, setEpubDirInput] = useState('')
 	const [epubSaving, setEpubSaving] = useState(false)
+	// 近似検索（IVF）の設定
+	const [annIndex, setAnnIndex] = useState<'none' | 'ivf'>('none')
+	const [annNprobe, setAnnNprobe] = useState<number>(8)
 
 	// Directory picker modal states
 	const [showPicker, setShowPicker] = useState<null | {
@@ -87,6 +90,8 @@ export default function SettingsPage() {
 					const j = await r.json()
 					setEpubDir(j?.epub_directory || '')
 					setEpubDirInput(j?.epub_directory || '')
+					setAnnIndex(j?.ann_index === 'ivf' ? 'ivf' : 'none')
+					if (typeof j?.ann_nprobe === 'number') setAnnNprobe(j.ann_nprobe)
 				}
 			} catch {
 				/* noop */
@@ -170,6 +175,8 @@ export default function SettingsPage() {
 				overlap_size: 50,
 				search_top_k: 5,
 				min_similarity_score: 0.1,
+				ann_index: annIndex,
+				ann_nprobe: annNprobe,
 			}
 			const r = await fetch(`${API_BASE}/api/epub/settings`, {
 				method: 'POST',
@@ -454,6 +461,35 @@ export default function SettingsPage() {
 					}}>
 					現在の設定: {epubDir || '(未設定)'}
 				</div>
+				<div
+					style={{
+						display: 'flex',
+						gap: 8,
+						alignItems: 'center',
+						marginBottom: 8,
+					}}>
+					<label>近似検索</label>
+					<select
+						value={annIndex}
+						onChange={(e) =>
+							setAnnIndex(e.target.value === 'ivf' ? 'ivf' : 'none')
+						}
+						style={{ padding: 8 }}>
+						<option value="none">なし（厳密検索）</option>
+						<option value="ivf">IVF</option>
+					</select>
+					<label>nprobe</label>
+					<input
+						type="number"
+						min={1}
+						value={annNprobe}
+						disabled={annIndex !== 'ivf'}
+						onChange={(e) =>
+							setAnnNprobe(Math.max(1, Number(e.target.value) || 1))
+						}
+						style={{ width: 80, padding: 8 }}
+					/>
+				</div>
 			</section>
 
 			<hr